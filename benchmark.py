@@ -0,0 +1,1270 @@
+"""性能基准测试脚本
+
+用法: python benchmark.py <场景> [参数]
+所有场景都在临时目录中生成测试数据，不会触碰真实桌面。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from cleaner import CleanerEngine, default_config
+from cleaner.scanner import Entry
+
+
+class SyscallCounter:
+    """在Python层统计文件系统调用次数（stat/listdir/scandir）"""
+
+    def __init__(self):
+        self.counts = {}
+        self._saved = {}
+
+    def _count(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def __enter__(self):
+        counter = self
+
+        def wrap(name):
+            original = getattr(os, name)
+            self._saved[name] = original
+
+            def wrapper(*args, **kwargs):
+                counter._count(name)
+                return original(*args, **kwargs)
+            return wrapper
+
+        class CountingDirEntry:
+            """包装os.DirEntry，首次stat()计为一次stat系统调用"""
+            def __init__(self, dir_entry):
+                self._entry = dir_entry
+                self._stat_counted = False
+                self.name = dir_entry.name
+                self.path = dir_entry.path
+
+            def stat(self, *args, **kwargs):
+                if not self._stat_counted and os.name != "nt":
+                    counter._count("stat")
+                    self._stat_counted = True
+                return self._entry.stat(*args, **kwargs)
+
+            def is_dir(self, *args, **kwargs):
+                return self._entry.is_dir(*args, **kwargs)
+
+            def is_file(self, *args, **kwargs):
+                return self._entry.is_file(*args, **kwargs)
+
+            def inode(self):
+                return self._entry.inode()
+
+        class CountingScandir:
+            def __init__(self, it):
+                self._it = it
+
+            def __iter__(self):
+                return (CountingDirEntry(e) for e in self._it)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._it.close()
+
+        for name in ("stat", "lstat", "listdir"):
+            setattr(os, name, wrap(name))
+        original_scandir = os.scandir
+        self._saved["scandir"] = original_scandir
+
+        def scandir(*args, **kwargs):
+            counter._count("scandir")
+            return CountingScandir(original_scandir(*args, **kwargs))
+        os.scandir = scandir
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self._saved.items():
+            setattr(os, name, original)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+def make_desktop(root, count, size=16):
+    """生成包含count个小文件的模拟桌面"""
+    exts = [".txt", ".pdf", ".png", ".jpg", ".mp4", ".zip", ".exe", ".xyz", ".lnk"]
+    payload = b"x" * size
+    os.makedirs(root, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(root, f"file_{i:06d}{exts[i % len(exts)]}"), "wb") as f:
+            f.write(payload)
+    for i in range(max(1, count // 100)):
+        os.makedirs(os.path.join(root, f"folder_{i:04d}"), exist_ok=True)
+    return root
+
+
+def legacy_plan(engine):
+    """旧版流程：listdir + 每个文件多次isdir/getsize/exists"""
+    config = engine.config
+    plan = []
+    for item in os.listdir(engine.desktop_path):
+        item_path = os.path.join(engine.desktop_path, item)
+        if item in config["categories"]:
+            continue
+        # should_skip_file
+        if os.path.isdir(item_path):
+            if not config.get("include_folders_in_organize", False):
+                continue
+        elif os.path.splitext(item)[1].lower() in config["excluded_extensions"]:
+            continue
+        elif os.path.getsize(item_path) / (1024 * 1024) > config["max_file_size_mb"]:
+            continue
+        # get_file_category
+        is_dir = os.path.isdir(item_path)
+        category = engine.get_entry_category(Entry(item, item_path, is_dir, 0, 0.0, 0))
+        # 移动循环中的 exists / isdir
+        os.path.exists(os.path.join(engine.desktop_path, category))
+        os.path.exists(os.path.join(engine.desktop_path, category, item))
+        plan.append((item_path, category))
+    return plan
+
+
+def new_plan(engine):
+    """新版流程：单次scandir，后续判断全部基于扫描记录"""
+    entries = engine.scan_desktop()
+    return engine.plan_organize(entries)
+
+
+def bench_scan(args):
+    """对比旧版与新版扫描流程的系统调用次数和耗时"""
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_")
+    try:
+        desktop = make_desktop(os.path.join(tmp, "desktop"), args.files)
+        engine = CleanerEngine(default_config(), desktop)
+        print(f"模拟桌面: {args.files} 个文件")
+        for label, func in (("旧版 listdir+stat", legacy_plan), ("新版 scandir", new_plan)):
+            with SyscallCounter() as counter:
+                plan = func(engine)
+            start = time.perf_counter()
+            func(engine)
+            elapsed = time.perf_counter() - start
+            detail = ", ".join(f"{k}={v}" for k, v in sorted(counter.counts.items()))
+            print(f"{label:<20} 计划 {len(plan)} 项  系统调用 {counter.total} 次 "
+                  f"({counter.total / max(1, args.files):.2f}/文件; {detail})  耗时 {elapsed * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def make_many_categories(count, exts_per_category):
+    """生成包含大量分类和扩展名的配置"""
+    config = default_config()
+    categories = {}
+    for i in range(count):
+        categories[f"分类{i:03d}"] = {
+            "extensions": [f".e{i:03d}x{j:02d}" for j in range(exts_per_category)],
+            "icon": "📁"
+        }
+    categories["📁 其他"] = {"extensions": [], "icon": "📁"}
+    config["categories"] = categories
+    return config
+
+
+def legacy_classify(config, names):
+    """旧版get_file_category：逐个分类线性查找扩展名"""
+    result = []
+    for name in names:
+        file_ext = os.path.splitext(name)[1].lower()
+        category = None
+        for category_name, category_info in config["categories"].items():
+            if file_ext in category_info["extensions"]:
+                category = category_name
+                break
+        if category is None:
+            for category_name in config["categories"]:
+                if "其他" in category_name:
+                    category = category_name
+                    break
+        result.append(category)
+    return result
+
+
+def bench_classify(args):
+    """对比旧版逐分类查找与预编译索引的分类速度"""
+    from cleaner.classifier import CategoryClassifier
+
+    config = make_many_categories(args.categories, args.exts)
+    all_exts = [ext for info in config["categories"].values() for ext in info["extensions"]]
+    all_exts.append(".unknown")
+    names = [f"file_{i}{all_exts[(i * 7919) % len(all_exts)]}" for i in range(args.names)]
+    print(f"{args.categories} 个分类 x {args.exts} 个扩展名，分类 {args.names} 个文件名")
+
+    start = time.perf_counter()
+    expected = legacy_classify(config, names)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    classifier = CategoryClassifier(config)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    result = classifier.classify(names)
+    compiled = time.perf_counter() - start
+
+    assert result == expected, "分类结果与旧版不一致"
+    print(f"旧版逐分类查找  {legacy * 1000:8.1f} ms")
+    print(f"预编译索引      {compiled * 1000:8.1f} ms (构建索引 {build * 1000:.2f} ms)  加速 {legacy / compiled:.1f}x")
+
+
+def make_rules(count):
+    """生成count条混合规则：带扩展名的通配符、前缀、正则，部分带大小和修改时间条件"""
+    exts = [".png", ".jpg", ".pdf", ".docx", ".xlsx", ".mp4", ".zip", ".txt"]
+    categories = {}
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            rule = {"glob": f"项目{i:04d}_*{exts[i % len(exts)]}"}
+        elif kind == 1:
+            rule = {"prefix": f"客户{i:04d}"}
+        elif kind == 2:
+            rule = {"regex": rf"^IMG_{i:04d}\d+"}
+        else:
+            rule = {"extensions": [exts[i % len(exts)]], "min_size_mb": i % 50, "max_age_days": 1 + i % 365}
+        if i % 3 == 0:
+            rule["max_size_mb"] = 100 + i
+        rule["priority"] = i % 5
+        categories.setdefault(f"规则分类{i % 50:02d}", {"extensions": [], "rules": []})["rules"].append(rule)
+    return categories
+
+
+def naive_rule_match(categories, entries, now):
+    """逐条规则匹配（按优先级依次检查每条规则的每个条件）"""
+    import fnmatch
+    import re
+
+    rules = [(category, rule) for category, info in categories.items() for rule in info["rules"]]
+    rules = [pair for _, pair in sorted(enumerate(rules), key=lambda item: (-item[1][1].get("priority", 0), item[0]))]
+    result = []
+    for entry in entries:
+        name = entry.name.lower()
+        age = (now - entry.mtime) / 86400
+        size = entry.size / 1024 / 1024
+        found = None
+        for category, rule in rules:
+            if "glob" in rule and not fnmatch.fnmatch(name, rule["glob"].lower()):
+                continue
+            if "prefix" in rule and not name.startswith(rule["prefix"].lower()):
+                continue
+            if "regex" in rule and not re.search(rule["regex"], entry.name):
+                continue
+            if "extensions" in rule and not any(name.endswith(ext) for ext in rule["extensions"]):
+                continue
+            if not rule.get("min_size_mb", 0) <= size <= rule.get("max_size_mb", float("inf")):
+                continue
+            if not rule.get("min_age_days", 0) <= age <= rule.get("max_age_days", float("inf")):
+                continue
+            found = category
+            break
+        result.append(found)
+    return result
+
+
+def bench_rules(args):
+    """分类规则：合并编译后的匹配耗时与文件数成正比，几乎不随规则数增长"""
+    import random
+    from cleaner.rules import RuleSet
+
+    random.seed(0)
+    now = time.time()
+    exts = [".png", ".jpg", ".pdf", ".docx", ".xlsx", ".mp4", ".zip", ".txt", ".md"]
+    stems = ["项目{:04d}_说明", "客户{:04d}合同", "IMG_{:04d}123", "随便的文件{:04d}"]
+
+    def make_entries(count, rule_count):
+        return [Entry(name, name, False, random.randint(0, 200) * 1024 * 1024, now - random.random() * 400 * 86400, 0)
+                for name in (random.choice(stems).format(random.randrange(rule_count + 100)) + random.choice(exts)
+                             for _ in range(count))]
+
+    for rule_count in args.rules:
+        categories = make_rules(rule_count)
+        start = time.perf_counter()
+        rules = RuleSet(categories)
+        build = time.perf_counter() - start
+        line = [f"{rule_count:5d} 条规则（编译 {build * 1000:6.1f} ms）"]
+        for count in args.files:
+            entries = make_entries(count, rule_count)
+            start = time.perf_counter()
+            result = rules.match(entries, now)
+            elapsed = time.perf_counter() - start
+            line.append(f"{count} 个文件 {elapsed * 1000:7.1f} ms ({elapsed / count * 1e6:5.2f} µs/个)")
+        sample = make_entries(args.naive, rule_count)
+        start = time.perf_counter()
+        expected = naive_rule_match(categories, sample, now)
+        naive = time.perf_counter() - start
+        assert rules.match(sample, now) == expected, "规则匹配结果与逐条匹配不一致"
+        line.append(f"逐条匹配 {naive / len(sample) * 1e6:7.1f} µs/个")
+        print("  ".join(line))
+
+
+def make_files(root, count, size):
+    """在root下生成count个指定大小的文件"""
+    os.makedirs(root, exist_ok=True)
+    block = os.urandom(min(size, 1024 * 1024)) if size else b""
+    for i in range(count):
+        with open(os.path.join(root, f"data_{i:06d}.pdf"), "wb") as f:
+            remaining = size
+            while remaining > 0:
+                chunk = block[:remaining]
+                f.write(chunk)
+                remaining -= len(chunk)
+
+
+def bench_move(args):
+    """整理移动阶段在不同线程数下的吞吐量"""
+    base = args.root or tempfile.gettempdir()
+    scenarios = (("小文件", args.small_files, args.small_size),
+                 ("大文件", args.large_files, args.large_size))
+    for label, count, size in scenarios:
+        for workers in args.workers:
+            tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=base)
+            try:
+                desktop = os.path.join(tmp, "desktop")
+                make_files(desktop, count, size)
+                config = default_config()
+                config["max_file_size_mb"] = max(config["max_file_size_mb"], size // (1024 * 1024) + 1)
+                config["move_workers"] = workers
+                engine = CleanerEngine(config, desktop)
+                start = time.perf_counter()
+                summary = engine.organize(os.path.join(tmp, "record.json"))
+                elapsed = time.perf_counter() - start
+                total_mb = count * size / (1024 * 1024)
+                print(f"{label} {count} x {size // 1024} KB  线程 {workers:2d}: {elapsed:7.2f} s  "
+                      f"{summary['total_files'] / elapsed:9.0f} 文件/s  {total_mb / elapsed:8.1f} MB/s")
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_xdev(args):
+    """跨卷移动：shutil.move 与 零拷贝+并行目录复制 对比"""
+    from cleaner.transfer import TransferStats, move_path
+
+    src_root = tempfile.mkdtemp(prefix="cleaner_bench_src_", dir=args.src_root)
+    dst_root = tempfile.mkdtemp(prefix="cleaner_bench_dst_", dir=args.dest_root)
+    try:
+        if os.stat(src_root).st_dev == os.stat(dst_root).st_dev:
+            print("警告: 源目录和目标目录位于同一卷，将只测到重命名速度")
+        total_mb = args.files * args.size / (1024 * 1024)
+        print(f"目录树 {args.files} 个文件 x {args.size // 1024} KB，共 {total_mb:.0f} MB")
+        methods = [("shutil.move", None)] + [(f"move_path 线程{w}", w) for w in args.workers]
+        for label, workers in methods:
+            src = os.path.join(src_root, "project")
+            make_files(os.path.join(src, "a"), args.files // 2, args.size)
+            make_files(os.path.join(src, "b"), args.files - args.files // 2, args.size)
+            dst = os.path.join(dst_root, f"project_{workers or 0}")
+            start = time.perf_counter()
+            if workers is None:
+                shutil.move(src, dst)
+            else:
+                move_path(src, dst, stats=TransferStats(), workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<16} {elapsed:7.2f} s  {total_mb / elapsed:8.1f} MB/s")
+            shutil.rmtree(dst, ignore_errors=True)
+    finally:
+        shutil.rmtree(src_root, ignore_errors=True)
+        shutil.rmtree(dst_root, ignore_errors=True)
+
+
+def bench_names(args):
+    """重名处理：逐个os.path.exists探测 与 内存名称索引 对比"""
+    from cleaner.mover import DestinationNamer
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_")
+    try:
+        # 目标目录中已有 截图.png, 截图_1.png ... 截图_{n-1}.png
+        for i in range(args.existing):
+            name = "截图.png" if i == 0 else f"截图_{i}.png"
+            open(os.path.join(tmp, name), "wb").close()
+        dest = os.path.join(tmp, "截图.png")
+        print(f"目标目录已有 {args.existing} 个同名文件，再分配 {args.claims} 个名称")
+
+        with SyscallCounter() as counter:
+            start = time.perf_counter()
+            claimed = set()
+            for _ in range(args.claims):
+                counter_value = 1
+                path = dest
+                while path in claimed or os.path.exists(path):
+                    name, ext = os.path.splitext(dest)
+                    path = f"{name}_{counter_value}{ext}"
+                    counter_value += 1
+                claimed.add(path)
+            legacy = time.perf_counter() - start
+        print(f"旧版exists探测  {legacy * 1000:9.1f} ms  系统调用 {counter.total} 次")
+
+        with SyscallCounter() as counter:
+            start = time.perf_counter()
+            namer = DestinationNamer()
+            for _ in range(args.claims):
+                namer.claim(dest, False)
+            indexed = time.perf_counter() - start
+        print(f"名称索引        {indexed * 1000:9.1f} ms  系统调用 {counter.total} 次")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def legacy_restore(desktop, record_path):
+    """旧版恢复：json.load整个记录，逐个exists + 重名探测 + shutil.move"""
+    import json
+    with open(record_path, 'r', encoding='utf-8') as f:
+        moved_files = json.load(f)["files"]
+    restored = 0
+    for file_info in moved_files:
+        if os.path.exists(file_info["new"]):
+            restore_path = os.path.join(desktop, os.path.basename(file_info["original"]))
+            counter = 1
+            original_restore = restore_path
+            while os.path.exists(restore_path):
+                name, ext = os.path.splitext(original_restore)
+                restore_path = f"{name}_{counter}{ext}"
+                counter += 1
+            shutil.move(file_info["new"], restore_path)
+            restored += 1
+    return restored
+
+
+def bench_restore(args):
+    """恢复阶段：旧版逐个stat串行移动 与 按目录批量确认+线程池移动 对比"""
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = make_desktop(os.path.join(tmp, "desktop"), args.files)
+        config = default_config()
+        record_path = os.path.join(tmp, "record.json")
+        print(f"模拟桌面: {args.files} 个文件")
+
+        engine = CleanerEngine(config, desktop)
+        engine.organize(record_path)
+        with SyscallCounter() as counter:
+            start = time.perf_counter()
+            restored = legacy_restore(desktop, record_path)
+            elapsed = time.perf_counter() - start
+        print(f"旧版恢复        {elapsed:7.2f} s  恢复 {restored} 个  系统调用 {counter.total} 次")
+
+        for workers in args.workers:
+            config["move_workers"] = workers
+            engine.organize(record_path)
+            with SyscallCounter() as counter:
+                start = time.perf_counter()
+                result = engine.restore(record_path)
+                elapsed = time.perf_counter() - start
+            print(f"新版恢复 线程{workers:<2d}  {elapsed:7.2f} s  恢复 {result['restored_count']} 个  "
+                  f"系统调用 {counter.total} 次")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_decorate(args):
+    """分类文件夹装饰：旧版每个文件夹启动一次attrib进程 与 进程内批量设置+缓存 对比"""
+    from cleaner.decoration import FolderDecorator, attribute_backend, desktop_ini_content
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        info = {"icon": "📄"}
+        folders = []
+        for i in range(args.folders):
+            folder = os.path.join(tmp, f"分类{i}")
+            os.makedirs(folder)
+            folders.append(folder)
+        # 非Windows下没有attrib，用true命令模拟“每个文件夹启动一个shell进程”的开销
+        command = "attrib +h +s" if os.name == "nt" else "true"
+        print(f"分类文件夹: {args.folders} 个  旧版命令: {command}")
+
+        start = time.perf_counter()
+        for folder in folders:
+            desktop_ini_path = os.path.join(folder, "desktop.ini")
+            with open(desktop_ini_path, 'w', encoding='utf-8') as f:
+                f.write(desktop_ini_content(info))
+            os.system(f'{command} "{desktop_ini_path}"')
+        print(f"旧版 os.system  {(time.perf_counter() - start) * 1000:9.1f} ms")
+        for folder in folders:
+            os.remove(os.path.join(folder, "desktop.ini"))
+
+        decorator = FolderDecorator(attribute_backend(args.backend))
+        print(f"属性后端: {decorator.backend.name}")
+        for label in ("首次写入", "再次整理（缓存）"):
+            with SyscallCounter() as counter:
+                start = time.perf_counter()
+                for folder in folders:
+                    decorator.queue(folder, info)
+                written, unchanged = decorator.flush()
+                elapsed = time.perf_counter() - start
+            print(f"{label:<10s}  {elapsed * 1000:9.1f} ms  写入 {written} 个  未变化 {unchanged} 个  "
+                  f"stat {counter.total} 次")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_log(args):
+    """日志：旧版逐条简化+逐条写入 与 预编译简化+合并缓冲区 对比（只统计Python端开销和显示行数）"""
+    from cleaner.logsink import LogSink
+
+    categories = list(default_config()["categories"])
+    messages = ["开始整理桌面..."]
+    for i in range(args.messages):
+        # 按分类成段出现，与整理时按扫描顺序输出的日志相近
+        category = categories[i * len(categories) // args.messages]
+        messages.append(f"移动文件: 文件_{i:06d}.txt -> {category}")
+    messages.append("整理完成！")
+
+    simplifications = {
+        "开始整理桌面...": "开始整理", "桌面整理完成": "整理完成", "开始备份桌面文件...": "开始备份",
+        "备份完成": "备份完成", "配置已保存": "配置保存", "配置代码已生成": "配置导出",
+        "配置导入成功": "配置导入", "开始从记录文件恢复桌面": "开始恢复", "恢复完成": "恢复完成"
+    }
+
+    def legacy_simplify(message):
+        for original, simplified in simplifications.items():
+            if original in message:
+                return simplified
+        return message[:47] + "..." if len(message) > 50 else message
+
+    start = time.perf_counter()
+    legacy_lines = [f"[00:00:00] {legacy_simplify(message)}\n" for message in messages]
+    legacy = time.perf_counter() - start
+    print(f"日志消息: {len(messages)} 条")
+    print(f"旧版逐条写入    {legacy * 1000:9.1f} ms  写入日志框 {len(legacy_lines)} 行（每行一次重绘）")
+
+    from desktop_cleaner import DesktopCleaner
+    # _simplify_log_message不使用实例状态
+    sink = LogSink(simplify=lambda message: DesktopCleaner._simplify_log_message(None, message))
+    written = 0
+    flushes = 0
+    start = time.perf_counter()
+    for i, message in enumerate(messages):
+        sink.append(message, "00:00:00")
+        # 模拟界面每100ms取一次：按每批 flush_every 条消息
+        if i % args.flush_every == 0:
+            written += len(sink.drain()[1])
+            flushes += 1
+    written += len(sink.drain()[1])
+    elapsed = time.perf_counter() - start
+    print(f"合并缓冲区      {elapsed * 1000:9.1f} ms  写入日志框 {written} 行（{flushes + 1} 次批量写入）")
+
+
+def make_compressible_files(root, count, size, seed=0, varied=False):
+    """生成可压缩的文本文件（随机单词），模拟文档类文件；varied为True时大小在1字节到size之间随机"""
+    import random
+    rng = random.Random(seed)
+    words = [rng.getrandbits(48).to_bytes(6, "little").hex() for _ in range(2000)]
+    os.makedirs(root, exist_ok=True)
+    for i in range(count):
+        target = rng.randint(1, size) if varied else size
+        with open(os.path.join(root, f"doc_{i:06d}.txt"), "w") as f:
+            written = 0
+            while written < target:
+                line = " ".join(rng.choice(words) for _ in range(16)) + "\n"
+                f.write(line)
+                written += len(line)
+
+
+def bench_backup(args):
+    """备份压缩：旧版zipfile单线程 与 多线程分块压缩在不同线程数下的吞吐量"""
+    import hashlib
+    import zipfile
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = os.path.join(tmp, "desktop")
+        make_compressible_files(desktop, args.small_files, args.small_size, varied=args.varied_sizes)
+        make_compressible_files(os.path.join(desktop, "large"), args.large_files, args.large_size, seed=1)
+        config = default_config()
+        config["include_folders_in_backup"] = True
+        engine = CleanerEngine(config, desktop)
+        files = engine.collect_backup_files()
+        total = sum(entry.size for entry, _ in files)
+        print(f"模拟桌面: {len(files)} 个文件，共 {total / (1024 * 1024):.0f} MB，CPU核心数 {os.cpu_count()}")
+
+        out = os.path.join(tmp, "out")
+        os.makedirs(out)
+        legacy_path = os.path.join(out, "legacy.zip")
+        start = time.perf_counter()
+        with zipfile.ZipFile(legacy_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for entry, arcname in files:
+                zipf.write(entry.path, arcname)
+        legacy = time.perf_counter() - start
+        print(f"旧版zipfile      {legacy:7.2f} s  {total / legacy / (1024 * 1024):7.1f} MB/s  "
+              f"大小 {os.path.getsize(legacy_path) / (1024 * 1024):.1f} MB")
+
+        digests = set()
+        for workers in args.workers:
+            config["backup_workers"] = workers
+            start = time.perf_counter()
+            path, count = engine.backup(out, timestamp=f"w{workers}")
+            elapsed = time.perf_counter() - start
+            with open(path, "rb") as f:
+                digests.add(hashlib.sha256(f.read()).hexdigest())
+            with zipfile.ZipFile(path) as zipf:
+                bad = zipf.testzip()
+            print(f"并行压缩 线程{workers:<3d} {elapsed:7.2f} s  {total / elapsed / (1024 * 1024):7.1f} MB/s  "
+                  f"加速 {legacy / elapsed:4.2f}x  大小 {os.path.getsize(path) / (1024 * 1024):.1f} MB  "
+                  f"校验 {'通过' if bad is None else '失败: ' + bad}")
+            os.remove(path)
+        print(f"不同线程数生成的压缩包{'逐字节相同' if len(digests) == 1 else '不一致！'}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_incremental(args):
+    """增量备份：完整备份 与 少量文件变化后的增量备份 的耗时和占用空间对比"""
+    import random
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = os.path.join(tmp, "desktop")
+        make_compressible_files(desktop, args.files, args.size)
+        config = default_config()
+        config["incremental_backup"] = True
+        engine = CleanerEngine(config, desktop)
+        out = os.path.join(tmp, "out")
+        os.makedirs(out)
+        print(f"模拟桌面: {args.files} 个文件，每个 {args.size // 1024} KB，每晚修改 {args.changed} 个")
+
+        def dir_size():
+            return sum(entry.stat().st_size for entry in os.scandir(out))
+
+        start = time.perf_counter()
+        engine.backup(out, timestamp="20250101_000000")
+        full = time.perf_counter() - start
+        full_size = dir_size()
+        print(f"完整备份        {full:7.2f} s  占用 {full_size / (1024 * 1024):8.2f} MB")
+
+        rng = random.Random(0)
+        names = sorted(os.listdir(desktop))
+        for night in range(1, args.nights + 1):
+            for name in rng.sample(names, args.changed):
+                with open(os.path.join(desktop, name), "a") as f:
+                    f.write(f"night {night}\n")
+            before = dir_size()
+            start = time.perf_counter()
+            path, count = engine.backup(out, timestamp=f"20250101_{night:06d}")
+            elapsed = time.perf_counter() - start
+            added = dir_size() - before
+            print(f"第{night}次增量备份  {elapsed:7.2f} s  写入 {count} 个文件  新增占用 {added / (1024 * 1024):8.2f} MB  "
+                  f"（完整备份的 {full / elapsed:.0f}x 速度，{full_size / max(added, 1):.0f}x 更省空间）")
+
+        restored_dir = os.path.join(tmp, "restored")
+        start = time.perf_counter()
+        restored, missing = engine.restore_backup(out, restored_dir)
+        elapsed = time.perf_counter() - start
+        same = all(open(os.path.join(desktop, n), "rb").read() == open(os.path.join(restored_dir, n), "rb").read()
+                   for n in names)
+        print(f"还原最新时间点   {elapsed:7.2f} s  还原 {restored} 个文件  内容{'一致' if same else '不一致！'}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_dedup(args):
+    """去重备份仓库：重复文件和文件中间插入内容时的去重率、写入吞吐量"""
+    import random
+    from cleaner.chunkstore import ChunkStore
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = os.path.join(tmp, "desktop")
+        rng = random.Random(0)
+        # 安装包等不可压缩文件，每个下载了两次；文档类可压缩文件
+        os.makedirs(desktop)
+        for i in range(args.installers):
+            data = rng.randbytes(args.installer_size)
+            for name in (f"setup_{i}.exe", f"setup_{i} (1).exe"):
+                with open(os.path.join(desktop, name), "wb") as f:
+                    f.write(data)
+        make_compressible_files(desktop, args.files, args.size, seed=1)
+        names = sorted(os.listdir(desktop))
+        logical = sum(os.path.getsize(os.path.join(desktop, n)) for n in names)
+        print(f"模拟桌面: {len(names)} 个文件，共 {logical / (1024 * 1024):.1f} MB"
+              f"（{args.installers} 个安装包各有一个副本）")
+
+        store_dir = os.path.join(tmp, "store")
+        engine = CleanerEngine(default_config(), desktop)
+
+        def store_size():
+            return ChunkStore(store_dir).usage()[1]
+
+        start = time.perf_counter()
+        engine.backup_to_store(store_dir, timestamp="20250101_000000")
+        elapsed = time.perf_counter() - start
+        stored = store_size()
+        print(f"首次快照   {elapsed:7.2f} s  {logical / (1024 * 1024) / elapsed:7.1f} MB/s  "
+              f"仓库 {stored / (1024 * 1024):8.2f} MB  去重+压缩率 {logical / stored:.2f}x")
+
+        # 在若干文档中间插入一行，再把一个安装包改名
+        docs = [n for n in names if n.endswith(".txt")]
+        changed = rng.sample(docs, min(args.changed, len(docs)))
+        changed_bytes = 0
+        for name in changed:
+            path = os.path.join(desktop, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            middle = len(data) // 2
+            with open(path, "wb") as f:
+                f.write(data[:middle] + b"inserted line\n" + data[middle:])
+            changed_bytes += len(data)
+        if args.installers:
+            os.rename(os.path.join(desktop, "setup_0.exe"), os.path.join(desktop, "setup_0_old.exe"))
+            changed_bytes += args.installer_size
+
+        start = time.perf_counter()
+        snapshot_id, stats = engine.backup_to_store(store_dir, timestamp="20250102_000000")
+        elapsed = time.perf_counter() - start
+        print(f"第二次快照 {elapsed:7.2f} s  {stats['reused']} 个文件未变化  "
+              f"新增 {(store_size() - stored) / (1024 * 1024):8.2f} MB"
+              f"（变化文件共 {changed_bytes / (1024 * 1024):.2f} MB，增量ZIP需整文件重写）")
+
+        restored_dir = os.path.join(tmp, "restored")
+        start = time.perf_counter()
+        restored, missing = engine.restore_backup(store_dir, restored_dir)
+        elapsed = time.perf_counter() - start
+        same = all(open(os.path.join(desktop, n), "rb").read() == open(os.path.join(restored_dir, n), "rb").read()
+                   for n in os.listdir(desktop))
+        print(f"还原最新快照 {elapsed:7.2f} s  还原 {restored} 个文件  内容{'一致' if same else '不一致！'}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_compression(args):
+    """按文件选择压缩方式 与 全部DEFLATE 的耗时和体积对比（照片、视频、压缩包、文档混合的桌面）"""
+    import random
+    from cleaner.backup import write_zip
+    from cleaner.compression import CompressionPolicy, CompressionStats
+    from cleaner.scanner import scan_dir
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = os.path.join(tmp, "desktop")
+        make_compressible_files(desktop, args.docs, args.size)
+        rng = random.Random(0)
+        # 已压缩格式的内容近似随机数据；最后一组无扩展名，只能靠采样识别
+        for ext in (".jpg", ".mp4", ".zip", ".7z", ""):
+            for i in range(args.media):
+                with open(os.path.join(desktop, f"media_{i}{ext}"), "wb") as f:
+                    f.write(rng.randbytes(args.media_size))
+        files = [(entry, entry.name) for entry in scan_dir(desktop)]
+        total = sum(entry.size for entry, _ in files)
+        print(f"模拟桌面: {len(files)} 个文件，共 {total / (1024 * 1024):.1f} MB")
+
+        config = default_config()
+        engine = CleanerEngine(config, desktop)
+        for label, policy in (("全部DEFLATE", None), ("按文件选择", CompressionPolicy(config, engine.classifier))):
+            out = os.path.join(tmp, "out.zip")
+            stats = CompressionStats()
+            start = time.perf_counter()
+            cpu = time.process_time()
+            write_zip(out, files, workers=args.workers, policy=policy, stats=stats)
+            cpu = time.process_time() - cpu
+            elapsed = time.perf_counter() - start
+            print(f"{label:8s} {elapsed:7.2f} s  CPU {cpu:6.2f} s  大小 {os.path.getsize(out) / (1024 * 1024):8.2f} MB")
+            if policy is not None:
+                for line in stats.report():
+                    print(f"    {line}")
+            os.remove(out)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_bigfile(args):
+    """稀疏大文件的流式备份：在地址空间限制下备份，检查峰值内存和ZIP64结果"""
+    import zipfile
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = os.path.join(tmp, "desktop")
+        os.makedirs(desktop)
+        size = int(args.size_gb * 1024 * 1024 * 1024)
+        # 稀疏文件：不占磁盘空间，读出来全是0
+        with open(os.path.join(desktop, "big_video.dat"), "wb") as f:
+            f.truncate(size)
+        with open(os.path.join(desktop, "note.txt"), "w") as f:
+            f.write("small file after the big one\n")
+        out = os.path.join(tmp, "out")
+        os.makedirs(out)
+
+        try:
+            import resource
+        except ImportError:
+            resource = None
+            print("当前系统不支持resource模块，不限制内存，只报告结果")
+        if resource is not None:
+            limit = args.memory_limit * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+            baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(f"地址空间限制 {args.memory_limit} MB，备份前峰值常驻内存 {baseline / 1024:.1f} MB")
+
+        config = default_config()
+        config["max_file_size_mb"] = size // (1024 * 1024) + 1
+        config["backup_workers"] = args.workers
+        engine = CleanerEngine(config, desktop)
+        updates = []
+
+        def progress(snapshot):
+            updates.append(snapshot.bytes)
+
+        start = time.perf_counter()
+        path, count = engine.backup(out, progress=progress)
+        elapsed = time.perf_counter() - start
+        print(f"备份 {args.size_gb} GB 稀疏文件  {elapsed:7.2f} s  {size / (1024 * 1024) / elapsed:7.1f} MB/s  "
+              f"进度回调 {len(updates)} 次  压缩包 {os.path.getsize(path) / (1024 * 1024):.1f} MB")
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(f"峰值常驻内存 {peak / 1024:.1f} MB（增加 {(peak - baseline) / 1024:.1f} MB）")
+
+        with zipfile.ZipFile(path) as zipf:
+            info = zipf.getinfo("big_video.dat")
+            ok = info.file_size == size and count == 2 and zipf.read("note.txt")
+            print(f"ZIP64成员大小 {info.file_size:,} 字节  {'正确' if ok else '错误！'}")
+            if args.verify:
+                start = time.perf_counter()
+                with zipf.open(info) as f:
+                    while f.read(16 * 1024 * 1024):
+                        pass
+                print(f"解压校验CRC通过  {time.perf_counter() - start:7.2f} s")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_resume(args):
+    """可续传备份：检查点的额外开销，以及在中途取消后继续备份所需的时间"""
+    import threading
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = os.path.join(tmp, "desktop")
+        make_compressible_files(desktop, args.files, args.size)
+        print(f"模拟桌面: {args.files} 个文件，每个 {args.size // 1024} KB")
+
+        def run(label, resume, interval=None, cancel_at=None):
+            config = default_config()
+            config["resume_backup"] = resume
+            # 每次写入都回调，在准确的位置取消
+            config["progress_interval"] = 0
+            if interval is not None:
+                config["backup_checkpoint_interval"] = interval
+            out = os.path.join(tmp, label)
+            os.makedirs(out, exist_ok=True)
+            engine = CleanerEngine(config, desktop)
+            cancel = threading.Event()
+
+            def progress(snapshot):
+                if cancel_at is not None and snapshot.fraction is not None and snapshot.fraction >= cancel_at:
+                    cancel.set()
+
+            start = time.perf_counter()
+            engine.backup(out, progress=progress, cancel=cancel)
+            return out, time.perf_counter() - start
+
+        _, base = run("plain", resume=False)
+        print(f"不写检查点           {base:7.2f} s")
+        for interval in (args.interval, 0):
+            _, elapsed = run(f"checkpoint_{interval}", resume=True, interval=interval)
+            print(f"检查点间隔 {interval:4.1f} s      {elapsed:7.2f} s  （开销 {(elapsed - base) / base * 100:+.1f}%）")
+
+        out, first = run("resume", resume=True, cancel_at=args.cancel_at)
+        start = time.perf_counter()
+        CleanerEngine(default_config(), desktop).backup(out)
+        second = time.perf_counter() - start
+        print(f"在 {args.cancel_at:.0%} 处取消      {first:7.2f} s")
+        print(f"继续备份             {second:7.2f} s  （从头重新备份需 {base:.2f} s）")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_verify(args):
+    """备份校验：zipfile.testzip（单线程，逐个成员打开）与 并行校验 的速度对比"""
+    import zipfile
+    from cleaner.verify import expected_members, verify_archive
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = os.path.join(tmp, "desktop")
+        make_compressible_files(desktop, args.files, args.size)
+        out = os.path.join(tmp, "out")
+        os.makedirs(out)
+        path, count = CleanerEngine(default_config(), desktop).backup(out)
+        size = os.path.getsize(path)
+        print(f"压缩包: {count} 个文件，{size / (1024 * 1024):.1f} MB（{os.cpu_count()} 个CPU核心）")
+
+        start = time.perf_counter()
+        with zipfile.ZipFile(path) as zipf:
+            bad = zipf.testzip()
+        elapsed = time.perf_counter() - start
+        print(f"zipfile.testzip   {elapsed:7.2f} s  {'通过' if bad is None else '失败'}")
+
+        expected = expected_members(path)
+        for workers in args.workers:
+            start = time.perf_counter()
+            result = verify_archive(path, expected, workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"并行校验 {workers:2d} 线程  {elapsed:7.2f} s  {result['members']} 个成员  "
+                  f"{len(result['errors'])} 个问题")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_progress(args):
+    """进度模型：每次更新的开销，以及限制回调频率对备份耗时的影响"""
+    from cleaner.progress import ProgressTracker, describe
+
+    for interval in (0.1, 0):
+        shown = []
+        tracker = ProgressTracker(lambda snapshot: shown.append(describe(snapshot)), interval=interval)
+        tracker.start(args.updates, args.updates * 4096)
+        start = time.perf_counter()
+        for _ in range(args.updates):
+            tracker.advance(1, 4096, "文件.txt")
+        tracker.finish()
+        elapsed = time.perf_counter() - start
+        print(f"回调间隔 {interval:4.2f} s  {args.updates} 次更新  {elapsed * 1e9 / args.updates:7.0f} ns/次  "
+              f"回调 {len(shown)} 次")
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = os.path.join(tmp, "desktop")
+        make_compressible_files(desktop, args.files, args.size)
+        print(f"模拟桌面: {args.files} 个文件，每个 {args.size // 1024} KB")
+        runs = (("不显示进度", 0.1, False), ("回调间隔 0.10 s", 0.1, True), ("每次更新都回调", 0, True))
+        for index, (label, interval, consume) in enumerate(runs):
+            config = default_config()
+            config["progress_interval"] = interval
+            out = os.path.join(tmp, f"out_{index}")
+            os.makedirs(out)
+            shown = []
+            start = time.perf_counter()
+            CleanerEngine(config, desktop).backup(
+                out, progress=(lambda snapshot: shown.append(describe(snapshot))) if consume else None)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<14s}  {elapsed:7.2f} s  回调 {len(shown)} 次")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_preflight(args):
+    """整理/备份预检：大量目录项时的耗时和系统调用次数"""
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = make_desktop(os.path.join(tmp, "desktop"), args.files)
+        config = default_config()
+        # 模拟桌面中的文件都很小，不按大小排除
+        engine = CleanerEngine(config, desktop)
+        out = os.path.join(tmp, "out")
+        print(f"模拟桌面: {args.files} 个文件")
+        # 单独扫描一次的耗时（stat系统调用），预检本身的开销为与它的差值
+        for label, func in (("仅扫描", engine.scan_desktop), ("整理预检", engine.preflight_organize),
+                            ("备份预检", lambda: engine.preflight_backup(out))):
+            with SyscallCounter() as counter:
+                estimate = func()
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            detail = f"{estimate.items} 项  {len(estimate.categories)} 个分类  " if label != "仅扫描" else ""
+            print(f"{label:<6s}  {best * 1000:8.1f} ms  {detail}系统调用 {counter.total} 次")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_rescan(args):
+    """目录快照：未变化的大目录树再次扫描的耗时，与每次完整遍历对比"""
+    from cleaner.scanner import walk_files
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        desktop = os.path.join(tmp, "desktop")
+        for i in range(0, args.files, args.per_dir):
+            folder = os.path.join(desktop, f"项目_{i // (args.per_dir * 100):03d}", f"子目录_{i // args.per_dir:05d}")
+            os.makedirs(folder, exist_ok=True)
+            for j in range(i, min(i + args.per_dir, args.files)):
+                open(os.path.join(folder, f"文件_{j:07d}.txt"), "wb").close()
+        # 刚修改过的目录下次扫描时不被信任，模拟一段时间之后再次扫描
+        old = time.time() - 60
+        for path, _, _ in os.walk(desktop):
+            os.utime(path, (old, old))
+        config = default_config()
+        db_path = os.path.join(tmp, "scan_cache.db")
+        print(f"模拟桌面: {args.files} 个文件，每个目录 {args.per_dir} 个")
+
+        def run(label, enabled):
+            config["scan_cache"] = enabled
+            engine = CleanerEngine(config, desktop, scan_cache_path=db_path)
+            cache = engine.scan_cache
+            with SyscallCounter() as counter:
+                start = time.perf_counter()
+                # 与整理预检统计文件夹大小时相同的遍历
+                if cache is None:
+                    count = sum(1 for _ in walk_files(desktop))
+                else:
+                    count = sum(1 for _ in cache.walk_files(desktop, engine.categorizer))
+                    cache.save()
+                elapsed = time.perf_counter() - start
+            print(f"{label:<10s}  {elapsed * 1000:9.1f} ms  {count} 个文件  系统调用 {counter.total} 次")
+
+        run("完整遍历", False)
+        run("首次建立快照", True)
+        for _ in range(args.repeat):
+            run("再次扫描", True)
+        print(f"快照大小 {os.path.getsize(db_path) / 1024 / 1024:.1f} MB")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_sniff(args):
+    """按内容识别没有扩展名的文件：并行读取的速度，以及缓存命中时的开销"""
+    from cleaner.sniffer import ContentClassifier
+    from cleaner.classifier import CategoryClassifier
+
+    headers = [b"%PDF-1.7\n", b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff\xe0", b"PK\x03\x04", b"ID3\x04",
+               b"\x00\x00\x00\x18ftypmp42", b"\x7fELF", b"plain text"]
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        for i in range(args.files):
+            with open(os.path.join(tmp, f"下载_{i:06d}"), "wb") as f:
+                f.write(headers[i % len(headers)] + b"\0" * args.size)
+        entries = CleanerEngine(default_config(), tmp).scan_desktop()
+        base = CategoryClassifier(default_config())
+        print(f"{args.files} 个没有扩展名的文件，每个 {args.size} 字节")
+        for workers in args.workers:
+            classifier = ContentClassifier(base, workers=workers)
+            if args.cold:
+                # 清空页缓存，模拟从磁盘读取（仅Linux，需要root权限）
+                os.sync()
+                with open("/proc/sys/vm/drop_caches", "w") as f:
+                    f.write("3")
+            start = time.perf_counter()
+            categories = classifier.classify(entries)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            classifier.classify(entries)
+            warm = time.perf_counter() - start
+            recognized = sum(category != base.other_category for category in categories)
+            print(f"{workers:2d} 线程  首次 {cold * 1000:8.1f} ms ({args.files / cold:8.0f} 个/秒)  "
+                  f"缓存命中 {warm * 1000:6.1f} ms  识别 {recognized} 个  读取 {classifier.sniffed} 个")
+        start = time.perf_counter()
+        base.classify(entries)
+        print(f"仅按扩展名    {(time.perf_counter() - start) * 1000:8.1f} ms")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_watch(args):
+    """监视模式：空闲时的CPU占用、突发大量新文件时的事件处理和整理耗时"""
+    import threading
+    from cleaner.watcher import CHANGED, CLOSED, WRITING, DesktopWatcher
+
+    tmp = tempfile.mkdtemp(prefix="cleaner_bench_", dir=args.root)
+    try:
+        for backend in args.backends:
+            desktop = os.path.join(tmp, f"desktop_{backend}")
+            os.makedirs(desktop)
+            engine = CleanerEngine(default_config(), desktop)
+            watcher = DesktopWatcher(engine, os.path.join(tmp, f"records_{backend}"), debounce=args.debounce,
+                                     backend=backend)
+            thread = threading.Thread(target=watcher.run)
+            thread.start()
+            time.sleep(0.5)
+
+            cpu = time.process_time()
+            time.sleep(args.idle)
+            idle = (time.process_time() - cpu) / args.idle * 100
+
+            start = time.perf_counter()
+            for i in range(args.files):
+                with open(os.path.join(desktop, f"下载_{i:06d}.pdf"), "wb") as f:
+                    f.write(b"x")
+            created = time.perf_counter() - start
+            while watcher.organized < args.files and time.perf_counter() - start < args.timeout:
+                time.sleep(0.05)
+            elapsed = time.perf_counter() - start
+            watcher.stop.set()
+            thread.join()
+            print(f"{backend:<8s} 空闲CPU {idle:5.2f}%  {args.files} 个新文件（生成 {created:.2f} s）"
+                  f"  收到事件 {watcher.events} 个  全部整理完 {elapsed:6.2f} s  {watcher.batches} 批")
+
+        # 只测事件合并本身：每秒能处理的事件数
+        engine = CleanerEngine(default_config(), tmp)
+        watcher = DesktopWatcher(engine, os.path.join(tmp, "records_handle"))
+        kinds = (WRITING, CHANGED, CLOSED)
+        events = [(f"文件_{i % 5000:05d}.txt", kinds[i % 3]) for i in range(args.events)]
+        start = time.perf_counter()
+        for offset in range(0, len(events), 4096):
+            watcher.handle(events[offset:offset + 4096])
+        elapsed = time.perf_counter() - start
+        print(f"事件合并 {args.events} 个  {elapsed:6.2f} s  {args.events / elapsed:10.0f} 个/秒")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="桌面整理工具性能基准测试")
+    subparsers = parser.add_subparsers(dest="scenario")
+    subparsers.required = True
+
+    scan = subparsers.add_parser("scan", help="扫描阶段系统调用次数对比")
+    scan.add_argument("--files", type=int, default=10000)
+    scan.set_defaults(func=bench_scan)
+
+    classify = subparsers.add_parser("classify", help="扩展名分类速度对比")
+    classify.add_argument("--categories", type=int, default=60)
+    classify.add_argument("--exts", type=int, default=10)
+    classify.add_argument("--names", type=int, default=200000)
+    classify.set_defaults(func=bench_classify)
+
+    move = subparsers.add_parser("move", help="整理移动吞吐量（不同线程数）")
+    move.add_argument("--root", help="测试目录所在位置（可指定网络盘等慢速卷）")
+    move.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    move.add_argument("--small-files", type=int, default=10000)
+    move.add_argument("--small-size", type=int, default=4 * 1024)
+    move.add_argument("--large-files", type=int, default=100)
+    move.add_argument("--large-size", type=int, default=8 * 1024 * 1024)
+    move.set_defaults(func=bench_move)
+
+    xdev = subparsers.add_parser("xdev", help="跨卷移动目录树的吞吐量")
+    xdev.add_argument("--src-root", default=tempfile.gettempdir())
+    xdev.add_argument("--dest-root", default="/dev/shm" if os.path.isdir("/dev/shm") else None,
+                      help="位于另一个卷上的目标目录")
+    xdev.add_argument("--files", type=int, default=200)
+    xdev.add_argument("--size", type=int, default=2 * 1024 * 1024)
+    xdev.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    xdev.set_defaults(func=bench_xdev)
+
+    names = subparsers.add_parser("names", help="重名文件名分配速度对比")
+    names.add_argument("--existing", type=int, default=1000)
+    names.add_argument("--claims", type=int, default=1000)
+    names.set_defaults(func=bench_names)
+
+    restore = subparsers.add_parser("restore", help="恢复速度对比")
+    restore.add_argument("--root", help="测试目录所在位置")
+    restore.add_argument("--files", type=int, default=50000)
+    restore.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    restore.set_defaults(func=bench_restore)
+
+    decorate = subparsers.add_parser("decorate", help="分类文件夹desktop.ini与属性设置速度对比")
+    decorate.add_argument("--root", help="测试目录所在位置")
+    decorate.add_argument("--folders", type=int, default=200)
+    decorate.add_argument("--backend", default="auto", choices=["auto", "windows", "xattr", "none"])
+    decorate.set_defaults(func=bench_decorate)
+
+    log = subparsers.add_parser("log", help="日志缓冲与合并")
+    log.add_argument("--messages", type=int, default=20000)
+    log.add_argument("--flush-every", type=int, default=500, help="每多少条消息模拟一次界面刷新")
+    log.set_defaults(func=bench_log)
+
+    backup = subparsers.add_parser("backup", help="备份压缩吞吐量（不同线程数）")
+    backup.add_argument("--root", help="测试目录所在位置")
+    backup.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    backup.add_argument("--small-files", type=int, default=2000)
+    backup.add_argument("--small-size", type=int, default=16 * 1024)
+    backup.add_argument("--large-files", type=int, default=4)
+    backup.add_argument("--large-size", type=int, default=32 * 1024 * 1024)
+    backup.add_argument("--varied-sizes", action="store_true", help="小文件大小在1字节到--small-size之间随机")
+    backup.set_defaults(func=bench_backup)
+
+    incremental = subparsers.add_parser("incremental", help="增量备份与完整备份对比")
+    incremental.add_argument("--root", help="测试目录所在位置")
+    incremental.add_argument("--files", type=int, default=5000)
+    incremental.add_argument("--size", type=int, default=32 * 1024)
+    incremental.add_argument("--changed", type=int, default=10, help="每次备份之间修改的文件数")
+    incremental.add_argument("--nights", type=int, default=3)
+    incremental.set_defaults(func=bench_incremental)
+
+    dedup = subparsers.add_parser("dedup", help="去重备份仓库的去重率和吞吐量")
+    dedup.add_argument("--root", help="测试目录所在位置")
+    dedup.add_argument("--files", type=int, default=2000)
+    dedup.add_argument("--size", type=int, default=32 * 1024)
+    dedup.add_argument("--installers", type=int, default=8)
+    dedup.add_argument("--installer-size", type=int, default=8 * 1024 * 1024)
+    dedup.add_argument("--changed", type=int, default=20, help="第二次快照前在中间插入内容的文档数")
+    dedup.set_defaults(func=bench_dedup)
+
+    compression = subparsers.add_parser("compression", help="按文件选择压缩方式与全部DEFLATE对比")
+    compression.add_argument("--root", help="测试目录所在位置")
+    compression.add_argument("--docs", type=int, default=500)
+    compression.add_argument("--size", type=int, default=64 * 1024)
+    compression.add_argument("--media", type=int, default=4, help="每种已压缩格式的文件数")
+    compression.add_argument("--media-size", type=int, default=8 * 1024 * 1024)
+    compression.add_argument("--workers", type=int, default=1)
+    compression.set_defaults(func=bench_compression)
+
+    bigfile = subparsers.add_parser("bigfile", help="稀疏大文件在内存限制下的流式备份（ZIP64）")
+    bigfile.add_argument("--root", help="测试目录所在位置")
+    bigfile.add_argument("--size-gb", type=float, default=10)
+    bigfile.add_argument("--memory-limit", type=int, default=1024, help="进程地址空间上限（MB）")
+    bigfile.add_argument("--workers", type=int, default=2)
+    bigfile.add_argument("--verify", action="store_true", help="备份后完整解压一遍校验CRC")
+    bigfile.set_defaults(func=bench_bigfile)
+
+    resume = subparsers.add_parser("resume", help="可续传备份的检查点开销与续传速度")
+    resume.add_argument("--root", help="测试目录所在位置")
+    resume.add_argument("--files", type=int, default=3000)
+    resume.add_argument("--size", type=int, default=32 * 1024)
+    resume.add_argument("--interval", type=float, default=5.0, help="检查点间隔（秒）")
+    resume.add_argument("--cancel-at", type=float, default=0.7, help="第一次备份在完成该比例时取消")
+    resume.set_defaults(func=bench_resume)
+
+    verify = subparsers.add_parser("verify", help="备份校验速度（与zipfile.testzip对比）")
+    verify.add_argument("--root", help="测试目录所在位置")
+    verify.add_argument("--files", type=int, default=3000)
+    verify.add_argument("--size", type=int, default=64 * 1024)
+    verify.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    verify.set_defaults(func=bench_verify)
+
+    progress = subparsers.add_parser("progress", help="进度模型的开销与回调频率限制")
+    progress.add_argument("--root", help="测试目录所在位置")
+    progress.add_argument("--updates", type=int, default=1000000, help="微基准的更新次数")
+    progress.add_argument("--files", type=int, default=3000)
+    progress.add_argument("--size", type=int, default=16 * 1024)
+    progress.set_defaults(func=bench_progress)
+
+    preflight = subparsers.add_parser("preflight", help="整理/备份预检的耗时（大量目录项）")
+    preflight.add_argument("--root", help="测试目录所在位置")
+    preflight.add_argument("--files", type=int, default=100000)
+    preflight.add_argument("--repeat", type=int, default=3)
+    preflight.set_defaults(func=bench_preflight)
+
+    rescan = subparsers.add_parser("rescan", help="目录快照：未变化的大目录树再次扫描的耗时")
+    rescan.add_argument("--root", help="测试目录所在位置")
+    rescan.add_argument("--files", type=int, default=500000)
+    rescan.add_argument("--per-dir", type=int, default=100, help="每个子目录中的文件数")
+    rescan.add_argument("--repeat", type=int, default=3)
+    rescan.set_defaults(func=bench_rescan)
+
+    sniff = subparsers.add_parser("sniff", help="按内容识别文件类型的速度和缓存效果")
+    sniff.add_argument("--root", help="测试目录所在位置")
+    sniff.add_argument("--files", type=int, default=20000)
+    sniff.add_argument("--size", type=int, default=4096, help="每个文件的大小（字节）")
+    sniff.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    sniff.add_argument("--cold", action="store_true", help="每次首次识别前清空页缓存（Linux，需要root）")
+    sniff.set_defaults(func=bench_sniff)
+
+    rules = subparsers.add_parser("rules", help="分类规则的匹配耗时（文件数 x 规则数）")
+    rules.add_argument("--rules", type=int, nargs="+", default=[10, 100, 300, 1000])
+    rules.add_argument("--files", type=int, nargs="+", default=[10000, 100000, 400000])
+    rules.add_argument("--naive", type=int, default=2000, help="逐条匹配对比使用的文件数")
+    rules.set_defaults(func=bench_rules)
+
+    watch = subparsers.add_parser("watch", help="监视模式的空闲CPU占用和突发事件处理")
+    watch.add_argument("--root", help="测试目录所在位置")
+    watch.add_argument("--backends", nargs="+", default=["inotify", "poll"])
+    watch.add_argument("--files", type=int, default=3000, help="突发生成的新文件数")
+    watch.add_argument("--events", type=int, default=1000000, help="事件合并微基准的事件数")
+    watch.add_argument("--debounce", type=float, default=0.5)
+    watch.add_argument("--idle", type=float, default=5.0, help="测量空闲CPU占用的秒数")
+    watch.add_argument("--timeout", type=float, default=120.0)
+    watch.set_defaults(func=bench_watch)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
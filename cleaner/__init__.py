@@ -0,0 +1,16 @@
+"""桌面整理引擎 - 不依赖图形界面的整理、备份、恢复功能"""
+from .config import DEFAULT_CONFIG, default_config, load_config, save_config
+from .engine import CleanerEngine, OperationCancelled
+from .paths import get_desktop_path
+from .preflight import InsufficientSpaceError
+
+__all__ = [
+    "DEFAULT_CONFIG",
+    "default_config",
+    "load_config",
+    "save_config",
+    "CleanerEngine",
+    "OperationCancelled",
+    "InsufficientSpaceError",
+    "get_desktop_path",
+]
@@ -0,0 +1,248 @@
+import os
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+
+from .compression import STREAM_METHODS, SAMPLE_SIZE, LZMACompressor
+from .mover import run_ordered
+from .zipwriter import ZipWriter
+
+# 大于该大小的文件按块并行压缩（每块独立的DEFLATE片段，拼接后仍是一个合法的DEFLATE流）
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_COMPRESS_LEVEL = zlib.Z_DEFAULT_COMPRESSION
+# BZIP2/LZMA 整体压缩的结果超过该大小时暂存到临时文件
+_SPOOL_SIZE = 8 * 1024 * 1024
+# 任务的压缩方式为该值时表示文件已在上次中断的备份中写入，无需再压缩
+_RESUMED = (None, None)
+
+
+def default_backup_workers():
+    """压缩线程数默认为CPU核心数（zlib压缩时会释放GIL）"""
+    return os.cpu_count() or 1
+
+
+def _stream_compressor(compress_type, level):
+    if compress_type == zipfile.ZIP_BZIP2:
+        import bz2
+        return bz2.BZ2Compressor(level)
+    return LZMACompressor()
+
+
+def _compress_stream(entry, compress_type, level):
+    """整体压缩一个文件（BZIP2/LZMA），结果可能暂存在临时文件中"""
+    compressor = _stream_compressor(compress_type, level)
+    out = tempfile.SpooledTemporaryFile(_SPOOL_SIZE)
+    crc = 0
+    size = 0
+    with open(entry.path, 'rb') as f:
+        while True:
+            data = f.read(DEFAULT_CHUNK_SIZE)
+            if not data:
+                break
+            crc = zlib.crc32(data, crc)
+            size += len(data)
+            out.write(compressor.compress(data))
+    out.write(compressor.flush())
+    out.seek(0)
+    return out, crc, size
+
+
+def _compress_chunk(job):
+    """读取文件的一块并按指定方式压缩，返回 (压缩数据, CRC32, 原始数据, 原始长度, 压缩方式, CPU秒数)
+
+    DEFLATE非最后一块以Z_SYNC_FLUSH结束（字节对齐、不带结束标记），
+    最后一块以Z_FINISH结束，按顺序拼接即为完整的DEFLATE流。
+    第一块返回该块的CRC32，其后的块返回原始数据（CRC为None），由写入线程按顺序接续计算。
+    method为None时由该块（即整个小文件）的内容采样决定；
+    BZIP2/LZMA只有一个任务，压缩数据为文件对象。
+    读到的长度与拆分时的大小不符（文件在备份过程中被修改）时抛出RuntimeError。
+    """
+    index, entry, arcname, offset, length, last, method, policy = job
+    if method is _RESUMED:
+        return None
+    cpu = time.thread_time()
+    if method is not None and method[0] in STREAM_METHODS:
+        out, crc, size = _compress_stream(entry, *method)
+        return out, crc, None, size, method, time.thread_time() - cpu
+    with open(entry.path, 'rb') as f:
+        if offset:
+            f.seek(offset)
+        data = f.read(length)
+        # 最后一块之后不应再有数据，否则成员会被截断而CRC仍然正确
+        if len(data) != length or (last and f.read(1)):
+            raise RuntimeError(f"文件在备份过程中被修改: {entry.path}")
+    if method is None:
+        method = policy.method_for_sample(data)
+    compress_type, level = method
+    if compress_type == zipfile.ZIP_STORED:
+        out = data
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        out = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    if offset:
+        return out, None, data, len(data), method, time.thread_time() - cpu
+    return out, zlib.crc32(data), None, len(data), method, time.thread_time() - cpu
+
+
+def _read_sample(entry):
+    with open(entry.path, 'rb') as f:
+        return f.read(SAMPLE_SIZE)
+
+
+def _chunk_jobs(files, chunk_size, level, cancel, policy, resumed):
+    """把待备份文件拆成压缩任务，按成员顺序产出
+
+    续传时只沿用与本次扫描顺序一致、且源文件未变的开头一段旧成员，
+    第一个不一致的文件之后全部重新压缩，成员顺序始终与扫描顺序相同。
+    """
+    default = (zipfile.ZIP_DEFLATED, level)
+    # 上次已写入的成员，按在压缩包中的位置排列
+    expected = deque(sorted(resumed.items(), key=lambda item: item[1][0].header_offset))
+    for index, (entry, arcname) in enumerate(files):
+        if cancel.is_set():
+            return
+        # 扫描结果可能已经过时（扫描后被改写，或来自目录快照），拆分前重新stat
+        try:
+            st = os.stat(entry.path)
+            entry = entry._replace(size=st.st_size, mtime=st.st_mtime)
+        except OSError:
+            # 文件已不存在：照常产出任务，读取时失败并报告
+            pass
+        size = entry.size
+        if expected:
+            name, done = expected.popleft()
+            if name == arcname.replace(os.sep, "/") and done[1] == [size, entry.mtime]:
+                yield index, entry, arcname, 0, 0, True, _RESUMED, policy
+                continue
+            expected.clear()
+        method = policy.method_for(entry) if policy is not None else default
+        if method is None and size > chunk_size:
+            # 分块压缩的大文件要在拆分前确定方式；小文件在压缩线程中用读到的数据采样
+            try:
+                method = policy.method_for_sample(_read_sample(entry))
+            except OSError:
+                method = default
+        if method is not None and method[0] in STREAM_METHODS:
+            yield index, entry, arcname, 0, size, True, method, policy
+            continue
+        offset = 0
+        while True:
+            length = min(chunk_size, size - offset)
+            last = offset + length >= size
+            yield index, entry, arcname, offset, length, last, method, policy
+            if last:
+                break
+            offset += length
+
+
+def write_zip(archive_path, files, workers=None, level=DEFAULT_COMPRESS_LEVEL, chunk_size=DEFAULT_CHUNK_SIZE,
+              cancel=None, on_member=None, on_progress=None, policy=None, stats=None, checkpoint=None):
+    """多线程压缩并写出标准ZIP，返回成功写入的成员数
+
+    files为 [(Entry, 压缩包内名称), ...]，成员顺序与files一致，与线程数无关；
+    同一输入在任意线程数下生成的压缩包逐字节相同。
+    policy（CompressionPolicy）为每个文件选择压缩方式，为None时全部使用DEFLATE；
+    stats（CompressionStats）按分类累计大小和CPU时间。
+    on_member(序号, Entry, 名称, 异常或None, ZipMember或None) 在每个成员写完（或失败）后按顺序调用；
+    on_progress(已处理的原始字节数, Entry) 在每写入一块后调用。
+    files可以是生成器；大文件按chunk_size分块读取，在途的块数有上限，内存占用与文件大小无关。
+    checkpoint（BackupCheckpoint）定期记录已完成的成员；开头一段顺序一致且源文件未变的成员直接沿用，
+    压缩包截断到这些成员之后再继续写入，之后的旧成员（源文件已变化、已删除或前面插入了新文件）
+    连同数据一起丢弃，不会在压缩包中留下无用的数据。
+    """
+    workers = workers or default_backup_workers()
+    cancel = cancel or threading.Event()
+    on_member = on_member or (lambda *args: None)
+    on_progress = on_progress or (lambda *args: None)
+    written = 0
+    # 之前各文件已处理的字节数（失败的文件按扫描时的大小计入）
+    done_bytes = 0
+    failed_index = None
+    member = None
+    crc = compress_size = file_size = 0
+    cpu = 0.0
+
+    resumed = checkpoint.completed if checkpoint is not None else {}
+    reused = []
+    resume = ([done[0] for done in resumed.values()], checkpoint.offset) if resumed else None
+
+    def rewind():
+        """不再沿用旧成员：截断到最后一个沿用的成员之后"""
+        kept = {id(m) for m in reused}
+        stale = sorted((done[0] for done in resumed.values() if id(done[0]) not in kept),
+                       key=lambda m: m.header_offset)
+        if stale:
+            checkpoint.truncate(stale[0].header_offset)
+            writer.rewind(reused, stale[0].header_offset)
+
+    with ZipWriter(archive_path, resume=resume) as writer:
+        try:
+            jobs = _chunk_jobs(files, chunk_size, level, cancel, policy, resumed)
+            for job, result, error in run_ordered(_compress_chunk, jobs, workers):
+                index, entry, arcname, offset, length, last, method = job[:7]
+                if index == failed_index:
+                    continue
+                if method is not _RESUMED and resume is not None:
+                    rewind()
+                    resume = None
+                if method is _RESUMED:
+                    reused.append(resumed[arcname.replace(os.sep, "/")][0])
+                    written += 1
+                    done_bytes += entry.size
+                    on_progress(done_bytes, entry)
+                    on_member(index, entry, arcname, None, resumed[arcname.replace(os.sep, "/")][0])
+                    continue
+                if error is None:
+                    data, chunk_crc, raw, chunk_len, method, chunk_cpu = result
+                    if offset == 0:
+                        member = writer.begin_member(arcname, entry.mtime, compress_type=method[0],
+                                                     size_hint=entry.size)
+                        crc = compress_size = file_size = 0
+                        cpu = 0.0
+                    if isinstance(data, bytes):
+                        writer.write(data)
+                        compress_size += len(data)
+                    else:
+                        with data:
+                            for block in iter(lambda: data.read(DEFAULT_CHUNK_SIZE), b""):
+                                writer.write(block)
+                                compress_size += len(block)
+                    # 后续块在写入线程中接续计算CRC（zlib，C实现），按成员顺序进行
+                    crc = chunk_crc if raw is None else zlib.crc32(raw, crc)
+                    file_size += chunk_len
+                    cpu += chunk_cpu
+                    on_progress(done_bytes + file_size, entry)
+                    if not last:
+                        continue
+                    try:
+                        finished = writer.end_member(crc, compress_size, file_size)
+                        if checkpoint is not None:
+                            checkpoint.record(finished, writer.tell(), entry)
+                            checkpoint.maybe_sync(writer)
+                        member = None
+                        done_bytes += file_size
+                        written += 1
+                        if stats is not None:
+                            stats.add(policy.category(entry) if policy is not None else "",
+                                      method, file_size, compress_size, cpu)
+                    except Exception as e:
+                        error = e
+                if error is not None:
+                    # 读取失败：丢弃写了一半的成员，跳过该文件剩余的块
+                    if member is not None:
+                        writer.abort_member(member)
+                        member = None
+                    failed_index = index
+                    done_bytes += entry.size
+                    on_progress(done_bytes, entry)
+                on_member(index, entry, arcname, error, None if error is not None else finished)
+        finally:
+            if checkpoint is not None:
+                checkpoint.sync(writer)
+        if resume is not None and not cancel.is_set():
+            # 全部文件都已处理：末尾没有沿用的旧成员（源文件已删除）同样截断
+            rewind()
+    return written
@@ -0,0 +1,136 @@
+import json
+import os
+import time
+
+from .zipwriter import ZipMember
+
+CHECKPOINT_VERSION = 1
+PARTIAL_SUFFIX = ".partial"
+CHECKPOINT_SUFFIX = ".checkpoint.jsonl"
+DEFAULT_CHECKPOINT_INTERVAL = 5.0
+
+
+def partial_path_for(archive_path):
+    """备份完成前压缩包的临时文件名，完成后才改为正式文件名"""
+    return archive_path + PARTIAL_SUFFIX
+
+
+def checkpoint_path_for(archive_path):
+    return archive_path + CHECKPOINT_SUFFIX
+
+
+def find_checkpoint(backup_dir):
+    """返回目录中最近一次未完成备份的 (压缩包路径, 检查点路径)，没有时返回None"""
+    found = []
+    try:
+        names = os.listdir(backup_dir)
+    except FileNotFoundError:
+        return None
+    for name in names:
+        if name.endswith(".zip" + CHECKPOINT_SUFFIX):
+            archive_path = os.path.join(backup_dir, name[:-len(CHECKPOINT_SUFFIX)])
+            if os.path.exists(partial_path_for(archive_path)):
+                found.append((archive_path, os.path.join(backup_dir, name)))
+    return max(found) if found else None
+
+
+def remove_checkpoint(archive_path):
+    """删除未完成备份留下的临时压缩包和检查点"""
+    for path in (partial_path_for(archive_path), checkpoint_path_for(archive_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class BackupCheckpoint:
+    """只追加的备份检查点（JSON Lines），备份中断后可以从最后一个检查点继续
+
+    每写完一个成员先记在内存中，按时间间隔把压缩包fsync之后才写入检查点并fsync，
+    因此检查点中记录的成员在压缩包中一定完整。
+
+    文件格式：
+        {"checkpoint": 1, "timestamp": ..., "archive": ..., "base": 上次备份清单或null}  头部
+        {"m": [成员信息...], "end": 成员结束位置, "src": [大小, 修改时间]}               已完成的成员
+        {"truncate": 位置}                        续传时压缩包被截断到该位置，之后的成员作废
+    """
+
+    def __init__(self, path, header, completed=None, offset=0, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.path = path
+        self.header = header
+        # 成员名 -> (ZipMember, [源文件大小, 修改时间])
+        self.completed = completed or {}
+        self.offset = offset
+        self.interval = interval
+        self._pending = []
+        self._last_sync = time.monotonic()
+        if completed is None:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._file.write(json.dumps(header, ensure_ascii=False) + "\n")
+        else:
+            self._file = open(path, 'a', encoding='utf-8')
+
+    @classmethod
+    def create(cls, archive_path, timestamp, base, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """为新的备份创建检查点，base为增量备份基于的清单文件名（完整备份为None）"""
+        header = {"checkpoint": CHECKPOINT_VERSION, "timestamp": timestamp,
+                  "archive": os.path.basename(archive_path), "base": base}
+        return cls(checkpoint_path_for(archive_path), header, interval=interval)
+
+    @classmethod
+    def load(cls, path, archive_size, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """读取检查点继续写入；末尾不完整的行和超出压缩包实际大小的成员被忽略"""
+        header = None
+        completed = {}
+        ends = {}
+        offset = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    continue
+                if "checkpoint" in obj:
+                    header = obj
+                elif "truncate" in obj:
+                    offset = min(offset, obj["truncate"])
+                    completed = {name: done for name, done in completed.items() if ends[name] <= offset}
+                elif "m" in obj and obj["end"] <= archive_size:
+                    member = ZipMember.from_record(obj["m"])
+                    completed[member.name] = (member, obj["src"])
+                    ends[member.name] = obj["end"]
+                    offset = max(offset, obj["end"])
+        if header is None or header.get("checkpoint") != CHECKPOINT_VERSION:
+            raise ValueError(f"无法识别的备份检查点: {path}")
+        return cls(path, header, completed, offset, interval)
+
+    def record(self, member, end, entry):
+        """记录一个已写完的成员（在下次同步时写入检查点）"""
+        self._pending.append({"m": member.to_record(), "end": end, "src": [entry.size, entry.mtime]})
+
+    def truncate(self, offset):
+        """记录压缩包将被截断到offset（在实际截断之前落盘），之后的成员不能再沿用"""
+        self._pending = [obj for obj in self._pending if obj["end"] <= offset]
+        self._file.write(json.dumps({"truncate": offset}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.offset = offset
+
+    def maybe_sync(self, writer):
+        if self._pending and time.monotonic() - self._last_sync >= self.interval:
+            self.sync(writer)
+
+    def sync(self, writer):
+        """先把压缩包数据落盘，再写入并落盘检查点"""
+        if self._pending:
+            writer.sync()
+            for obj in self._pending:
+                self._file.write(json.dumps(obj, ensure_ascii=False) + "\n")
+            self._pending = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
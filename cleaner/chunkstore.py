@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+
+from .manifest import safe_target, manifest_key
+from .mover import run_ordered
+
+STORE_VERSION = 1
+STORE_MARKER = "store.json"
+DEFAULT_MIN_CHUNK = 16 * 1024
+DEFAULT_AVG_BITS = 16
+DEFAULT_MAX_CHUNK = 256 * 1024
+READ_BLOCK = 4 * 1024 * 1024
+DIGEST_SIZE = 32
+# 先压缩块开头的一小段试探，压不动（已压缩的安装包、图片、视频）时直接原样保存
+COMPRESS_SAMPLE = 8 * 1024
+COMPRESS_SAMPLE_RATIO = 0.95
+
+# 内容定义分块：每个字节经查表映射为1个比特，连续avg_bits个字节的比特序列
+# 等于固定锚点时切分。查表和查找都在C中完成（bytes.translate/bytes.find），
+# 切分位置只取决于附近的内容，文件中间插入数据只影响插入处附近的块。
+_BIT_TABLE = bytes(b & 1 for b in hashlib.shake_128(b"desktop-cleaner chunk table").digest(256))
+
+
+def _anchor(bits):
+    return bytes(b & 1 for b in hashlib.shake_128(b"desktop-cleaner chunk anchor").digest(bits))
+
+
+def is_store(path):
+    """目录是否为去重备份仓库"""
+    return os.path.isfile(os.path.join(path, STORE_MARKER))
+
+
+def iter_chunks(f, min_size=DEFAULT_MIN_CHUNK, avg_bits=DEFAULT_AVG_BITS, max_size=DEFAULT_MAX_CHUNK):
+    """按内容定义的边界把文件对象切成块，逐块产出bytes（内存占用与文件大小无关）"""
+    anchor = _anchor(avg_bits)
+    buf = b""
+    bits = b""
+    pos = 0
+    eof = False
+    while True:
+        # 缓冲区中至少保留一个最大块的数据
+        if not eof and len(buf) - pos < max_size:
+            data = f.read(READ_BLOCK)
+            if data:
+                buf = buf[pos:] + data
+                bits = bits[pos:] + data.translate(_BIT_TABLE)
+                pos = 0
+            else:
+                eof = True
+        available = len(buf) - pos
+        if available == 0:
+            return
+        end = pos + min(max_size, available)
+        found = bits.find(anchor, pos + max(min_size - avg_bits, 0), end)
+        if found >= 0:
+            cut = found + avg_bits
+        elif end - pos == max_size or eof:
+            cut = end
+        else:
+            continue
+        yield buf[pos:cut]
+        pos = cut
+
+
+class ChunkStore:
+    """按内容寻址的去重备份仓库
+
+    目录结构：
+        store.json               仓库参数（分块参数固定，保证多次备份之间能去重）
+        chunks/ab/abcdef...      每个唯一的块只保存一次，以blake2b摘要命名（可能经zlib压缩）
+        snapshots/<时间戳>.json   每次备份的快照：路径 -> [大小, 修改时间, [块摘要...]]
+    """
+
+    def __init__(self, root, create=False, level=zlib.Z_DEFAULT_COMPRESSION):
+        self.root = root
+        self.level = level
+        marker = os.path.join(root, STORE_MARKER)
+        if not os.path.exists(marker):
+            if not create:
+                raise FileNotFoundError(f"不是去重备份仓库: {root}")
+            os.makedirs(os.path.join(root, "chunks"), exist_ok=True)
+            os.makedirs(os.path.join(root, "snapshots"), exist_ok=True)
+            self.params = {"min_size": DEFAULT_MIN_CHUNK, "avg_bits": DEFAULT_AVG_BITS,
+                           "max_size": DEFAULT_MAX_CHUNK}
+            with open(marker, 'w', encoding='utf-8') as f:
+                json.dump({"version": STORE_VERSION, "chunking": self.params}, f)
+        else:
+            with open(marker, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            if info.get("version") != STORE_VERSION:
+                raise ValueError(f"不支持的仓库版本: {info.get('version')}")
+            self.params = info["chunking"]
+        self._known = None
+        self._made_dirs = set()
+        self._lock = threading.Lock()
+
+    # ---- 块 ----
+
+    def chunk_path(self, digest):
+        return os.path.join(self.root, "chunks", digest[:2], digest)
+
+    def known_chunks(self):
+        """仓库中已有的块摘要集合（首次使用时列一次目录）"""
+        if self._known is None:
+            known = set()
+            chunks_dir = os.path.join(self.root, "chunks")
+            for sub in os.scandir(chunks_dir):
+                if sub.is_dir():
+                    known.update(name for name in os.listdir(sub.path) if not name.endswith(".tmp"))
+            self._known = known
+        return self._known
+
+    def put(self, data):
+        """保存一个块，返回 (摘要, 新写入的字节数)；已存在的块不重复写入"""
+        digest = hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+        known = self.known_chunks()
+        if digest in known:
+            return digest, 0
+        payload = b"\x00" + data
+        sample = data[:COMPRESS_SAMPLE]
+        if len(zlib.compress(sample, self.level)) < len(sample) * COMPRESS_SAMPLE_RATIO:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                payload = b"\x01" + compressed
+        path = self.chunk_path(digest)
+        parent = os.path.dirname(path)
+        if parent not in self._made_dirs:
+            os.makedirs(parent, exist_ok=True)
+            self._made_dirs.add(parent)
+        # 先写临时文件再改名：并发写入同一个块时结果相同，不会出现半个块
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        with self._lock:
+            known.add(digest)
+        return digest, len(payload)
+
+    def get(self, digest):
+        with open(self.chunk_path(digest), 'rb') as f:
+            payload = f.read()
+        data = zlib.decompress(payload[1:]) if payload[:1] == b"\x01" else payload[1:]
+        if hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest() != digest:
+            raise ValueError(f"数据块已损坏: {digest}")
+        return data
+
+    def ingest_file(self, path):
+        """把文件切块存入仓库，返回 (块摘要列表, 原始字节数, 新写入的字节数)"""
+        digests = []
+        size = 0
+        stored = 0
+        with open(path, 'rb') as f:
+            for chunk in iter_chunks(f, **self.params):
+                digest, written = self.put(chunk)
+                digests.append(digest)
+                size += len(chunk)
+                stored += written
+        return digests, size, stored
+
+    # ---- 快照 ----
+
+    def _snapshot_path(self, snapshot_id):
+        return os.path.join(self.root, "snapshots", f"{snapshot_id}.json")
+
+    def list_snapshots(self):
+        """按时间戳升序返回快照ID列表"""
+        names = os.listdir(os.path.join(self.root, "snapshots"))
+        return sorted(name[:-5] for name in names if name.endswith(".json"))
+
+    def load_snapshot(self, snapshot_id):
+        with open(self._snapshot_path(snapshot_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_snapshot(self, snapshot_id, files):
+        """写入快照清单：files为 {路径: [大小, 修改时间, [块摘要...]]}"""
+        snapshot = {
+            "version": STORE_VERSION,
+            "timestamp": snapshot_id,
+            "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "files": files,
+        }
+        path = self._snapshot_path(snapshot_id)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        return path
+
+    def delete_snapshot(self, snapshot_id):
+        """删除快照（其中的块在gc时才会被回收）"""
+        os.remove(self._snapshot_path(snapshot_id))
+
+    def snapshot(self, snapshot_id, files, workers=1, previous=None, cancel=None, on_file=None):
+        """把 [(Entry, 名称), ...] 存为一个快照，返回 (快照路径, 统计信息)
+
+        previous为上一个快照时，大小和修改时间未变的文件直接沿用其块列表，不再读取。
+        on_file(序号, Entry, 名称, 异常或None) 按顺序调用。取消时不写入快照。
+        """
+        previous_files = previous["files"] if previous else {}
+        stats = {"files": 0, "reused": 0, "bytes": 0, "stored_bytes": 0, "errors": 0}
+        result = {}
+
+        def job(item):
+            index, (entry, arcname) = item
+            old = previous_files.get(manifest_key(arcname))
+            if old is not None and old[0] == entry.size and old[1] == entry.mtime:
+                return old[2], entry.size, 0, True
+            digests, size, stored = self.ingest_file(entry.path)
+            return digests, size, stored, False
+
+        def items():
+            for item in enumerate(files):
+                if cancel is not None and cancel.is_set():
+                    return
+                yield item
+
+        for (index, (entry, arcname)), value, error in run_ordered(job, items(), workers):
+            if error is None:
+                digests, size, stored, reused = value
+                result[manifest_key(arcname)] = [size, entry.mtime, digests]
+                stats["files"] += 1
+                stats["reused"] += reused
+                stats["bytes"] += size
+                stats["stored_bytes"] += stored
+            else:
+                stats["errors"] += 1
+            if on_file is not None:
+                on_file(index, entry, arcname, error)
+
+        if cancel is not None and cancel.is_set():
+            return None, stats
+        return self.write_snapshot(snapshot_id, result), stats
+
+    def restore(self, snapshot_id, dest_dir, progress=None, log=None, cancel=None):
+        """把快照中的全部文件还原到dest_dir，返回还原文件数（progress为ProgressTracker）"""
+        log = log or (lambda message: None)
+        files = self.load_snapshot(snapshot_id)["files"]
+        done = 0
+        if progress is not None:
+            progress.start(len(files), sum(value[0] for value in files.values()))
+        for key, (size, mtime, digests) in files.items():
+            if cancel is not None and cancel.is_set():
+                break
+            try:
+                target = safe_target(dest_dir, key)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as f:
+                    for digest in digests:
+                        f.write(self.get(digest))
+                os.utime(target, (mtime, mtime))
+            except Exception as e:
+                log(f"还原失败: {key} - {e}")
+            else:
+                done += 1
+            if progress is not None:
+                progress.advance(1, size, key)
+        return done
+
+    def gc(self):
+        """删除没有任何快照引用的块，返回 (删除的块数, 释放的字节数)"""
+        referenced = set()
+        for snapshot_id in self.list_snapshots():
+            for size, mtime, digests in self.load_snapshot(snapshot_id)["files"].values():
+                referenced.update(digests)
+        removed = 0
+        freed = 0
+        chunks_dir = os.path.join(self.root, "chunks")
+        for sub in os.scandir(chunks_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                # 中断留下的临时文件一并清理
+                name = entry.name
+                if name.endswith(".tmp") or name not in referenced:
+                    freed += entry.stat().st_size
+                    os.remove(entry.path)
+                    removed += 1
+        self._known = None
+        return removed, freed
+
+    def usage(self):
+        """仓库中块文件的数量和总字节数"""
+        count = 0
+        total = 0
+        for sub in os.scandir(os.path.join(self.root, "chunks")):
+            if sub.is_dir():
+                for entry in os.scandir(sub.path):
+                    count += 1
+                    total += entry.stat().st_size
+        return count, total
@@ -0,0 +1,155 @@
+from .rules import RuleSet
+
+FOLDER_MARKER = "__FOLDER__"
+DEFAULT_FOLDER_CATEGORY = "📂 桌面文件夹"
+DEFAULT_OTHER_CATEGORY = "📁 其他"
+
+
+def _normalize_ext(ext):
+    """统一扩展名格式：小写、以点开头"""
+    ext = ext.strip().lower()
+    if ext and not ext.startswith("."):
+        ext = "." + ext
+    return ext
+
+
+class CategoryClassifier:
+    """由配置一次性编译出的扩展名索引，分类和排除判断均为O(1)查表
+
+    支持 .tar.gz 这类多段扩展名（最长匹配优先），扩展名不区分大小写。
+    同一扩展名出现在多个分类中时，与旧版一致取配置中靠前的分类。
+    分类配置中的 "rules"（文件名通配符/正则/前缀、大小、修改时间，见rules.RuleSet）优先于扩展名。
+    """
+
+    def __init__(self, config):
+        categories = config["categories"]
+
+        ext_index = {}
+        folder_category = None
+        for category_name, category_info in categories.items():
+            for ext in category_info.get("extensions", []):
+                if ext == FOLDER_MARKER:
+                    if folder_category is None:
+                        folder_category = category_name
+                    continue
+                ext = _normalize_ext(ext)
+                if ext:
+                    ext_index.setdefault(ext, category_name)
+        self.ext_index = ext_index
+        self.excluded = frozenset(_normalize_ext(ext) for ext in config.get("excluded_extensions", []) if ext.strip())
+        self.category_names = frozenset(categories)
+        self.folder_category = folder_category or DEFAULT_FOLDER_CATEGORY
+
+        # "其他"分类：第一个名称包含"其他"的分类
+        self.other_category = DEFAULT_OTHER_CATEGORY
+        for category_name in categories:
+            if "其他" in category_name:
+                self.other_category = category_name
+                break
+
+        # 多段扩展名的最大段数（.tar.gz 为2段）
+        self.max_parts = max([ext.count(".") for ext in list(ext_index) + list(self.excluded)] or [1])
+
+        self.include_folders_in_organize = config.get("include_folders_in_organize", False)
+        self.include_folders_in_backup = config.get("include_folders_in_backup", False)
+        self.max_size_bytes = config["max_file_size_mb"] * 1024 * 1024
+        # 没有配置规则时为None，分类只需查扩展名索引
+        self.rules = RuleSet(categories) or None
+        self.time_dependent = self.rules is not None and self.rules.time_dependent
+
+    @property
+    def signature(self):
+        """分类规则的指纹，规则变化后按分类缓存的结果全部作废"""
+        return repr((sorted(self.ext_index.items()), self.other_category, self.folder_category,
+                     self.include_folders_in_organize, self.rules.signature if self.rules else None))
+
+    def suffixes(self, name):
+        """返回文件名可能的扩展名，从最长到最短（均为小写）"""
+        # 与os.path.splitext一致：忽略开头的点（如 .bashrc 没有扩展名）
+        stripped = name.lower().lstrip(".")
+        parts = stripped.rsplit(".", self.max_parts)
+        return ["." + ".".join(parts[-n:]) for n in range(len(parts) - 1, 0, -1)]
+
+    def lookup(self, name, index):
+        """在索引中查找文件名的扩展名，返回匹配的值或None"""
+        stripped = name.lower().lstrip(".")
+        dot = stripped.rfind(".")
+        if dot < 0:
+            return None
+        if self.max_parts == 1:
+            return index.get(stripped[dot:])
+        for suffix in self.suffixes(name):
+            value = index.get(suffix)
+            if value is not None:
+                return value
+        return None
+
+    def is_excluded(self, name):
+        """判断文件名是否属于排除的扩展名"""
+        if self.max_parts == 1:
+            stripped = name.lower().lstrip(".")
+            dot = stripped.rfind(".")
+            return dot >= 0 and stripped[dot:] in self.excluded
+        return any(suffix in self.excluded for suffix in self.suffixes(name))
+
+    def should_skip(self, entry, for_organize=True):
+        """根据扫描记录判断是否应该跳过"""
+        # 根据操作类型决定是否跳过文件夹
+        if entry.is_dir:
+            if for_organize:
+                return not self.include_folders_in_organize
+            return not self.include_folders_in_backup
+
+        # 跳过排除的扩展名
+        if self.is_excluded(entry.name):
+            return True
+
+        # 跳过大文件
+        return entry.size > self.max_size_bytes
+
+    def category_of(self, entry):
+        """获取单个扫描记录的分类"""
+        # 如果是文件夹且启用了文件夹整理，返回桌面文件夹分类
+        if entry.is_dir and self.include_folders_in_organize:
+            return self.folder_category
+        if self.rules is not None:
+            category = self.rules.match([entry])[0]
+            if category is not None:
+                return category
+        return self.lookup(entry.name, self.ext_index) or self.other_category
+
+    def classify(self, entries):
+        """批量分类，entries可以是Entry或纯文件名，返回分类名称列表"""
+        return self.classify_with_rules(entries)[0]
+
+    def classify_with_rules(self, entries):
+        """与classify相同，另外返回由规则决定分类的条目下标集合"""
+        ext_index = self.ext_index
+        other = self.other_category
+        folder_category = self.folder_category if self.include_folders_in_organize else None
+        single = self.max_parts == 1
+        result = []
+        append = result.append
+        for entry in entries:
+            if isinstance(entry, str):
+                name = entry
+            else:
+                if entry.is_dir and folder_category is not None:
+                    append(folder_category)
+                    continue
+                name = entry.name
+            if single:
+                stripped = name.lower().lstrip(".")
+                dot = stripped.rfind(".")
+                category = ext_index.get(stripped[dot:]) if dot >= 0 else None
+            else:
+                category = self.lookup(name, ext_index)
+            append(category or other)
+        ruled = set()
+        if self.rules is not None:
+            # 规则优先于扩展名（文件夹不参与规则匹配）
+            for index, category in enumerate(self.rules.match(entries)):
+                if category is not None and result[index] != folder_category:
+                    result[index] = category
+                    ruled.add(index)
+        return result, ruled
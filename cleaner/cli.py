@@ -0,0 +1,322 @@
+import argparse
+import hashlib
+import os
+import sys
+from datetime import datetime
+
+from .config import DEFAULT_CONFIG_FILE, load_config
+from .engine import CleanerEngine
+from .journal import journal_path_for
+from .paths import get_desktop_path
+from .progress import describe
+from .watcher import DesktopWatcher
+
+
+def _make_logger(quiet):
+    """创建命令行日志输出函数"""
+    def log(message):
+        if not quiet:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            print(f"[{timestamp}] {message}")
+    return log
+
+
+def _make_progress(label, quiet, stream=None):
+    """创建输出到stderr的进度回调（-q时不输出）
+
+    终端中在同一行刷新（回调频率已由进度模型限制），
+    输出被重定向时每完成10%输出一行，避免日志文件被进度刷屏。
+    """
+    if quiet:
+        return None
+    stream = stream or sys.stderr
+    interactive = stream.isatty()
+    state = {"step": -1, "width": 0}
+
+    def progress(snapshot):
+        text = f"{label} {describe(snapshot)}"
+        if interactive:
+            # 用空格覆盖上一次更长的输出
+            stream.write("\r" + text.ljust(state["width"]))
+            state["width"] = len(text)
+            if snapshot.finished:
+                stream.write("\n")
+            stream.flush()
+            return
+        fraction = snapshot.fraction
+        step = int(fraction * 10) if fraction is not None else state["step"]
+        if step > state["step"] or snapshot.finished:
+            state["step"] = step
+            print(text, file=stream)
+    return progress
+
+
+def _history_path(args):
+    """历史速度文件（用于预估耗时）与配置文件放在同一目录"""
+    return os.path.join(os.path.dirname(os.path.abspath(args.config)), "throughput.json")
+
+
+def _scan_cache_path(args):
+    """目录快照数据库（配置scan_cache开启时使用）与配置文件放在同一目录"""
+    return os.path.join(os.path.dirname(os.path.abspath(args.config)), "scan_cache.db")
+
+
+def _print_estimate(label, estimate):
+    """输出预检结果，空间不足时返回False"""
+    print(f"{label}:")
+    for line in estimate.report():
+        print(f"  {line}")
+    for path, required, free in estimate.shortfalls:
+        print(f"{label}: 剩余空间不足: {path}", file=sys.stderr)
+    return estimate.fits
+
+
+def _record_path_for(args, desktop_path, timestamp):
+    """确定某个桌面目录的整理记录保存位置
+
+    同名目录（如 /a/Desktop 和 /b/Desktop）在同一秒内整理时记录不能互相覆盖：
+    文件名中带有目录绝对路径的短哈希，仍然重名时（同一目录列出两次）追加序号。
+    """
+    if args.record:
+        return args.record
+    abs_path = os.path.abspath(desktop_path)
+    name = os.path.basename(os.path.normpath(abs_path)) or "desktop"
+    digest = hashlib.blake2b(os.path.normcase(abs_path).encode("utf-8", "surrogatepass"), digest_size=4).hexdigest()
+    base = os.path.join(args.record_dir, f"{name}_{digest}_桌面整理记录_{timestamp}")
+    path = base + ".json"
+    index = 2
+    while os.path.exists(path) or os.path.exists(journal_path_for(path)):
+        path = f"{base}_{index}.json"
+        index += 1
+    return path
+
+
+def cmd_organize(args, config, log):
+    if not args.preflight and not (args.record or args.record_dir):
+        print("请使用 --record 或 --record-dir 指定整理记录的保存位置（--preflight 除外）", file=sys.stderr)
+        return 2
+    if args.record and len(args.desktops) > 1:
+        print("整理多个目录时请使用 --record-dir 指定记录保存目录", file=sys.stderr)
+        return 2
+    if args.record_dir and not args.preflight:
+        os.makedirs(args.record_dir, exist_ok=True)
+    if args.workers:
+        config["move_workers"] = args.workers
+
+    failed = 0
+    for desktop_path in args.desktops:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        engine = CleanerEngine(config, desktop_path, log=log, history_path=_history_path(args),
+                               scan_cache_path=_scan_cache_path(args))
+        try:
+            if args.preflight:
+                if not _print_estimate(desktop_path, engine.preflight_organize()):
+                    failed += 1
+                continue
+            summary = engine.organize(_record_path_for(args, desktop_path, timestamp),
+                                     legacy_record_path=args.legacy_record,
+                                     timestamp=timestamp, progress=_make_progress("整理", args.quiet))
+            print(f"{desktop_path}: 共整理了 {summary['total_files']} 个文件")
+        except Exception as e:
+            print(f"{desktop_path}: 整理失败: {e}", file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+
+def cmd_backup(args, config, log):
+    if args.preflight and not args.dest:
+        print("预检只支持 --dest（ZIP备份）", file=sys.stderr)
+        return 2
+    if args.dest and not args.preflight:
+        os.makedirs(args.dest, exist_ok=True)
+    if args.workers:
+        config["backup_workers"] = args.workers
+    if args.incremental:
+        config["incremental_backup"] = True
+    if args.verify:
+        config["backup_verify"] = True
+    failed = 0
+    for desktop_path in args.desktops:
+        engine = CleanerEngine(config, desktop_path, log=log, history_path=_history_path(args),
+                               scan_cache_path=_scan_cache_path(args))
+        try:
+            if args.preflight:
+                if not _print_estimate(desktop_path, engine.preflight_backup(args.dest)):
+                    failed += 1
+            elif args.store:
+                snapshot_id, stats = engine.backup_to_store(args.store, progress=_make_progress("备份", args.quiet))
+                print(f"{desktop_path}: 共备份了 {stats['files']} 个文件 -> {args.store} 快照 {snapshot_id}")
+            else:
+                backup_filepath, backup_count = engine.backup(args.dest, progress=_make_progress("备份", args.quiet))
+                print(f"{desktop_path}: 共备份了 {backup_count} 个文件 -> {backup_filepath}")
+        except Exception as e:
+            print(f"{desktop_path}: 备份失败: {e}", file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+
+def cmd_restore(args, config, log):
+    engine = CleanerEngine(config, args.desktop, log=log, history_path=_history_path(args),
+                           scan_cache_path=_scan_cache_path(args))
+    failed = 0
+    for record_path in args.records:
+        try:
+            result = engine.restore(record_path, progress=_make_progress("恢复", args.quiet))
+            print(f"{record_path}: 共恢复了 {result['restored_count']} 个文件")
+        except Exception as e:
+            print(f"{record_path}: 恢复失败: {e}", file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+
+def cmd_watch(args, config, log):
+    engine = CleanerEngine(config, args.desktop, log=log, history_path=_history_path(args),
+                           scan_cache_path=_scan_cache_path(args))
+    try:
+        watcher = DesktopWatcher(engine, args.record_dir, debounce=args.debounce, batch_size=args.batch,
+                                 backend=args.backend)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"正在监视 {args.desktop}，按 Ctrl+C 停止", file=sys.stderr)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"{args.desktop}: 监视失败: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.desktop}: 共自动整理了 {watcher.organized} 个文件（{watcher.batches} 批）")
+    return 0
+
+
+def cmd_restore_backup(args, config, log):
+    engine = CleanerEngine(config, args.dest, log=log)
+    try:
+        restored, missing = engine.restore_backup(args.source, args.dest, at=args.at,
+                                                  progress=_make_progress("还原", args.quiet))
+    except Exception as e:
+        print(f"{args.source}: 还原失败: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.source}: 共还原了 {restored} 个文件 -> {args.dest}")
+    if missing:
+        print(f"缺少 {len(missing)} 个备份文件: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_verify(args, config, log):
+    if args.workers:
+        config["backup_workers"] = args.workers
+    engine = CleanerEngine(config, os.path.dirname(os.path.abspath(args.source)), log=log)
+    try:
+        results = engine.verify_backup(args.source, progress=_make_progress("校验", args.quiet))
+    except Exception as e:
+        print(f"{args.source}: 校验失败: {e}", file=sys.stderr)
+        return 1
+    failed = 0
+    for archive_path, result in results.items():
+        if result["errors"]:
+            failed += 1
+            print(f"{archive_path}: {len(result['errors'])} 个问题", file=sys.stderr)
+            for member, reason in result["errors"]:
+                print(f"  {member}: {reason}", file=sys.stderr)
+        else:
+            print(f"{archive_path}: 校验通过（{result['members']} 个文件）")
+    return 1 if failed else 0
+
+
+def cmd_prune_store(args, config, log):
+    engine = CleanerEngine(config, args.store, log=log)
+    try:
+        expired, removed, freed = engine.prune_store(args.store, args.keep)
+    except Exception as e:
+        print(f"{args.store}: 清理失败: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.store}: 删除了 {expired} 个快照、{removed} 个数据块，释放 {freed / 1024 / 1024:.1f} MB")
+    return 0
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="python -m cleaner",
+                                     description="桌面整理工具命令行版本（无界面批量执行）")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_FILE,
+                        help="配置文件路径（默认使用程序目录下的config.json）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不输出逐个文件的日志")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    organize = subparsers.add_parser("organize", help="整理目录中的文件到分类文件夹")
+    organize.add_argument("desktops", nargs="*", metavar="DIR", help="要整理的目录（默认为当前用户桌面）")
+    group = organize.add_mutually_exclusive_group()
+    group.add_argument("--record", help="整理记录文件保存路径（仅整理单个目录时可用）")
+    group.add_argument("--record-dir", help="整理记录保存目录，每个目录生成一个记录文件")
+    organize.add_argument("--legacy-record", help="同时写入旧格式备份记录（backup_record.json）的路径")
+    organize.add_argument("--workers", type=int, help="并发移动的线程数（默认读取配置move_workers）")
+    organize.add_argument("--preflight", action="store_true",
+                          help="只预检：统计各分类的大小和跨卷移动、检查剩余空间并预估耗时，不移动文件")
+    organize.set_defaults(func=cmd_organize)
+
+    watch = subparsers.add_parser("watch", help="持续监视目录，新出现的文件自动整理到分类文件夹")
+    watch.add_argument("desktop", nargs="?", default=None, metavar="DIR", help="要监视的目录（默认为当前用户桌面）")
+    watch.add_argument("--record-dir", required=True, help="整理记录保存目录（不能是被监视的目录），每批生成一个记录文件")
+    watch.add_argument("--debounce", type=float, help="最后一次变化后等待的秒数（默认读取配置watch_debounce，2秒）")
+    watch.add_argument("--batch", type=int, help="每批整理的最大条目数（默认读取配置watch_batch_size，50）")
+    watch.add_argument("--backend", choices=["auto", "inotify", "poll"],
+                       help="监视方式（默认读取配置watch_backend：Linux下inotify，其他系统轮询）")
+    watch.set_defaults(func=cmd_watch)
+
+    backup = subparsers.add_parser("backup", help="将目录中的文件打包为ZIP备份")
+    backup.add_argument("desktops", nargs="*", metavar="DIR", help="要备份的目录（默认为当前用户桌面）")
+    target = backup.add_mutually_exclusive_group(required=True)
+    target.add_argument("--dest", help="备份文件保存目录")
+    target.add_argument("--store", help="去重备份仓库目录（不存在时自动创建），每次备份生成一个快照")
+    backup.add_argument("--workers", type=int, help="并发压缩的线程数（默认读取配置backup_workers，0为CPU核心数）")
+    backup.add_argument("--incremental", action="store_true",
+                        help="增量备份：只写入自上次备份以来新增或修改的文件")
+    backup.add_argument("--verify", action="store_true", help="备份完成后解压校验压缩包中的每个文件")
+    backup.add_argument("--preflight", action="store_true",
+                        help="只预检：统计需要备份的大小、检查剩余空间并预估耗时，不写入备份")
+    backup.set_defaults(func=cmd_backup)
+
+    restore_backup = subparsers.add_parser("restore-backup", help="从备份（含增量备份链）还原某一时间点的文件")
+    restore_backup.add_argument("source", help="备份目录、备份清单(.manifest.json)、备份压缩包或去重备份仓库")
+    restore_backup.add_argument("--dest", required=True, help="还原到的目录")
+    restore_backup.add_argument("--at", help="还原不晚于该时间戳（如20250101_120000）的最近一次备份")
+    restore_backup.set_defaults(func=cmd_restore_backup)
+
+    verify = subparsers.add_parser("verify", help="解压校验备份压缩包（与备份清单核对CRC、大小）")
+    verify.add_argument("source", help="备份压缩包或备份目录（校验其中全部压缩包）")
+    verify.add_argument("--workers", type=int, help="并行校验的线程数（默认读取配置backup_workers，0为CPU核心数）")
+    verify.set_defaults(func=cmd_verify)
+
+    prune_store = subparsers.add_parser("prune-store", help="删除去重备份仓库中的旧快照并回收不再使用的数据块")
+    prune_store.add_argument("store", help="去重备份仓库目录")
+    prune_store.add_argument("--keep", type=int, default=0, help="保留最近的快照数（默认0：不删除快照，只回收数据块）")
+    prune_store.set_defaults(func=cmd_prune_store)
+
+    restore = subparsers.add_parser("restore", help="根据整理记录恢复文件")
+    restore.add_argument("records", nargs="+", metavar="RECORD", help="整理记录文件")
+    restore.add_argument("--desktop", default=None, help="恢复到的目录（默认为当前用户桌面）")
+    restore.set_defaults(func=cmd_restore)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+    except Exception as e:
+        print(f"加载配置失败: {e}", file=sys.stderr)
+        return 2
+
+    if getattr(args, "desktops", None) == []:
+        args.desktops = [get_desktop_path()]
+    if getattr(args, "desktop", "") is None:
+        args.desktop = get_desktop_path()
+
+    return args.func(args, config, _make_logger(args.quiet))
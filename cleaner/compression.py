@@ -0,0 +1,207 @@
+import lzma
+import math
+import struct
+import zipfile
+import zlib
+from collections import Counter
+
+# 采样判断时读取的文件开头字节数
+SAMPLE_SIZE = 16 * 1024
+# 采样的字节熵（比特/字节）不低于该值时视为已压缩数据，直接存储
+STORE_ENTROPY = 7.5
+
+# 本身已经压缩过的格式，不必采样直接存储
+COMPRESSED_EXTENSIONS = frozenset([
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".mp4", ".mkv", ".mov", ".avi", ".wmv", ".flv", ".webm", ".m4v",
+    ".mp3", ".aac", ".ogg", ".flac", ".wma", ".m4a", ".opus",
+    ".zip", ".rar", ".7z", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".cab",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub", ".jar", ".apk",
+])
+
+STORED = (zipfile.ZIP_STORED, None)
+_METHOD_NAMES = {
+    zipfile.ZIP_STORED: "STORED",
+    zipfile.ZIP_DEFLATED: "DEFLATE",
+    zipfile.ZIP_BZIP2: "BZIP2",
+    zipfile.ZIP_LZMA: "LZMA",
+}
+# BZIP2/LZMA 是有状态的整体压缩流，不能像DEFLATE那样分块并行
+STREAM_METHODS = frozenset([zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA])
+
+
+# ZIP中LZMA成员的格式（APPNOTE 5.8.8）：LZMA SDK版本（2字节）、属性长度（2字节）、
+# LZMA1属性（lc/lp/pb和字典大小，5字节），之后为带结束标记的原始LZMA1流
+_LZMA_SDK_VERSION = (9, 4)
+_LZMA_OPTIONS = {"lc": 3, "lp": 0, "pb": 2, "dict_size": 1 << 23}
+_LZMA_PROPS = struct.Struct("<BI")
+
+
+class LZMACompressor:
+    """ZIP格式的LZMA压缩：公开的lzma模块压缩原始LZMA1流，输出前加上ZIP要求的属性头"""
+
+    def __init__(self, preset=6):
+        options = _LZMA_OPTIONS
+        self._compressor = lzma.LZMACompressor(lzma.FORMAT_RAW,
+                                               filters=[dict(options, id=lzma.FILTER_LZMA1, preset=preset)])
+        props = _LZMA_PROPS.pack((options["pb"] * 5 + options["lp"]) * 9 + options["lc"], options["dict_size"])
+        self._header = struct.pack("<BBH", *_LZMA_SDK_VERSION, len(props)) + props
+
+    def _with_header(self, data):
+        header, self._header = self._header, b""
+        return header + data
+
+    def compress(self, data):
+        return self._with_header(self._compressor.compress(data))
+
+    def flush(self):
+        return self._with_header(self._compressor.flush())
+
+
+class LZMADecompressor:
+    """ZIP格式的LZMA解压：读出属性头后交给lzma模块，max_length限制每次输出的大小"""
+
+    def __init__(self):
+        self._decompressor = None
+        self._header = b""
+
+    @property
+    def eof(self):
+        return self._decompressor is not None and self._decompressor.eof
+
+    @property
+    def needs_input(self):
+        return self._decompressor is None or self._decompressor.needs_input
+
+    def decompress(self, data, max_length=-1):
+        if self._decompressor is None:
+            self._header += data
+            if len(self._header) < 4:
+                return b""
+            props_size = struct.unpack_from("<H", self._header, 2)[0]
+            if props_size < _LZMA_PROPS.size:
+                raise lzma.LZMAError("LZMA属性头损坏")
+            if len(self._header) < 4 + props_size:
+                return b""
+            props, dict_size = _LZMA_PROPS.unpack_from(self._header, 4)
+            if props >= 9 * 5 * 5:
+                raise lzma.LZMAError("LZMA属性头损坏")
+            self._decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=[{
+                "id": lzma.FILTER_LZMA1, "lc": props % 9, "lp": props // 9 % 5, "pb": props // 45,
+                "dict_size": dict_size}])
+            data = self._header[4 + props_size:]
+            self._header = None
+        return self._decompressor.decompress(data, max_length)
+
+
+def method_name(method):
+    compress_type, level = method
+    name = _METHOD_NAMES.get(compress_type, str(compress_type))
+    return f"{name}:{level}" if level is not None and level >= 0 else name
+
+
+def parse_method(spec, default_level):
+    """解析配置中的压缩方式：auto、store、deflate[:级别]、bzip2[:级别]、lzma
+
+    返回 (压缩类型, 级别)，auto返回None（按内容采样决定）。
+    """
+    name, _, level = str(spec).strip().lower().partition(":")
+    if name == "auto":
+        return None
+    if name in ("store", "stored"):
+        return STORED
+    if name == "lzma":
+        return zipfile.ZIP_LZMA, None
+    if name in ("deflate", "bzip2"):
+        if level:
+            if level not in "123456789" or len(level) != 1:
+                raise ValueError(f"压缩级别应为1-9: {spec}")
+            level = int(level)
+        else:
+            level = None
+        if name == "bzip2":
+            return zipfile.ZIP_BZIP2, level or 9
+        return zipfile.ZIP_DEFLATED, default_level if level is None else level
+    raise ValueError(f"未知的压缩方式: {spec}")
+
+
+def sample_entropy(data):
+    """字节熵（比特/字节），0为完全重复，8为均匀随机"""
+    total = len(data)
+    if not total:
+        return 0.0
+    entropy = 0.0
+    for count in Counter(data).values():
+        p = count / total
+        entropy -= p * math.log2(p)
+    return entropy
+
+
+class CompressionPolicy:
+    """为每个备份文件选择压缩方式
+
+    分类配置中的 "compression" 项优先（如 "store"、"deflate:9"、"lzma"），
+    其余文件按扩展名和开头一段内容的字节熵自动选择 STORED 或 DEFLATE。
+    自动选择不会使用BZIP2和LZMA：它们是整体压缩流，大文件不能分块并行压缩，
+    只在分类中明确指定时使用。
+    """
+
+    def __init__(self, config, classifier, level=zlib.Z_DEFAULT_COMPRESSION):
+        self.classifier = classifier
+        self.deflate = (zipfile.ZIP_DEFLATED, level)
+        self.overrides = {}
+        for category_name, category_info in config["categories"].items():
+            spec = category_info.get("compression", "auto") if isinstance(category_info, dict) else "auto"
+            method = parse_method(spec, level)
+            if method is not None:
+                self.overrides[category_name] = method
+        # 与分类索引同样的结构，复用分类器的多段扩展名查找
+        self.compressed = dict.fromkeys(COMPRESSED_EXTENSIONS, True)
+
+    def category(self, entry):
+        return self.classifier.category_of(entry)
+
+    def method_for(self, entry):
+        """按分类和扩展名选择压缩方式，需要采样内容才能决定时返回None"""
+        method = self.overrides.get(self.category(entry))
+        if method is not None:
+            return method
+        if self.classifier.lookup(entry.name, self.compressed):
+            return STORED
+        return None
+
+    def method_for_sample(self, sample):
+        """根据文件开头的内容选择压缩方式"""
+        if sample_entropy(sample[:SAMPLE_SIZE]) >= STORE_ENTROPY:
+            return STORED
+        return self.deflate
+
+
+class CompressionStats:
+    """按分类统计备份的文件数、原始/压缩后大小和压缩耗费的CPU时间"""
+
+    def __init__(self):
+        # 分类 -> [文件数, 原始字节数, 压缩后字节数, CPU秒数, {压缩方式: 文件数}]
+        self.categories = {}
+
+    def add(self, category, method, file_size, compress_size, cpu):
+        row = self.categories.get(category)
+        if row is None:
+            row = self.categories[category] = [0, 0, 0, 0.0, {}]
+        row[0] += 1
+        row[1] += file_size
+        row[2] += compress_size
+        row[3] += cpu
+        name = method_name(method)
+        row[4][name] = row[4].get(name, 0) + 1
+
+    def report(self):
+        """每个分类一行的统计文本，按原始大小降序"""
+        lines = []
+        rows = sorted(self.categories.items(), key=lambda item: -item[1][1])
+        for category, (files, file_size, compress_size, cpu, methods) in rows:
+            ratio = compress_size / file_size * 100 if file_size else 100.0
+            used = "、".join(f"{name}×{count}" for name, count in sorted(methods.items()))
+            lines.append(f"{category}: {files} 个文件 {file_size / 1024 / 1024:.1f} MB → "
+                         f"{compress_size / 1024 / 1024:.1f} MB（{ratio:.1f}%），CPU {cpu:.2f} s，{used}")
+        return lines
@@ -0,0 +1,111 @@
+import copy
+import json
+import os
+
+# 默认配置（增强版，包含图标信息）
+DEFAULT_CONFIG = {
+    "excluded_extensions": [".lnk", ".url"],
+    "max_file_size_mb": 100,
+    "include_folders_in_organize": False,
+    "include_folders_in_backup": False,
+    "move_workers": 4,
+    "backup_workers": 0,
+    "incremental_backup": False,
+    "categories": {
+        "📄 文档": {
+            "extensions": [".txt", ".doc", ".docx", ".pdf", ".xls", ".xlsx", ".ppt", ".pptx"],
+            "icon": "📄",
+            "color": "#3498db"
+        },
+        "🖼️ 图片": {
+            "extensions": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".svg", ".ico"],
+            "icon": "🖼️",
+            "color": "#e74c3c"
+        },
+        "🎬 视频": {
+            "extensions": [".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv", ".webm"],
+            "icon": "🎬",
+            "color": "#9b59b6"
+        },
+        "🎵 音频": {
+            "extensions": [".mp3", ".wav", ".flac", ".aac", ".ogg", ".wma"],
+            "icon": "🎵",
+            "color": "#f39c12"
+        },
+        "📦 压缩包": {
+            "extensions": [".zip", ".rar", ".7z", ".tar", ".gz"],
+            "icon": "📦",
+            "color": "#95a5a6"
+        },
+        "💻 程序": {
+            "extensions": [".exe", ".msi", ".deb", ".dmg"],
+            "icon": "💻",
+            "color": "#2ecc71"
+        },
+        "📂 桌面文件夹": {
+            "extensions": ["__FOLDER__"],
+            "icon": "📂",
+            "color": "#f39c12"
+        },
+        "📁 其他": {
+            "extensions": [],
+            "icon": "📁",
+            "color": "#34495e"
+        }
+    }
+}
+
+# 默认配置文件位置（与主程序同目录）
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.json")
+
+
+def default_config():
+    """返回一份默认配置的深拷贝"""
+    return copy.deepcopy(DEFAULT_CONFIG)
+
+
+def load_config(config_file, config=None):
+    """加载配置文件，合并到config中并返回"""
+    if config is None:
+        config = default_config()
+
+    if os.path.exists(config_file):
+        with open(config_file, 'r', encoding='utf-8') as f:
+            saved_config = json.load(f)
+        # 合并配置，保持向后兼容
+        if saved_config.get("categories"):
+            # 检查是否是旧格式
+            first_category = next(iter(saved_config["categories"].values()))
+            if isinstance(first_category, list):
+                # 转换旧格式到新格式
+                new_categories = {}
+                for name, extensions in saved_config["categories"].items():
+                    icon = "📁"
+                    if "文档" in name: icon = "📄"
+                    elif "图片" in name: icon = "🖼️"
+                    elif "视频" in name: icon = "🎬"
+                    elif "音频" in name: icon = "🎵"
+                    elif "压缩" in name: icon = "📦"
+                    elif "程序" in name: icon = "💻"
+
+                    new_categories[f"{icon} {name}"] = {
+                        "extensions": extensions,
+                        "icon": icon
+                    }
+                saved_config["categories"] = new_categories
+
+        config.update(saved_config)
+
+    # 确保新配置项有默认值
+    config.setdefault("include_folders_in_organize", False)
+    config.setdefault("include_folders_in_backup", False)
+    config.setdefault("move_workers", DEFAULT_CONFIG["move_workers"])
+    config.setdefault("backup_workers", DEFAULT_CONFIG["backup_workers"])
+    config.setdefault("incremental_backup", DEFAULT_CONFIG["incremental_backup"])
+    return config
+
+
+def save_config(config, config_file):
+    """保存配置到文件"""
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
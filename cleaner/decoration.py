@@ -0,0 +1,202 @@
+import errno
+import os
+
+# 与Windows的FILE_ATTRIBUTE_*取值一致
+FILE_ATTRIBUTE_HIDDEN = 0x2
+FILE_ATTRIBUTE_SYSTEM = 0x4
+HIDDEN_SYSTEM = FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM
+
+DESKTOP_INI = "desktop.ini"
+
+
+class NullAttributes:
+    """不支持文件属性的平台：所有操作都是空操作"""
+
+    name = "none"
+
+    def get(self, path):
+        return 0
+
+    def _set(self, path, attributes):
+        pass
+
+    def update(self, path, add=0, remove=0):
+        """添加/移除属性位，属性未变化时不产生写操作，返回是否修改"""
+        current = self.get(path)
+        new = (current | add) & ~remove
+        if new == current:
+            return False
+        self._set(path, new)
+        return True
+
+
+class WindowsAttributes(NullAttributes):
+    """通过GetFileAttributesW/SetFileAttributesW在进程内设置属性，代替attrib命令"""
+
+    name = "windows"
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        self._ctypes = ctypes
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self._get_attributes = kernel32.GetFileAttributesW
+        self._get_attributes.argtypes = [wintypes.LPCWSTR]
+        self._get_attributes.restype = wintypes.DWORD
+        self._set_attributes = kernel32.SetFileAttributesW
+        self._set_attributes.argtypes = [wintypes.LPCWSTR, wintypes.DWORD]
+        self._set_attributes.restype = wintypes.BOOL
+
+    def get(self, path):
+        attributes = self._get_attributes(path)
+        if attributes == 0xFFFFFFFF:
+            raise self._ctypes.WinError(self._ctypes.get_last_error())
+        return attributes
+
+    def _set(self, path, attributes):
+        if not self._set_attributes(path, attributes):
+            raise self._ctypes.WinError(self._ctypes.get_last_error())
+
+
+class XattrAttributes(NullAttributes):
+    """Linux下把属性位保存在扩展属性中，便于在非Windows环境测试和基准测试
+
+    文件系统不支持扩展属性时自动退化为空操作。
+    """
+
+    name = "xattr"
+    XATTR_NAME = "user.desktop_cleaner.attributes"
+
+    def __init__(self):
+        self.supported = True
+
+    def get(self, path):
+        if not self.supported:
+            return 0
+        try:
+            return int(os.getxattr(path, self.XATTR_NAME))
+        except OSError as e:
+            if e.errno == errno.ENODATA:
+                return 0
+            if e.errno in (errno.ENOTSUP, errno.EOPNOTSUPP):
+                self.supported = False
+                return 0
+            raise
+
+    def _set(self, path, attributes):
+        if not self.supported:
+            return
+        try:
+            if attributes:
+                os.setxattr(path, self.XATTR_NAME, str(attributes).encode())
+            else:
+                os.removexattr(path, self.XATTR_NAME)
+        except OSError as e:
+            if e.errno in (errno.ENOTSUP, errno.EOPNOTSUPP):
+                self.supported = False
+            elif e.errno != errno.ENODATA:
+                raise
+
+
+def attribute_backend(name="auto"):
+    """按名称创建属性后端：auto / windows / xattr / none"""
+    if name == "auto":
+        if os.name == "nt":
+            name = "windows"
+        elif hasattr(os, "setxattr"):
+            name = "xattr"
+        else:
+            name = "none"
+    if name == "windows":
+        return WindowsAttributes()
+    if name == "xattr":
+        return XattrAttributes()
+    if name == "none":
+        return NullAttributes()
+    raise ValueError(f"未知的文件夹属性后端: {name}")
+
+
+def desktop_ini_content(category_info):
+    """分类文件夹desktop.ini的内容"""
+    return f"""[.ShellClassInfo]
+IconResource=shell32.dll,3
+InfoTip={category_info['icon']} 分类文件夹
+[ViewState]
+Mode=
+Vid=
+FolderType=Generic
+"""
+
+
+class FolderDecorator:
+    """分类文件夹装饰（desktop.ini + 隐藏/系统属性）
+
+    queue() 只登记，flush() 一次性处理本次整理用到的全部文件夹。
+    已写入的内容和desktop.ini的修改时间缓存在内存中，内容未变且文件
+    未被改动的文件夹只需一次stat，不会重复写入。
+    """
+
+    def __init__(self, backend=None, log=None):
+        self.backend = backend or attribute_backend()
+        self.log = log or print
+        self._pending = {}
+        # 文件夹路径 -> (desktop.ini内容, (st_mtime_ns, st_size))
+        self._state = {}
+
+    def queue(self, folder_path, category_info):
+        """登记需要装饰的文件夹（同一文件夹多次登记只处理一次）"""
+        self._pending[folder_path] = desktop_ini_content(category_info)
+
+    def flush(self):
+        """写入所有登记的文件夹，返回 (写入数, 未变化数)"""
+        pending, self._pending = self._pending, {}
+        written = unchanged = 0
+        for folder_path, content in pending.items():
+            try:
+                if self._apply(folder_path, content):
+                    written += 1
+                else:
+                    unchanged += 1
+            except Exception as e:
+                self._state.pop(folder_path, None)
+                self.log(f"创建desktop.ini失败: {e}")
+        return written, unchanged
+
+    def _apply(self, folder_path, content):
+        ini_path = os.path.join(folder_path, DESKTOP_INI)
+        try:
+            st = os.stat(ini_path)
+            signature = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            signature = None
+
+        cached = self._state.get(folder_path)
+        if signature is not None and cached == (content, signature):
+            return False
+
+        if signature is not None and cached is None:
+            # 首次遇到已存在的desktop.ini：内容相同则只补齐属性
+            with open(ini_path, 'r', encoding='utf-8', errors='replace') as f:
+                if f.read() == content:
+                    self.backend.update(ini_path, add=HIDDEN_SYSTEM)
+                    self._state[folder_path] = (content, signature)
+                    return False
+
+        if signature is not None:
+            # 隐藏+系统属性的文件在Windows下不能直接覆盖写入
+            self.backend.update(ini_path, remove=HIDDEN_SYSTEM)
+        with open(ini_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        # 只设置desktop.ini文件为隐藏和系统文件，不设置文件夹属性
+        self.backend.update(ini_path, add=HIDDEN_SYSTEM)
+        st = os.stat(ini_path)
+        self._state[folder_path] = (content, (st.st_mtime_ns, st.st_size))
+        return True
+
+    def undecorate(self, folder_path):
+        """移除desktop.ini（先清除隐藏和系统属性）"""
+        ini_path = os.path.join(folder_path, DESKTOP_INI)
+        self._state.pop(folder_path, None)
+        self.backend.update(ini_path, remove=HIDDEN_SYSTEM)
+        os.remove(ini_path)
@@ -0,0 +1,882 @@
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .backup import DEFAULT_COMPRESS_LEVEL, default_backup_workers, write_zip
+from .checkpoint import (DEFAULT_CHECKPOINT_INTERVAL, BackupCheckpoint, find_checkpoint, partial_path_for,
+                         remove_checkpoint)
+from .chunkstore import ChunkStore, is_store
+from .classifier import CategoryClassifier
+from .compression import CompressionPolicy, CompressionStats
+from .decoration import FolderDecorator, attribute_backend
+from .manifest import (FULL_PREFIX, INCREMENTAL_PREFIX, build_manifest, latest_manifest, list_manifests,
+                       load_manifest, manifest_path_for, plan_incremental, restore_snapshot, save_manifest)
+from .journal import DEFAULT_BATCH_SIZE, OrganizeJournal, iter_journal, journal_path_for, write_record
+from .mover import CASE_INSENSITIVE_FS, DEFAULT_MOVE_WORKERS, DestinationNamer, run_ordered
+from .preflight import Estimate, ThroughputHistory, zip_size_bound
+from .progress import DEFAULT_INTERVAL, ProgressTracker
+from .records import RecordReader
+from .scancache import DEFAULT_MAX_AGE, ScanCache
+from .sniffer import DEFAULT_SNIFF_WORKERS, ContentClassifier
+from .scanner import Entry, ListingCache, scan_dir, scan_path, walk_files
+from .transfer import TransferStats, move_path
+from .verify import expected_members, verify_archive
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+class OperationCancelled(Exception):
+    """操作被用户取消（尚未开始的移动以此结束，不计为失败）"""
+
+
+def _exclusive(method):
+    """整理、恢复、备份等操作持有引擎的操作锁，同一引擎上的操作（如监视模式和手动操作）依次执行"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.operation_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class CleanerEngine:
+    """桌面整理引擎 - 整理、备份、恢复的核心逻辑，不依赖任何界面"""
+
+    def __init__(self, config, desktop_path, log=None, history_path=None, scan_cache_path=None):
+        """history_path为保存历史速度的文件（用于预估耗时），为None时不保存；
+        scan_cache_path为目录快照数据库，配置scan_cache开启时再次扫描只读取有变化的目录"""
+        self.config = config
+        self.desktop_path = desktop_path
+        self.log = log or _noop
+        self.history = ThroughputHistory(history_path)
+        self.scan_cache_path = scan_cache_path
+        self._scan_cache = None
+        self._classifier = None
+        self._content_classifier = None
+        # 内容识别结果（有数量上限的LRU缓存），配置变化后重建分类器时沿用
+        self._sniff_results = OrderedDict()
+        self._decorator = None
+        self._decorator_backend = None
+        # 可重入：备份完成后的校验等在同一线程中嵌套调用
+        self.operation_lock = threading.RLock()
+        # on_restored(桌面上的路径) 在恢复把一个条目移回桌面后调用（监视模式据此不再自动整理该条目）
+        self.on_restored = None
+
+    @property
+    def classifier(self):
+        """由当前配置编译的分类索引，配置变化后自动重建"""
+        if self._classifier is None:
+            self._classifier = CategoryClassifier(self.config)
+        return self._classifier
+
+    @property
+    def categorizer(self):
+        """实际用于分类的对象，开启content_sniffing时为按文件内容补充识别的分类器"""
+        mode = self.config.get("content_sniffing", "off")
+        if not mode or mode == "off":
+            return self.classifier
+        content = self._content_classifier
+        if content is None or content.base is not self.classifier or content.mode != mode:
+            content = self._content_classifier = ContentClassifier(
+                self.classifier, mode, workers=self.config.get("sniff_workers", DEFAULT_SNIFF_WORKERS),
+                results=self._sniff_results)
+        return content
+
+    def config_changed(self):
+        """配置（分类、排除扩展名等）修改后调用，下次使用时重建分类索引"""
+        self._classifier = None
+
+    def _save_history(self):
+        try:
+            self.history.save()
+        except Exception as e:
+            self.log(f"保存历史速度失败: {e}")
+
+    @property
+    def scan_cache(self):
+        """目录快照，未开启（配置scan_cache，默认关闭）或没有指定数据库时为None"""
+        if not self.scan_cache_path or not self.config.get("scan_cache", False):
+            return None
+        if self._scan_cache is None:
+            self._scan_cache = ScanCache(self.scan_cache_path)
+        self._scan_cache.max_age = self.config.get("scan_cache_max_age", DEFAULT_MAX_AGE)
+        return self._scan_cache
+
+    def _save_scan_cache(self):
+        cache = self.scan_cache
+        if cache is None:
+            return
+        try:
+            cache.save()
+        except Exception as e:
+            self.log(f"保存目录快照失败: {e}")
+
+    def _classify(self, entries):
+        """批量分类，开启目录快照时直接使用快照中保存的分类"""
+        cache = self.scan_cache
+        if cache is None:
+            return self.categorizer.classify(entries)
+        return cache.categories(entries, self.categorizer)
+
+    def _tracker(self, progress):
+        """为一次操作创建进度模型，回调频率由配置progress_interval（秒）限制"""
+        return ProgressTracker(progress, interval=self.config.get("progress_interval", DEFAULT_INTERVAL))
+
+    def should_skip_file(self, file_path, for_organize=True):
+        """判断是否应该跳过文件"""
+        entry = scan_path(file_path)
+        if entry is None:
+            entry = Entry(os.path.basename(file_path), file_path, False, 0, 0.0, 0)
+        return self.should_skip_entry(entry, for_organize)
+
+    def should_skip_entry(self, entry, for_organize=True):
+        """根据扫描记录判断是否应该跳过（不再产生系统调用）"""
+        return self.classifier.should_skip(entry, for_organize)
+
+    def get_file_category(self, file_path):
+        """获取文件分类"""
+        entry = scan_path(file_path)
+        if entry is None:
+            entry = Entry(os.path.basename(file_path), file_path, False, 0, 0.0, 0)
+        return self.get_entry_category(entry)
+
+    def get_entry_category(self, entry):
+        """根据扫描记录获取分类"""
+        return self.categorizer.category_of(entry)
+
+    @property
+    def decorator(self):
+        """分类文件夹装饰器，按配置中的 folder_decoration 选择属性后端"""
+        backend = self.config.get("folder_decoration", "auto")
+        if self._decorator is None or self._decorator_backend != backend:
+            self._decorator = FolderDecorator(attribute_backend(backend), log=self.log)
+            self._decorator_backend = backend
+        return self._decorator
+
+    def create_desktop_ini(self, folder_path, category_info):
+        """为文件夹创建desktop.ini文件以设置图标"""
+        self.decorator.queue(folder_path, category_info)
+        self.decorator.flush()
+
+    def scan_desktop(self):
+        """单次扫描桌面，返回Entry列表"""
+        cache = self.scan_cache
+        if cache is None:
+            return scan_dir(self.desktop_path)
+        entries = cache.scan_dir(self.desktop_path, self.categorizer)
+        self._save_scan_cache()
+        return entries
+
+    def plan_organize(self, entries=None):
+        """根据扫描结果生成整理计划 [(Entry, 分类), ...]"""
+        if entries is None:
+            entries = self.scan_desktop()
+        classifier = self.classifier
+        category_names = classifier.category_names
+        # 跳过已存在的分类文件夹和不需要整理的文件
+        selected = [entry for entry in entries
+                    if entry.name not in category_names and not classifier.should_skip(entry, True)]
+        return list(zip(selected, self._classify(selected)))
+
+    def ensure_category_folder(self, category, existing_names):
+        """确保分类文件夹存在，existing_names为扫描得到的桌面现有名称集合"""
+        category_folder = os.path.join(self.desktop_path, category)
+        if category not in existing_names:
+            os.makedirs(category_folder, exist_ok=True)
+            existing_names.add(category)
+        # 为分类文件夹设置图标（登记后由调用方统一flush，内容未变的文件夹不会重写）
+        if category in self.config["categories"]:
+            self.decorator.queue(category_folder, self.config["categories"][category])
+        return category_folder
+
+    def move_item(self, entry, dest_path, stats=None, device_cache=None, pool=None):
+        """将单个文件或文件夹移动到已分配好的目标路径（pool为跨卷复制文件夹时共享的线程池）"""
+        return move_path(entry.path, dest_path, stats=stats,
+                         workers=self.config.get("move_workers", DEFAULT_MOVE_WORKERS),
+                         verify_hash=self.config.get("move_verify_hash", False),
+                         device_cache=device_cache, pool=pool)
+
+    def _journaled_moves(self, plan, journal, category_folders, cancel):
+        """分配目标名称并先写日志再交给线程池移动（按批次fsync后才放行）"""
+        namer = DestinationNamer()
+        batch = []
+        for index, (entry, category) in enumerate(plan):
+            if cancel.is_set():
+                break
+            # 处理重名文件/文件夹
+            dest_path = namer.claim(os.path.join(category_folders[category], entry.name), entry.is_dir)
+            journal.record_move(index, entry.path, dest_path, category)
+            batch.append((index, entry, category, dest_path))
+            if len(batch) >= journal.batch_size:
+                journal.sync()
+                yield from batch
+                batch = []
+        journal.sync()
+        yield from batch
+
+    def _estimate_organize(self, plan):
+        """根据整理计划统计各分类的数量和大小、跨卷移动及目标卷所需空间（只stat分类文件夹）"""
+        estimate = Estimate("organize")
+        desktop_dev = os.stat(self.desktop_path).st_dev
+        cache = self.scan_cache
+        # 分类 -> 设备号；尚未创建的分类文件夹会建在桌面上，与桌面同卷
+        devices = {}
+        # 设备号 -> [分类文件夹, 需要复制的字节数]
+        cross_targets = {}
+        for entry, category in plan:
+            dev = devices.get(category)
+            if dev is None:
+                try:
+                    dev = os.stat(os.path.join(self.desktop_path, category)).st_dev
+                except OSError:
+                    dev = desktop_dev
+                devices[category] = dev
+            cross = dev != desktop_dev
+            if not entry.is_dir:
+                size = entry.size
+            elif cross:
+                # 只有跨卷移动的文件夹需要遍历统计大小（同卷移动只是重命名）；
+                # 这里只是预估，可以使用目录快照（移动时按实际内容复制和校验）
+                files = walk_files(entry.path) if cache is None else cache.walk_files(entry.path, self.categorizer)
+                size = sum(file_entry.size for file_entry in files)
+            else:
+                size = 0
+            estimate.add(category, size, cross)
+            if cross:
+                target = cross_targets.setdefault(dev, [os.path.join(self.desktop_path, category), 0])
+                target[1] += size
+        if cross_targets:
+            self._save_scan_cache()
+        for folder, required in cross_targets.values():
+            estimate.require(folder, required)
+        estimate.seconds = ((estimate.items - estimate.cross_device_items) / self.history.rate("rename")
+                            + estimate.cross_device_bytes / self.history.rate("copy"))
+        return estimate
+
+    @_exclusive
+    def preflight_organize(self):
+        """整理前的预检（扫描一次桌面，不移动任何文件），返回Estimate
+
+        返回的Estimate可以原样传给organize(estimate=...)，按预检时的扫描结果整理。
+        """
+        entries = self.scan_desktop()
+        plan = self.plan_organize(entries)
+        estimate = self._estimate_organize(plan)
+        estimate.plan = (entries, plan)
+        return estimate
+
+    @_exclusive
+    def organize(self, record_path, legacy_record_path=None, timestamp=None, progress=None, cancel=None,
+                 names=None, estimate=None):
+        """整理桌面 - 直接在桌面创建分类文件夹，返回整理摘要
+
+        移动过程写入与记录同名的 .journal.jsonl 日志，全部完成后流式转换为
+        整理记录并删除日志；中途退出时可直接用该日志恢复。
+        开始前根据整理计划预检，跨卷移动的目标卷空间不足时抛出InsufficientSpaceError
+        （配置preflight_space_check，默认开启）。
+        progress(ProgressSnapshot) 按文件数和字节数报告进度（限制回调频率）；cancel为
+        threading.Event，置位后在文件边界停止，已移动的文件仍写入整理记录。
+        names为桌面上的名称列表时只整理这些条目（监视模式），不再扫描整个桌面。
+        estimate为已经确认过的preflight_organize()结果时直接使用其扫描结果和整理计划，不再重新扫描和预检。
+        """
+        tracker = self._tracker(progress)
+        cancel = cancel or threading.Event()
+        # 生成整理记录的时间戳
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        self.log("开始整理桌面...")
+
+        if estimate is not None and estimate.plan is not None:
+            entries, plan = estimate.plan
+            existing_names = {entry.name for entry in entries}
+        else:
+            if names is None:
+                entries = self.scan_desktop()
+                existing_names = {entry.name for entry in entries}
+            else:
+                entries = [entry for entry in (scan_path(os.path.join(self.desktop_path, name))
+                                               for name in sorted(names))
+                           if entry is not None]
+                # 只需要知道哪些分类文件夹已存在
+                existing_names = {name for name in self.classifier.category_names
+                                  if os.path.isdir(os.path.join(self.desktop_path, name))}
+            plan = self.plan_organize(entries)
+            estimate = self._estimate_organize(plan)
+        if names is None:
+            for line in estimate.report():
+                self.log(line)
+        if self.config.get("preflight_space_check", True):
+            estimate.check_space()
+
+        # 先在主线程中创建全部分类文件夹，避免多个线程同时创建
+        category_folders = {}
+        created_folders = []
+        for entry, category in plan:
+            if category not in category_folders:
+                if category not in existing_names:
+                    created_folders.append(category)
+                category_folders[category] = self.ensure_category_folder(category, existing_names)
+        self.decorator.flush()
+
+        stats = TransferStats()
+        device_cache = {}
+        workers = self.config.get("move_workers", DEFAULT_MOVE_WORKERS)
+        # 跨卷移动的文件夹中的文件都在这一个线程池中复制，线程总数不随同时移动的文件夹数增长
+        copy_pool = ThreadPoolExecutor(max_workers=workers)
+
+        def move_job(item):
+            if cancel.is_set():
+                raise OperationCancelled()
+            index, entry, category, dest_path = item
+            return self.move_item(entry, dest_path, stats, device_cache, copy_pool)
+
+        # 记录移动的文件，用于恢复（写入日志而不是保存在内存中）
+        journal_path = journal_path_for(record_path)
+        journal = OrganizeJournal(journal_path, timestamp, self.desktop_path, created_folders,
+                                  batch_size=self.config.get("journal_batch_size", DEFAULT_BATCH_SIZE))
+        try:
+            moves = self._journaled_moves(plan, journal, category_folders, cancel)
+            # 进度按文件的字节数计算，文件夹只计数量
+            tracker.start(len(plan), sum(entry.size for entry, _ in plan if not entry.is_dir))
+            started = time.monotonic()
+            # 结果按计划顺序返回，整理记录顺序与并发度无关
+            for (index, entry, category, dest_path), _, error in run_ordered(move_job, moves, workers):
+                tracker.advance(1, entry.size if not entry.is_dir else 0, entry.name)
+                if error is not None:
+                    # 已写入日志但因取消而未执行的移动同样标记为失败，不进入整理记录
+                    journal.record_failure(index)
+                    if not isinstance(error, OperationCancelled):
+                        self.log(f"移动失败: {entry.name} - {error}")
+                    continue
+                journal.record_success(category)
+
+                item_type = "文件夹" if entry.is_dir else "文件"
+                self.log(f"移动{item_type}: {entry.name} -> {category}")
+            summary = journal.finish()
+        finally:
+            journal.close()
+            copy_pool.shutdown()
+        tracker.finish()
+
+        if not cancel.is_set():
+            # 记录本次的速度，供以后预估耗时（同卷重命名的速度只在没有跨卷复制时记录）
+            if stats.files_copied:
+                self.history.record("copy", stats.bytes_copied, stats.copy_seconds)
+            elif stats.renames:
+                self.history.record("rename", stats.renames, time.monotonic() - started)
+            self._save_history()
+
+        if stats.files_copied:
+            self.log(f"跨卷复制 {stats.files_copied} 个文件，共 {stats.bytes_copied / (1024 * 1024):.1f} MB，"
+                     f"速度 {stats.bytes_per_second / (1024 * 1024):.1f} MB/s")
+        for path in stats.leftovers:
+            self.log(f"文件夹已复制到分类文件夹，但源位置未能完全删除: {path}")
+
+        # 保存整理记录到指定位置，同时保存到默认备份文件（保持兼容性）
+        header, _, files = iter_journal(journal_path)
+        write_record(record_path, summary, files, legacy_record_path)
+        os.remove(journal_path)
+
+        summary["cancelled"] = cancel.is_set()
+        if summary["cancelled"]:
+            # 本次新建但没有放入任何文件的分类文件夹
+            for category in created_folders:
+                if category not in journal.categories:
+                    self.remove_category_folder(category)
+
+        self.log(f"整理记录已保存: {record_path}")
+        if summary["cancelled"]:
+            self.log(f"整理已取消，已整理的 {summary['total_files']} 个文件已写入记录")
+        else:
+            self.log(f"整理完成！共整理了 {summary['total_files']} 个文件")
+        return summary
+
+    @_exclusive
+    def restore(self, record_file_path, progress=None, cancel=None):
+        """从指定的记录文件恢复桌面，返回恢复结果
+
+        记录按流式读取，边读边移动：每个分类文件夹只scandir一次来确认文件是否存在，
+        移动在线程池中并发执行，最后一次性清理空的分类文件夹。
+        progress(ProgressSnapshot) 按已处理的条目数报告进度；记录中没有总数时（整理日志）
+        按已读取的记录字节数估算。cancel置位后不再开始新的移动，已恢复的文件保持不变。
+        """
+        tracker = self._tracker(progress)
+        cancel = cancel or threading.Event()
+        self.log(f"开始从记录文件恢复桌面: {os.path.basename(record_file_path)}")
+
+        # 读取记录文件（兼容新旧格式，也支持中途退出留下的整理日志）
+        reader = RecordReader(record_file_path)
+
+        listings = ListingCache(CASE_INSENSITIVE_FS)
+        namer = DestinationNamer()
+        workers = self.config.get("move_workers", DEFAULT_MOVE_WORKERS)
+        counts = {"seen": 0, "restored": 0}
+        categories_to_clean = set()
+        tracker.start()
+
+        def advance(name):
+            total = reader.meta.get("total_files")
+            if not total and reader.bytes_read:
+                total = max(int(counts["seen"] * reader.total_bytes / reader.bytes_read), counts["seen"])
+            tracker.total_items = total or 0
+            tracker.advance(1, name=name)
+
+        def pending_moves():
+            for file_info in reader:
+                if cancel.is_set():
+                    break
+                counts["seen"] += 1
+                if not listings.take(file_info["new"]):
+                    advance(os.path.basename(file_info["original"]))
+                    continue
+                # 恢复文件到原位置，处理重名文件
+                original_name = os.path.basename(file_info["original"])
+                restore_path = namer.claim(os.path.join(self.desktop_path, original_name), False)
+                yield file_info, restore_path
+
+        device_cache = {}
+        stats = TransferStats()
+        # 与整理相同：跨卷移回的文件夹共用一个复制线程池
+        copy_pool = ThreadPoolExecutor(max_workers=workers)
+
+        def move_job(item):
+            if cancel.is_set():
+                raise OperationCancelled()
+            file_info, restore_path = item
+            return move_path(file_info["new"], restore_path, stats=stats, workers=workers,
+                             device_cache=device_cache, pool=copy_pool)
+
+        with copy_pool:
+            for (file_info, restore_path), _, error in run_ordered(move_job, pending_moves(), workers):
+                original_name = os.path.basename(file_info["original"])
+                if error is not None:
+                    listings.put_back(file_info["new"])
+                    if not isinstance(error, OperationCancelled):
+                        self.log(f"恢复失败: {original_name} - {error}")
+                else:
+                    counts["restored"] += 1
+                    categories_to_clean.add(file_info["category"])
+                    self.log(f"恢复: {original_name}")
+                    if self.on_restored is not None:
+                        self.on_restored(restore_path)
+                advance(original_name)
+        for path in stats.leftovers:
+            self.log(f"文件夹已移回桌面，但源位置未能完全删除: {path}")
+        tracker.total_items = tracker.items
+        tracker.finish()
+
+        # 中途退出时可能有已创建但尚未放入文件的分类文件夹
+        categories_to_clean.update(reader.meta.get("created_folders", []))
+
+        # 删除空的分类文件夹（直接在桌面的），剩余内容直接取自扫描缓存
+        for category in categories_to_clean:
+            category_path = os.path.join(self.desktop_path, category)
+            self.remove_category_folder(category, listings.names(category_path))
+
+        if cancel.is_set():
+            self.log(f"恢复已取消，已恢复 {counts['restored']} 个文件")
+        else:
+            self.log(f"恢复完成！共恢复了 {counts['restored']} 个文件")
+        return {
+            "datetime": reader.meta.get("datetime"),
+            "total_files": reader.meta.get("total_files", counts["seen"]),
+            "restored_count": counts["restored"],
+            "cancelled": cancel.is_set()
+        }
+
+    def remove_category_folder(self, category, remaining=None):
+        """分类文件夹中只剩desktop.ini时删除该文件和文件夹
+
+        remaining为文件夹中剩余的名称集合（来自扫描缓存），为None时重新列出目录。
+        """
+        category_path = os.path.join(self.desktop_path, category)
+        try:
+            if remaining is None:
+                if not os.path.isdir(category_path):
+                    return
+                remaining = os.listdir(category_path)
+            others = [name for name in remaining if name.lower() != "desktop.ini"]
+            if others:
+                self.log(f"分类文件夹不为空，保留: {category} (包含 {len(others)} 项)")
+                return
+
+            # 先删除desktop.ini文件（如果存在）
+            if len(others) != len(remaining):
+                try:
+                    # 移除隐藏和系统属性后删除
+                    self.decorator.undecorate(category_path)
+                    self.log(f"删除desktop.ini: {category}")
+                except Exception as ini_e:
+                    self.log(f"删除desktop.ini失败: {category} - {ini_e}")
+
+            os.rmdir(category_path)
+            self.log(f"删除空分类文件夹: {category}")
+        except Exception as e:
+            self.log(f"删除分类文件夹失败: {category} - {e}")
+
+    def collect_backup_files(self):
+        """扫描需要备份的文件，返回 [(Entry, 压缩包内名称), ...]"""
+        return list(self.iter_backup_files())
+
+    def iter_backup_files(self):
+        """逐个产出需要备份的文件 (Entry, 压缩包内名称)，不在内存中保留完整列表
+
+        总是实际扫描，不使用目录快照：快照中原地改写过的文件的大小和修改时间可能已经过时，
+        增量备份会因此漏掉修改过的文件。
+        """
+        should_skip = self.classifier.should_skip
+        prefix = os.path.join(self.desktop_path, "")
+        for entry in scan_dir(self.desktop_path):
+            # 跳过桌面整理文件夹
+            if entry.name == "桌面整理":
+                continue
+
+            # 检查是否应该跳过
+            if should_skip(entry, False):
+                continue
+
+            if not entry.is_dir:
+                yield entry, entry.name
+            elif self.config.get("include_folders_in_backup", False):
+                # 备份文件夹
+                for file_entry in walk_files(entry.path):
+                    # 检查文件大小
+                    if not should_skip(file_entry, False):
+                        # 路径都由桌面路径拼接而来，截掉前缀即为相对路径，比os.path.relpath快得多
+                        path = file_entry.path
+                        if path.startswith(prefix):
+                            arcname = path[len(prefix):]
+                        else:
+                            arcname = os.path.relpath(path, self.desktop_path)
+                        yield file_entry, arcname
+
+    def _estimate_backup(self, save_dir, files, checkpoint=None):
+        """统计待备份文件（files可以是生成器，只遍历一次）各分类的数量和大小、压缩包所需空间和预计耗时"""
+        estimate = Estimate("backup")
+        name_bytes = 0
+        batch = []
+        # 分批调用批量分类，大量文件时比逐个分类快
+        for item in files:
+            batch.append(item)
+            if len(batch) >= 4096:
+                name_bytes += self._estimate_batch(estimate, self._classify, batch)
+                batch = []
+        name_bytes += self._estimate_batch(estimate, self._classify, batch)
+        required = zip_size_bound(estimate.items, estimate.bytes, name_bytes)
+        if checkpoint is not None:
+            # 续传时已写入的部分已经占用了空间
+            required = max(required - checkpoint.offset, 0)
+        estimate.require(save_dir, required)
+        estimate.seconds = estimate.bytes / self.history.rate("backup")
+        return estimate
+
+    @staticmethod
+    def _estimate_batch(estimate, classify, batch):
+        entries = [entry for entry, _ in batch]
+        for entry, category in zip(entries, classify(entries)):
+            estimate.add(category, entry.size)
+        return sum(len(arcname.encode("utf-8")) for _, arcname in batch)
+
+    @_exclusive
+    def preflight_backup(self, save_dir, incremental=None):
+        """备份前的预检：统计需要写入的文件、检查剩余空间并预估耗时（不写入任何文件），返回Estimate
+
+        返回的Estimate可以原样传给backup(estimate=...)，不再重复统计（增量备份同时沿用比较结果）。
+        """
+        if incremental is None:
+            incremental = self.config.get("incremental_backup", False)
+        previous_path = latest_manifest(save_dir) if incremental else None
+        if previous_path:
+            workers = self.config.get("backup_workers", 0) or default_backup_workers()
+            plan = plan_incremental(self.collect_backup_files(), load_manifest(previous_path),
+                                    self.config.get("backup_hash", False), workers)
+            estimate = self._estimate_backup(save_dir, plan.to_write)
+            estimate.plan = (previous_path, plan)
+        else:
+            estimate = self._estimate_backup(save_dir, self.iter_backup_files())
+            estimate.plan = (None, None)
+        return estimate
+
+    @_exclusive
+    def backup(self, save_dir, timestamp=None, progress=None, cancel=None, incremental=None, estimate=None):
+        """备份桌面到save_dir下的ZIP文件，返回(备份文件路径, 备份文件数)
+
+        progress(ProgressSnapshot) 按已处理的字节数和文件数报告进度，每写入一块数据都会更新，
+        大文件备份过程中进度和剩余时间也会持续更新。完整备份边扫描边压缩，内存占用与文件大小和数量无关
+        （备份清单除外）。
+        cancel置位后在文件边界停止，返回的路径为None。
+        incremental为True（默认读取配置incremental_backup）且save_dir中已有备份清单时，
+        只写入新增或修改的文件，删除的文件记入清单的删除列表。
+        备份过程中定期写入检查点（配置resume_backup，默认开启）：取消、出错或程序退出后，
+        下次备份到同一目录时从中断处继续，已写入且未修改的文件不再压缩。
+        配置backup_verify开启时，备份完成后并行解压校验压缩包中的每个文件。
+        开始前预检并记录预计耗时，save_dir所在卷空间不足时抛出InsufficientSpaceError
+        （配置preflight_space_check，默认开启）；estimate为已经确认过的preflight_backup()结果时
+        直接使用，不再重新统计（从检查点继续时除外）。
+        """
+        tracker = self._tracker(progress)
+        cancel = cancel or threading.Event()
+        if incremental is None:
+            incremental = self.config.get("incremental_backup", False)
+        use_hash = self.config.get("backup_hash", False)
+        workers = self.config.get("backup_workers", 0) or default_backup_workers()
+        self.log("开始备份桌面...")
+
+        # 上次备份中断时从检查点继续，沿用其时间戳和增量备份基准
+        resume = self.config.get("resume_backup", True)
+        checkpoint = self._load_checkpoint(save_dir) if resume else None
+        if checkpoint is not None:
+            timestamp = checkpoint.header["timestamp"]
+            base = checkpoint.header["base"]
+            previous_path = os.path.join(save_dir, base) if base else None
+            self.log(f"继续上次中断的备份: 已完成 {len(checkpoint.completed)} 个文件")
+        else:
+            # 增量备份：与上次备份的清单比较（没有清单时退化为完整备份）
+            previous_path = latest_manifest(save_dir) if incremental else None
+        # 预检结果基于同一个增量基准且不是续传时才能沿用
+        if estimate is not None and (checkpoint is not None or estimate.plan is None
+                                     or estimate.plan[0] != previous_path):
+            estimate = None
+        if previous_path:
+            if estimate is not None:
+                plan = estimate.plan[1]
+            else:
+                plan = plan_incremental(self.collect_backup_files(), load_manifest(previous_path), use_hash, workers)
+            self.log(f"增量备份: {len(plan.to_write)} 个新增或修改，{len(plan.kept)} 个未变化，"
+                     f"{len(plan.deleted)} 个已删除")
+            to_write = plan.to_write
+            if estimate is None:
+                estimate = self._estimate_backup(save_dir, to_write, checkpoint)
+        else:
+            # 完整备份：预检时统计总量，再重新扫描、边扫描边压缩，不保留文件列表
+            plan = plan_incremental([], None)
+            if estimate is None:
+                estimate = self._estimate_backup(save_dir, self.iter_backup_files(), checkpoint)
+            to_write = self.iter_backup_files()
+        total_files, total_bytes = estimate.items, estimate.bytes
+        for line in estimate.report():
+            self.log(line)
+        if self.config.get("preflight_space_check", True) and not estimate.fits:
+            if checkpoint is not None:
+                checkpoint.close()
+            estimate.check_space()
+
+        # 生成备份文件名
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_filename = f"{INCREMENTAL_PREFIX if previous_path else FULL_PREFIX}_{timestamp}.zip"
+        backup_filepath = os.path.join(save_dir, backup_filename)
+        # 写完之前使用临时文件名，中断留下的文件不会被当作完整的备份
+        partial_path = partial_path_for(backup_filepath)
+        if resume and checkpoint is None:
+            checkpoint = BackupCheckpoint.create(
+                backup_filepath, timestamp, os.path.basename(previous_path) if previous_path else None,
+                interval=self.config.get("backup_checkpoint_interval", DEFAULT_CHECKPOINT_INTERVAL))
+
+        tracker.start(total_files, total_bytes)
+        started = time.monotonic()
+        written = []
+
+        def on_member(index, entry, arcname, error, member):
+            tracker.advance(1)
+            if error is not None:
+                self.log(f"备份文件失败: {entry.name} - {error}")
+                return
+            written.append((entry, arcname, member.crc))
+            self.log(f"备份: {entry.name}")
+
+        def on_progress(done_bytes, entry):
+            tracker.update(nbytes=done_bytes, name=entry.name)
+
+        # 创建ZIP文件（多线程压缩，成员顺序与扫描顺序一致；按分类和内容选择压缩方式）
+        level = self.config.get("backup_compress_level", DEFAULT_COMPRESS_LEVEL)
+        stats = CompressionStats()
+        try:
+            backup_count = write_zip(partial_path, to_write, workers=workers, level=level,
+                                     cancel=cancel, on_member=on_member, on_progress=on_progress,
+                                     policy=CompressionPolicy(self.config, self.classifier, level), stats=stats,
+                                     checkpoint=checkpoint)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        tracker.finish()
+
+        if cancel.is_set():
+            if resume:
+                self.log("备份已取消，已完成的部分已保存，下次备份到该目录时将从中断处继续")
+            else:
+                remove_checkpoint(backup_filepath)
+                self.log("备份已取消，已删除不完整的备份文件")
+            return None, backup_count
+
+        os.replace(partial_path, backup_filepath)
+        if checkpoint is None or not checkpoint.completed:
+            # 续传的备份跳过了已写入的部分，速度不具代表性
+            self.history.record("backup", total_bytes, time.monotonic() - started)
+            self._save_history()
+        # 清单记录该时间点桌面的完整状态，供下次增量备份和按时间点还原使用
+        save_manifest(manifest_path_for(backup_filepath),
+                      build_manifest(timestamp, backup_filename, previous_path, plan, written, use_hash))
+        remove_checkpoint(backup_filepath)
+
+        self.log(f"备份完成！文件保存至: {backup_filepath}")
+        self.log(f"共备份了 {backup_count} 个文件")
+        for line in stats.report():
+            self.log(f"压缩统计 {line}")
+        if self.config.get("backup_verify", False):
+            self.verify_backup(backup_filepath, cancel=cancel)
+        return backup_filepath, backup_count
+
+    def verify_backup(self, source, progress=None, cancel=None):
+        """解压校验备份压缩包（source为压缩包或备份目录），返回 {压缩包路径: 校验结果}
+
+        每个成员的CRC32和大小与压缩包目录核对；压缩包旁有备份清单时，
+        还与备份时记录的大小、CRC32和内容摘要核对。progress(ProgressSnapshot) 按压缩后字节数
+        报告每个压缩包的校验进度。
+        """
+        workers = self.config.get("backup_workers", 0) or default_backup_workers()
+        if os.path.isdir(source):
+            archives = sorted(os.path.join(source, name) for name in os.listdir(source) if name.endswith(".zip"))
+        else:
+            archives = [source]
+        results = {}
+        for archive_path in archives:
+            if cancel is not None and cancel.is_set():
+                break
+            name = os.path.basename(archive_path)
+            self.log(f"开始校验备份: {name}")
+            tracker = self._tracker(progress)
+            result = verify_archive(archive_path, expected_members(archive_path), workers=workers,
+                                    progress=tracker, cancel=cancel)
+            tracker.finish()
+            results[archive_path] = result
+            for member, reason in result["errors"]:
+                self.log(f"校验失败: {name} / {member} - {reason}")
+            if result["cancelled"]:
+                self.log(f"校验已取消: {name}")
+            elif result["errors"]:
+                self.log(f"校验完成: {name} 共 {result['members']} 个文件，{len(result['errors'])} 个问题")
+            else:
+                self.log(f"校验通过: {name} 共 {result['members']} 个文件，"
+                         f"{result['bytes'] / 1024 / 1024:.1f} MB")
+        return results
+
+    @_exclusive
+    def backup_to_store(self, store_dir, timestamp=None, progress=None, cancel=None):
+        """备份桌面到去重备份仓库，返回 (快照ID, 统计信息)
+
+        文件按内容切块，仓库中已有的块不再写入；大小和修改时间与上一个快照相同的
+        文件直接沿用上次的块列表。cancel置位后不写入快照，返回的快照ID为None。
+        progress(ProgressSnapshot) 按文件数和字节数报告进度。
+        """
+        tracker = self._tracker(progress)
+        cancel = cancel or threading.Event()
+        workers = self.config.get("backup_workers", 0) or default_backup_workers()
+        self.log("开始备份桌面到去重仓库...")
+
+        store = ChunkStore(store_dir, create=True,
+                           level=self.config.get("backup_compress_level", DEFAULT_COMPRESS_LEVEL))
+        all_files = self.collect_backup_files()
+        snapshots = store.list_snapshots()
+        previous = store.load_snapshot(snapshots[-1]) if snapshots else None
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        tracker.start(len(all_files), sum(entry.size for entry, _ in all_files))
+
+        def on_file(index, entry, arcname, error):
+            tracker.advance(1, entry.size, entry.name)
+            if error is not None:
+                self.log(f"备份文件失败: {entry.name} - {error}")
+                return
+            self.log(f"备份: {entry.name}")
+
+        path, stats = store.snapshot(timestamp, all_files, workers=workers, previous=previous,
+                                     cancel=cancel, on_file=on_file)
+        tracker.finish()
+        if path is None:
+            # 已写入的块没有快照引用，下次gc时回收
+            self.log("备份已取消，未生成快照")
+            return None, stats
+
+        self.log(f"备份完成！快照: {timestamp}，共 {stats['files']} 个文件"
+                 f"（{stats['reused']} 个未变化），新写入 {stats['stored_bytes'] / 1024 / 1024:.1f} MB")
+        return timestamp, stats
+
+    @_exclusive
+    def prune_store(self, store_dir, keep):
+        """只保留最近keep个快照，并回收不再被引用的块，返回 (删除的快照数, 删除的块数, 释放的字节数)"""
+        store = ChunkStore(store_dir)
+        snapshots = store.list_snapshots()
+        expired = snapshots[:-keep] if keep > 0 else []
+        for snapshot_id in expired:
+            store.delete_snapshot(snapshot_id)
+            self.log(f"删除快照: {snapshot_id}")
+        removed, freed = store.gc()
+        self.log(f"清理完成！删除了 {removed} 个数据块，释放 {freed / 1024 / 1024:.1f} MB")
+        return len(expired), removed, freed
+
+    def _load_checkpoint(self, save_dir):
+        """读取save_dir中未完成备份的检查点，已过期（之后又完成过备份）或损坏的直接清理"""
+        found = find_checkpoint(save_dir)
+        if found is None:
+            return None
+        archive_path, path = found
+        try:
+            checkpoint = BackupCheckpoint.load(
+                path, os.path.getsize(partial_path_for(archive_path)),
+                interval=self.config.get("backup_checkpoint_interval", DEFAULT_CHECKPOINT_INTERVAL))
+            # 中断之后又完成过备份时，检查点基于的状态已经过时
+            base = checkpoint.header["base"]
+            manifests = list_manifests(save_dir)
+            if base:
+                valid = bool(manifests) and manifests[-1][1] == os.path.join(save_dir, base)
+            else:
+                valid = not manifests or manifests[-1][0] < checkpoint.header["timestamp"]
+            if valid:
+                return checkpoint
+            checkpoint.close()
+        except Exception as e:
+            self.log(f"备份检查点无法使用: {e}")
+        self.log(f"丢弃未完成的备份: {os.path.basename(archive_path)}")
+        remove_checkpoint(archive_path)
+        return None
+
+    @_exclusive
+    def restore_backup(self, source, dest_dir, at=None, progress=None, cancel=None):
+        """还原某一时间点的备份内容到dest_dir，返回 (还原文件数, 缺失的压缩包列表)
+
+        source可以是备份目录（取不晚于at的最近一次备份）、备份清单、备份压缩包
+        或去重备份仓库（取不晚于at的最近一个快照）。progress(ProgressSnapshot) 按文件数和字节数报告进度。
+        """
+        tracker = self._tracker(progress)
+        if os.path.isdir(source) and is_store(source):
+            store = ChunkStore(source)
+            candidates = [s for s in store.list_snapshots() if at is None or s <= at]
+            if not candidates:
+                raise FileNotFoundError(f"没有找到符合条件的快照: {source}")
+            self.log(f"开始还原快照: {candidates[-1]}")
+            restored = store.restore(candidates[-1], dest_dir, progress=tracker, log=self.log, cancel=cancel)
+            tracker.finish()
+            self.log(f"还原完成！共还原了 {restored} 个文件")
+            return restored, []
+        if os.path.isdir(source):
+            manifest_path = latest_manifest(source, at)
+            if manifest_path is None:
+                raise FileNotFoundError(f"没有找到符合条件的备份清单: {source}")
+        elif source.endswith(".zip"):
+            manifest_path = manifest_path_for(source)
+        else:
+            manifest_path = source
+        self.log(f"开始还原备份: {os.path.basename(manifest_path)}")
+        restored, missing = restore_snapshot(manifest_path, dest_dir, progress=tracker, log=self.log,
+                                             cancel=cancel)
+        tracker.finish()
+        self.log(f"还原完成！共还原了 {restored} 个文件")
+        return restored, missing
@@ -0,0 +1,175 @@
+import json
+import os
+import time
+from datetime import datetime
+
+JOURNAL_VERSION = 1
+JOURNAL_SUFFIX = ".journal.jsonl"
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_SYNC_INTERVAL = 1.0
+
+
+def journal_path_for(record_path):
+    """整理记录对应的日志文件路径"""
+    return os.path.splitext(record_path)[0] + JOURNAL_SUFFIX
+
+
+class OrganizeJournal:
+    """只追加的整理日志（JSON Lines）
+
+    每次移动前先写入一行移动意图，按批次flush+fsync后才真正移动，
+    进程中途退出时已移动的文件都能从日志中恢复。内存中只保留计数、
+    分类集合和失败序号，与文件数量无关。
+
+    文件格式：
+        {"journal": 1, "timestamp": ..., "desktop": ..., "created_folders": [...]}  头部
+        {"i": 序号, "original": ..., "new": ..., "category": ...}  移动意图
+        {"failed": 序号}                                          移动失败
+        {"summary": {...}}                                        结束摘要
+    """
+
+    def __init__(self, path, timestamp, desktop_path, created_folders=(), batch_size=DEFAULT_BATCH_SIZE,
+                 sync_interval=DEFAULT_SYNC_INTERVAL):
+        self.path = path
+        self.timestamp = timestamp
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.failed = set()
+        self.categories = set()
+        self.intents = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._file = open(path, 'w', encoding='utf-8')
+        self._write({"journal": JOURNAL_VERSION, "timestamp": timestamp, "desktop": desktop_path,
+                     "created_folders": list(created_folders)})
+        self.sync()
+
+    def _write(self, obj):
+        self._file.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+    def record_move(self, index, original, new, category):
+        """写入一条移动意图（在实际移动之前调用）"""
+        self._write({"i": index, "original": original, "new": new, "category": category})
+        self.intents += 1
+        self._pending += 1
+
+    def record_failure(self, index):
+        """标记某条移动失败，最终记录中不包含该条"""
+        self._write({"failed": index})
+        self.failed.add(index)
+        self._pending += 1
+        self.maybe_sync()
+
+    def record_success(self, category):
+        self.categories.add(category)
+
+    def maybe_sync(self):
+        """达到批次大小或时间间隔时同步到磁盘"""
+        if self._pending >= self.batch_size or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """flush并fsync，之后写入的意图在断电后也不会丢失"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    @property
+    def total_files(self):
+        return self.intents - len(self.failed)
+
+    def summary(self):
+        return {
+            "timestamp": self.timestamp,
+            "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "total_files": self.total_files,
+            "categories_created": sorted(self.categories)
+        }
+
+    def finish(self):
+        """写入结束摘要并关闭日志，返回摘要"""
+        summary = self.summary()
+        self._write({"summary": summary})
+        self.sync()
+        self._file.close()
+        return summary
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def iter_journal(path):
+    """逐行读取整理日志，返回(头部, 摘要或None, 移动条目迭代器)
+
+    移动条目与整理记录中的files格式一致；失败的条目被跳过，
+    末尾因进程中断而不完整的行会被忽略。
+    """
+    header = None
+    summary = None
+    failed = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                continue
+            if "journal" in obj:
+                header = obj
+            elif "failed" in obj:
+                failed.add(obj["failed"])
+            elif "summary" in obj:
+                summary = obj["summary"]
+
+    timestamp = (header or {}).get("timestamp")
+
+    def entries():
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    continue
+                if "i" in obj and obj["i"] not in failed:
+                    yield {
+                        "original": obj["original"],
+                        "new": obj["new"],
+                        "category": obj["category"],
+                        "timestamp": timestamp
+                    }
+
+    return header, summary, entries()
+
+
+def write_record(record_path, summary, files, legacy_record_path=None):
+    """将移动条目流式写成整理记录（与旧版json.dump格式兼容）"""
+    tmp_path = record_path + ".tmp"
+    legacy = None
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            if legacy_record_path:
+                legacy = open(legacy_record_path + ".tmp", 'w', encoding='utf-8')
+                legacy.write("[")
+            f.write("{\n")
+            for key in ("timestamp", "datetime", "total_files", "categories_created"):
+                f.write(f'  "{key}": {json.dumps(summary[key], ensure_ascii=False)},\n')
+            f.write('  "files": [')
+            first = True
+            for item in files:
+                line = json.dumps(item, ensure_ascii=False)
+                f.write(("\n    " if first else ",\n    ") + line)
+                if legacy is not None:
+                    legacy.write(("\n  " if first else ",\n  ") + line)
+                first = False
+            f.write("\n  ]\n}\n")
+            if legacy is not None:
+                legacy.write("\n]\n")
+                legacy.close()
+        os.replace(tmp_path, record_path)
+        if legacy is not None:
+            os.replace(legacy_record_path + ".tmp", legacy_record_path)
+    finally:
+        if legacy is not None and not legacy.closed:
+            legacy.close()
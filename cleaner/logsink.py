@@ -0,0 +1,80 @@
+import re
+import threading
+from collections import deque
+from datetime import datetime
+
+DEFAULT_CAPACITY = 1000
+
+# 逐个文件输出的日志合并为一个正则，每条消息只匹配一次
+_REPEATED_RE = re.compile(r"移动(文件|文件夹): .* -> (.+)|恢复: |备份: ")
+
+
+def repeat_key(message):
+    """逐个文件的日志返回聚合键（显示格式, 参数...），其他日志返回None"""
+    match = _REPEATED_RE.match(message)
+    if match is None:
+        return None
+    if match.group(1):
+        return ("移动了 {count:,} 个{0} → {1}", match.group(1), match.group(2))
+    if message.startswith("恢复"):
+        return ("恢复了 {count:,} 个文件",)
+    return ("备份了 {count:,} 个文件",)
+
+
+class LogSink:
+    """有界、可合并的日志缓冲区（线程安全）
+
+    append() 只在内存中追加，由界面定时调用 drain() 批量取出显示。
+    连续的同类逐文件日志合并为一行计数（如“移动了 1,234 个文件 → 📄 文档”），
+    缓冲区超过 capacity 行时丢弃最旧的行并记下丢弃数量。
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, simplify=None):
+        self.simplify = simplify or (lambda message: message)
+        self._lock = threading.Lock()
+        # 每项为 [时间, 聚合键, 显示文本, 计数]
+        self._records = deque(maxlen=capacity)
+        self._dropped = 0
+        # 上次drain返回的最后一行（仍可能继续累加）
+        self._open = None
+
+    def append(self, message, timestamp=None):
+        timestamp = timestamp or datetime.now().strftime("%H:%M:%S")
+        key = repeat_key(message)
+        with self._lock:
+            last = self._records[-1] if self._records else None
+            if key is not None and last is not None and last[1] == key:
+                last[0] = timestamp
+                last[3] += 1
+                return
+            if key is not None and last is None and self._open is not None and self._open[1] == key:
+                # 接着上次已显示的聚合行继续计数
+                self._records.append([timestamp, key, None, self._open[3] + 1])
+                return
+            if len(self._records) == self._records.maxlen:
+                self._dropped += 1
+            self._records.append([timestamp, key, self.simplify(message), 1])
+
+    def drain(self):
+        """取出缓冲的日志，返回 (是否替换上次的最后一行, 行列表)"""
+        with self._lock:
+            records = list(self._records)
+            self._records.clear()
+            dropped, self._dropped = self._dropped, 0
+            previous = self._open
+            if records:
+                self._open = records[-1]
+        if not records:
+            return False, []
+
+        replace_last = records[0][2] is None and previous is not None
+        lines = []
+        if dropped:
+            replace_last = False
+            lines.append(f"[{records[0][0]}] ... 省略了 {dropped:,} 条日志\n")
+        for timestamp, key, text, count in records:
+            if count > 1 or text is None:
+                fmt = key[0]
+                text = fmt.format(*key[1:], count=count)
+            lines.append(f"[{timestamp}] {text}\n")
+        return replace_last, lines
@@ -0,0 +1,210 @@
+import json
+import os
+import re
+import shutil
+import zipfile
+from datetime import datetime
+
+from .mover import run_ordered
+from .transfer import file_digest
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".manifest.json"
+FULL_PREFIX = "桌面备份"
+INCREMENTAL_PREFIX = "桌面增量备份"
+
+_MANIFEST_NAME = re.compile(rf"^(?:{FULL_PREFIX}|{INCREMENTAL_PREFIX})_(.+){re.escape(MANIFEST_SUFFIX)}$")
+_COPY_CHUNK = 1024 * 1024
+
+
+def manifest_path_for(archive_path):
+    """备份压缩包对应的清单文件路径"""
+    return os.path.splitext(archive_path)[0] + MANIFEST_SUFFIX
+
+
+def manifest_key(arcname):
+    """清单中统一使用 / 作为路径分隔符（与ZIP成员名一致）"""
+    return arcname.replace(os.sep, "/")
+
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"不支持的备份清单版本: {manifest.get('version')}")
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """先写临时文件再替换，清单要么是旧的要么是完整的新清单"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def list_manifests(backup_dir):
+    """列出目录中的备份清单，按时间戳升序返回 [(时间戳, 路径), ...]"""
+    found = []
+    try:
+        names = os.listdir(backup_dir)
+    except FileNotFoundError:
+        return found
+    for name in names:
+        match = _MANIFEST_NAME.match(name)
+        if match:
+            found.append((match.group(1), os.path.join(backup_dir, name)))
+    found.sort()
+    return found
+
+
+def latest_manifest(backup_dir, at=None):
+    """返回不晚于时间戳at（为None时不限）的最近一次备份清单路径，没有时返回None"""
+    latest = None
+    for timestamp, path in list_manifests(backup_dir):
+        if at is not None and timestamp > at:
+            break
+        latest = path
+    return latest
+
+
+class IncrementalPlan:
+    """增量备份计划：需要写入的文件、沿用上次备份的条目和删除标记（墓碑）"""
+
+    def __init__(self, previous_files, to_write, kept, deleted, digests):
+        self.previous_files = previous_files
+        self.to_write = to_write
+        self.kept = kept
+        self.deleted = deleted
+        self.digests = digests
+
+
+def plan_incremental(files, previous, use_hash=False, workers=1):
+    """与上次的清单比较，得到增量计划
+
+    大小和修改时间都相同的文件视为未变化；启用use_hash时，大小相同但修改
+    时间不同的文件再比较内容摘要，只是被“触碰”过的文件不会重复备份。
+    previous为None时所有文件都需要写入（完整备份）。files可以是生成器（只读取一遍）。
+    """
+    files = list(files)
+    previous_files = previous["files"] if previous else {}
+    to_write = []
+    kept = {}
+    to_hash = []
+    current_keys = set()
+    for entry, arcname in files:
+        key = manifest_key(arcname)
+        current_keys.add(key)
+        old = previous_files.get(key)
+        if old is not None and old[0] == entry.size:
+            if old[1] == entry.mtime:
+                kept[key] = old
+                continue
+            if use_hash and old[3]:
+                to_hash.append((entry, arcname, old))
+                continue
+        to_write.append((entry, arcname))
+
+    digests = {}
+    if use_hash:
+        def digest_job(item):
+            return file_digest(item[0].path).hex()
+
+        for (entry, arcname, old), digest, error in run_ordered(digest_job, to_hash, workers):
+            key = manifest_key(arcname)
+            if error is None and digest == old[3]:
+                # 内容未变，只更新修改时间
+                kept[key] = [entry.size, entry.mtime, old[2], digest] + old[4:]
+            else:
+                digests[key] = digest
+                to_write.append((entry, arcname))
+        # 保持扫描顺序，压缩包成员顺序稳定
+        order = {manifest_key(arcname): i for i, (_, arcname) in enumerate(files)}
+        to_write.sort(key=lambda item: order[manifest_key(item[1])])
+
+    deleted = sorted(key for key in previous_files if key not in current_keys)
+    return IncrementalPlan(previous_files, to_write, kept, deleted, digests)
+
+
+def build_manifest(timestamp, archive_name, previous_path, plan, written, use_hash=False):
+    """生成本次备份的清单：files为该时间点桌面的完整状态，每个文件指向存放其内容的压缩包
+
+    每项为 [大小, 修改时间, 压缩包, 内容摘要或None, CRC32]（早期的清单没有CRC32）。
+    written为本次成功写入压缩包的 [(Entry, 名称, CRC32), ...]；写入失败的文件若上次
+    备份过则沿用旧版本，保证清单中的每一项都能还原。
+    """
+    files = dict(plan.kept)
+    written_keys = set()
+    for entry, arcname, crc in written:
+        key = manifest_key(arcname)
+        written_keys.add(key)
+        digest = plan.digests.get(key)
+        if digest is None and use_hash:
+            digest = file_digest(entry.path).hex()
+        files[key] = [entry.size, entry.mtime, archive_name, digest, crc]
+    for entry, arcname in plan.to_write:
+        key = manifest_key(arcname)
+        if key not in written_keys and key in plan.previous_files:
+            files[key] = plan.previous_files[key]
+    return {
+        "version": MANIFEST_VERSION,
+        "timestamp": timestamp,
+        "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "kind": "incremental" if previous_path else "full",
+        "archive": archive_name,
+        "base": os.path.basename(previous_path) if previous_path else None,
+        "files": files,
+        "deleted": plan.deleted,
+    }
+
+
+def safe_target(dest_dir, name):
+    """压缩包内名称转换为目标路径，拒绝绝对路径和 .. 以免写到目标目录之外"""
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if not parts or ".." in parts or os.path.isabs(name) or ":" in parts[0]:
+        raise ValueError(f"不安全的路径: {name}")
+    return os.path.join(dest_dir, *parts)
+
+
+def restore_snapshot(manifest_path, dest_dir, progress=None, log=None, cancel=None):
+    """按清单还原某一时间点的完整备份内容，返回 (还原文件数, 缺失的压缩包列表)
+
+    每个文件从清单指向的压缩包（完整备份或之后某次增量备份）中读取，
+    每个压缩包只打开一次。progress为ProgressTracker，按文件数和字节数更新。
+    """
+    log = log or (lambda message: None)
+    manifest = load_manifest(manifest_path)
+    backup_dir = os.path.dirname(manifest_path)
+    by_archive = {}
+    for key, value in manifest["files"].items():
+        by_archive.setdefault(value[2], []).append((key, value[0], value[1]))
+
+    done = 0
+    missing = []
+    if progress is not None:
+        progress.start(len(manifest["files"]), sum(value[0] for value in manifest["files"].values()))
+    for archive in sorted(by_archive):
+        archive_path = os.path.join(backup_dir, archive)
+        if not os.path.exists(archive_path):
+            missing.append(archive)
+            log(f"缺少备份文件，无法还原其中的 {len(by_archive[archive])} 个文件: {archive}")
+            if progress is not None:
+                progress.advance(len(by_archive[archive]), sum(size for _, size, _ in by_archive[archive]))
+            continue
+        with zipfile.ZipFile(archive_path) as zipf:
+            for key, size, mtime in by_archive[archive]:
+                if cancel is not None and cancel.is_set():
+                    return done, missing
+                try:
+                    target = safe_target(dest_dir, key)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with zipf.open(key) as src, open(target, 'wb') as dst:
+                        shutil.copyfileobj(src, dst, _COPY_CHUNK)
+                    os.utime(target, (mtime, mtime))
+                except Exception as e:
+                    log(f"还原失败: {key} - {e}")
+                else:
+                    done += 1
+                if progress is not None:
+                    progress.advance(1, size, key)
+    return done, missing
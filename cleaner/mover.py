@@ -0,0 +1,98 @@
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MOVE_WORKERS = 4
+
+
+def run_ordered(func, items, workers=DEFAULT_MOVE_WORKERS):
+    """用有界线程池执行func(item)，按items原顺序产出 (item, 结果, 异常)
+
+    items可以是生成器，按需读取；同时在途的任务数不超过 workers*4，
+    处理大量文件时内存占用有上限。
+    """
+    if workers <= 1:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    def result_of(pair):
+        item, future = pair
+        try:
+            return item, future.result(), None
+        except Exception as e:
+            return item, None, e
+
+    window = workers * 4
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append((item, pool.submit(func, item)))
+            if len(pending) >= window:
+                yield result_of(pending.popleft())
+        while pending:
+            yield result_of(pending.popleft())
+
+
+# Windows和macOS默认文件系统不区分大小写
+CASE_INSENSITIVE_FS = os.name == "nt" or sys.platform == "darwin"
+
+
+class NameIndex:
+    """单个目标目录的名称索引：初始化时列一次目录，之后在内存中分配不重名的名称"""
+
+    def __init__(self, directory, case_insensitive=CASE_INSENSITIVE_FS):
+        self._key = str.casefold if case_insensitive else str
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            names = []
+        self._taken = {self._key(name) for name in names}
+        # 每个原始名称下一次尝试的序号，同名文件再多也不必从1开始重新探测
+        self._next_counter = {}
+
+    def claim(self, name, is_dir):
+        """返回一个未被占用的名称并标记为已占用（调用方负责加锁）"""
+        key = self._key
+        name_key = key(name)
+        if name_key not in self._taken:
+            self._taken.add(name_key)
+            return name
+
+        if is_dir:
+            # 文件夹重名处理
+            stem, ext = name, ""
+        else:
+            # 文件重名处理
+            stem, ext = os.path.splitext(name)
+        counter = self._next_counter.get(name_key, 1)
+        candidate = f"{stem}_{counter}{ext}"
+        while key(candidate) in self._taken:
+            counter += 1
+            candidate = f"{stem}_{counter}{ext}"
+        self._next_counter[name_key] = counter + 1
+        self._taken.add(key(candidate))
+        return candidate
+
+
+class DestinationNamer:
+    """线程安全地为移动目标分配不重名的路径，每个目标目录只列一次"""
+
+    def __init__(self, case_insensitive=CASE_INSENSITIVE_FS):
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._case_insensitive = case_insensitive
+
+    def claim(self, dest_path, is_dir):
+        """返回一个当前不存在且未被其他线程占用的目标路径"""
+        directory, name = os.path.split(dest_path)
+        with self._lock:
+            index = self._indexes.get(directory)
+            if index is None:
+                index = self._indexes[directory] = NameIndex(directory, self._case_insensitive)
+            return os.path.join(directory, index.claim(name, is_dir))
@@ -0,0 +1,22 @@
+import os
+
+try:
+    import winreg
+except ImportError:  # 非Windows平台
+    winreg = None
+
+
+def get_desktop_path():
+    """获取桌面路径"""
+    if winreg is not None:
+        try:
+            # 从注册表获取桌面路径
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER,
+                                 r"Software\Microsoft\Windows\CurrentVersion\Explorer\Shell Folders")
+            desktop_path = winreg.QueryValueEx(key, "Desktop")[0]
+            winreg.CloseKey(key)
+            return desktop_path
+        except OSError:
+            pass
+    # 备用方法
+    return os.path.join(os.path.expanduser("~"), "Desktop")
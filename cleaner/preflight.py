@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+
+from .progress import format_bytes, format_duration
+
+HISTORY_VERSION = 1
+# 没有历史记录时使用的保守速度：整理同卷重命名（个/秒）、跨卷复制和备份（字节/秒）
+DEFAULT_RATES = {
+    "rename": 500.0,
+    "copy": 50 * 1024 * 1024,
+    "backup": 30 * 1024 * 1024,
+}
+# 历史速度按耗时加权，每次新记录时旧数据的权重减半
+_HISTORY_DECAY = 0.5
+# 耗时太短的运行主要是固定开销，测得的速度没有参考价值，不记录
+_MIN_SAMPLE_SECONDS = 0.5
+# ZIP每个成员的本地文件头、数据描述符、中央目录项和ZIP64扩展字段的大致开销（不含文件名）
+_ZIP_MEMBER_OVERHEAD = 160
+
+
+class InsufficientSpaceError(OSError):
+    """目标位置剩余空间不足，拒绝开始整理或备份"""
+
+
+def free_space(path):
+    """path所在卷的剩余字节数（path不存在时取最近的已存在的上级目录），无法获取时返回None"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return None
+
+
+def zip_size_bound(file_count, total_bytes, name_bytes):
+    """写出ZIP所需空间的上界：原始大小、DEFLATE最坏情况的膨胀和每个成员的头部"""
+    return total_bytes + total_bytes // 1000 + file_count * _ZIP_MEMBER_OVERHEAD + 2 * name_bytes
+
+
+class ThroughputHistory:
+    """记录之前运行测得的速度，用于预估耗时（JSON文件，path为None时只保存在内存中）
+
+    每种速度保存按耗时加权的 [处理量, 秒数]，新记录加入前旧数据权重减半，
+    因此速度主要反映最近几次运行，又不会被一次很短的运行带偏。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.rates = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == HISTORY_VERSION:
+                    self.rates = data.get("rates", {})
+            except Exception:
+                # 历史记录损坏时当作没有记录
+                self.rates = {}
+
+    def rate(self, key):
+        """平均速度（每秒处理量），没有记录时使用默认值"""
+        amount, seconds = self.rates.get(key, (0, 0))
+        if amount <= 0 or seconds <= 0:
+            return DEFAULT_RATES[key]
+        return amount / seconds
+
+    def record(self, key, amount, seconds):
+        if amount <= 0 or seconds < _MIN_SAMPLE_SECONDS:
+            return
+        old_amount, old_seconds = self.rates.get(key, (0, 0))
+        self.rates[key] = [old_amount * _HISTORY_DECAY + amount, old_seconds * _HISTORY_DECAY + seconds]
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": HISTORY_VERSION, "rates": self.rates}, f)
+        os.replace(tmp_path, self.path)
+
+
+class Estimate:
+    """整理或备份开始前的预检结果：按分类的数量和大小、跨卷移动、所需空间和预计耗时"""
+
+    def __init__(self, operation):
+        self.operation = operation
+        # 分类 -> [数量, 字节数]
+        self.categories = {}
+        self.items = 0
+        self.bytes = 0
+        self.cross_device_items = 0
+        self.cross_device_bytes = 0
+        # [(目标路径, 所需字节数, 剩余字节数或None), ...]
+        self.space = []
+        self.seconds = 0.0
+        # 预检时得到的计划，确认后交给organize/backup直接使用，不再重新扫描：
+        # 整理为 (扫描结果, [(Entry, 分类), ...])，增量备份为 (上次的清单路径, IncrementalPlan)
+        self.plan = None
+
+    def add(self, category, size, cross_device=False):
+        row = self.categories.get(category)
+        if row is None:
+            row = self.categories[category] = [0, 0]
+        row[0] += 1
+        row[1] += size
+        self.items += 1
+        self.bytes += size
+        if cross_device:
+            self.cross_device_items += 1
+            self.cross_device_bytes += size
+
+    def require(self, path, required):
+        """记录需要在path所在卷上写入的字节数"""
+        self.space.append((path, required, free_space(path)))
+
+    @property
+    def shortfalls(self):
+        """剩余空间不足的 [(目标路径, 所需字节数, 剩余字节数), ...]"""
+        return [(path, required, free) for path, required, free in self.space
+                if free is not None and required > free]
+
+    @property
+    def fits(self):
+        return not self.shortfalls
+
+    def check_space(self):
+        """剩余空间不足时抛出InsufficientSpaceError"""
+        shortfalls = self.shortfalls
+        if shortfalls:
+            path, required, free = shortfalls[0]
+            raise InsufficientSpaceError(f"剩余空间不足: {path} 需要 {format_bytes(required)}，"
+                                         f"仅剩 {format_bytes(free)}")
+
+    def report(self):
+        """预检结果的文本（每行一项）"""
+        name = "整理" if self.operation == "organize" else "备份"
+        lines = [f"{name}预检: {self.items} 项，共 {format_bytes(self.bytes)}，"
+                 f"预计耗时 {format_duration(self.seconds)}"]
+        for category, (count, size) in sorted(self.categories.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {category}: {count} 项，{format_bytes(size)}")
+        if self.cross_device_items:
+            lines.append(f"  跨卷移动: {self.cross_device_items} 项，{format_bytes(self.cross_device_bytes)}")
+        for path, required, free in self.space:
+            free_text = "未知" if free is None else format_bytes(free)
+            lines.append(f"  {path}: 需要 {format_bytes(required)}，剩余 {free_text}")
+        return lines
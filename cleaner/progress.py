@@ -0,0 +1,171 @@
+import math
+import time
+from collections import namedtuple
+
+# 回调的最小间隔（秒），进度更新再频繁也不会拖慢整理/备份本身
+DEFAULT_INTERVAL = 0.1
+# 吞吐量指数平滑的时间常数（秒）：越大越平稳，越小越跟手
+DEFAULT_SMOOTHING = 3.0
+# 开始后至少经过这么久才给出剩余时间，避免开头的估计大幅跳动
+_ETA_WARMUP = 1.0
+
+
+class ProgressSnapshot(namedtuple("ProgressSnapshot", "items total_items bytes total_bytes byte_rate item_rate "
+                                                      "elapsed eta name finished")):
+    """某一时刻的进度（不可变，可以安全地传给界面线程）
+
+    total_items/total_bytes 为0表示总量未知；byte_rate/item_rate 为平滑后的每秒字节数/条目数；
+    eta为预计剩余秒数，无法估计时为None。
+    """
+    __slots__ = ()
+
+    @property
+    def fraction(self):
+        """完成比例（0~1），有总字节数时按字节计算，否则按条目数，总量未知时为None"""
+        if self.total_bytes:
+            return min(self.bytes / self.total_bytes, 1.0)
+        if self.total_items:
+            return min(self.items / self.total_items, 1.0)
+        return 1.0 if self.finished else None
+
+
+class ProgressTracker:
+    """整理、备份、恢复共用的进度模型：字节数、条目数、平滑吞吐量和剩余时间
+
+    advance()/update() 只更新计数，开销很小；距上次回调超过interval秒时才计算速率并
+    调用callback(ProgressSnapshot)。start()和finish()总会回调。
+    """
+
+    def __init__(self, callback=None, interval=DEFAULT_INTERVAL, smoothing=DEFAULT_SMOOTHING, clock=time.monotonic):
+        self.callback = callback
+        self.interval = interval
+        self.smoothing = smoothing
+        self.clock = clock
+        self.items = 0
+        self.bytes = 0
+        self.total_items = 0
+        self.total_bytes = 0
+        self.name = ""
+        self.finished = False
+        self.byte_rate = 0.0
+        self.item_rate = 0.0
+        self._started = self._last_emit = clock()
+        self._last_items = 0
+        self._last_bytes = 0
+
+    def start(self, total_items=0, total_bytes=0):
+        """设置总量（未知时为0）并重新开始计时"""
+        self.total_items = total_items
+        self.total_bytes = total_bytes
+        self.items = self.bytes = 0
+        self._last_items = self._last_bytes = 0
+        self.byte_rate = self.item_rate = 0.0
+        self._started = self._last_emit = self.clock()
+        self._emit(self._started)
+
+    def advance(self, items=0, nbytes=0, name=None):
+        """在当前计数上增加"""
+        self.items += items
+        self.bytes += nbytes
+        if name is not None:
+            self.name = name
+        self._maybe_emit()
+
+    def update(self, items=None, nbytes=None, name=None):
+        """设置当前计数（调用方已经在累计时使用）"""
+        if items is not None:
+            self.items = items
+        if nbytes is not None:
+            self.bytes = nbytes
+        if name is not None:
+            self.name = name
+        self._maybe_emit()
+
+    def finish(self):
+        self.finished = True
+        self._update_rates(self.clock())
+        self._emit(self._last_emit)
+
+    def _maybe_emit(self):
+        now = self.clock()
+        if now - self._last_emit >= self.interval:
+            self._update_rates(now)
+            self._emit(now)
+
+    def _update_rates(self, now):
+        dt = now - self._last_emit
+        if dt <= 0:
+            return
+        # 按时间间隔换算平滑系数，回调频率变化时平滑效果不变
+        alpha = 1 - math.exp(-dt / self.smoothing) if self.smoothing > 0 else 1.0
+        byte_rate = (self.bytes - self._last_bytes) / dt
+        item_rate = (self.items - self._last_items) / dt
+        if now - self._started <= dt:
+            # 第一个采样直接作为初始速率
+            self.byte_rate, self.item_rate = byte_rate, item_rate
+        else:
+            self.byte_rate += alpha * (byte_rate - self.byte_rate)
+            self.item_rate += alpha * (item_rate - self.item_rate)
+        self._last_bytes = self.bytes
+        self._last_items = self.items
+        self._last_emit = now
+
+    def _eta(self, elapsed):
+        if self.finished:
+            return 0.0
+        if elapsed < _ETA_WARMUP:
+            return None
+        if self.total_bytes and self.byte_rate > 0:
+            return max(self.total_bytes - self.bytes, 0) / self.byte_rate
+        if self.total_items and self.item_rate > 0:
+            return max(self.total_items - self.items, 0) / self.item_rate
+        return None
+
+    def snapshot(self):
+        elapsed = self._last_emit - self._started
+        return ProgressSnapshot(self.items, self.total_items, self.bytes, self.total_bytes, self.byte_rate,
+                                self.item_rate, elapsed, self._eta(elapsed), self.name, self.finished)
+
+    def _emit(self, now):
+        self._last_emit = now
+        if self.callback is not None:
+            self.callback(self.snapshot())
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds):
+    seconds = int(seconds + 0.5)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def describe(snapshot, unit="个"):
+    """一行进度描述，如 “42% · 1.2 GB / 3.4 GB · 120/300 个 · 56.7 MB/s · 剩余 0:42”"""
+    parts = []
+    fraction = snapshot.fraction
+    if fraction is not None:
+        parts.append(f"{fraction * 100:.0f}%")
+    if snapshot.total_bytes:
+        parts.append(f"{format_bytes(snapshot.bytes)} / {format_bytes(snapshot.total_bytes)}")
+    if snapshot.total_items:
+        parts.append(f"{snapshot.items:,}/{snapshot.total_items:,} {unit}")
+    elif snapshot.items:
+        parts.append(f"{snapshot.items:,} {unit}")
+    if snapshot.finished:
+        parts.append(f"用时 {format_duration(snapshot.elapsed)}")
+    else:
+        if snapshot.total_bytes and snapshot.byte_rate > 0:
+            parts.append(f"{format_bytes(snapshot.byte_rate)}/s")
+        elif snapshot.item_rate > 0:
+            parts.append(f"{snapshot.item_rate:,.0f} {unit}/秒")
+        if snapshot.eta is not None:
+            parts.append(f"剩余 {format_duration(snapshot.eta)}")
+    return " · ".join(parts)
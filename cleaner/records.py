@@ -0,0 +1,201 @@
+import codecs
+import json
+import os
+
+READ_CHUNK = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class RecordFormatError(ValueError):
+    """整理记录格式不正确"""
+
+
+class RecordReader:
+    """流式读取整理记录，逐条产出files中的条目，内存占用与记录大小无关
+
+    支持三种格式：
+      - 整理记录JSON：{"timestamp": ..., "files": [...]}
+      - 旧版备份记录JSON：[{...}, ...]
+      - 按行分隔的记录（整理日志 .journal.jsonl 或每行一个条目的JSONL）
+
+    meta 中保存记录的摘要字段（timestamp、datetime、total_files等），
+    位于files之前的字段在开始产出条目前即可用，其余字段在读完后补全。
+    bytes_read / total_bytes 可用于按读取字节数显示进度。
+    """
+
+    def __init__(self, path, chunk_size=READ_CHUNK):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.total_bytes = os.path.getsize(path)
+        self.meta = {}
+        self._file = None
+        self._utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    @property
+    def bytes_read(self):
+        """已从记录文件读取并处理的字节数（按缓冲区中未处理的字符数估算）"""
+        if self._file is None or self._file.closed:
+            return self.total_bytes if self._eof else 0
+        return max(0, self._file.tell() - (len(self._buf) - self._pos))
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            self._file = f
+            first = self._peek_first_line()
+            if first is not None:
+                yield from self._iter_lines(self._failed_indices() if "journal" in first else set())
+            else:
+                yield from self._iter_json()
+            self._eof = True
+
+    # ---- 底层缓冲 ----
+
+    def _fill(self):
+        """再读入一块数据，到达文件末尾时返回False"""
+        if self._eof:
+            return False
+        data = self._file.read(self.chunk_size)
+        if not data:
+            self._buf += self._utf8.decode(b"", final=True)
+            self._eof = True
+            return False
+        # 丢弃已消费的部分，保持缓冲区大小有界
+        if self._pos > len(self._buf) // 2:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        self._buf += self._utf8.decode(data)
+        return True
+
+    def _skip_ws(self):
+        """跳过空白，返回下一个字符（文件结束时为空字符串）"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars):
+        ch = self._skip_ws()
+        if not ch or ch not in chars:
+            raise RecordFormatError(f"整理记录格式不正确: 期望 {chars!r}，实际为 {ch!r}")
+        self._pos += 1
+        return ch
+
+    def _decode_value(self):
+        """解析下一个完整的JSON值，数据不足时继续读取"""
+        self._skip_ws()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise RecordFormatError(f"整理记录格式不正确: {e}")
+            # 数字等值可能恰好被数据块截断，确保其后还有分隔符
+            if end == len(self._buf) and not self._eof and not isinstance(value, (dict, list, str)):
+                if self._fill():
+                    continue
+            self._pos = end
+            return value
+
+    # ---- JSON格式 ----
+
+    def _iter_array(self):
+        self._expect("[")
+        if self._skip_ws() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            if self._expect(",]") == "]":
+                return
+
+    def _iter_json(self):
+        ch = self._skip_ws()
+        if ch == "[":
+            yield from self._iter_array()
+            return
+        if ch != "{":
+            raise RecordFormatError("整理记录格式不正确")
+        self._pos += 1
+        if self._skip_ws() == "}":
+            return
+        while True:
+            key = self._decode_value()
+            self._expect(":")
+            if key == "files":
+                yield from self._iter_array()
+            else:
+                self.meta[key] = self._decode_value()
+            if self._expect(",}") == "}":
+                return
+
+    # ---- 按行分隔的格式 ----
+
+    def _peek_first_line(self):
+        """若记录是按行分隔的格式，返回首行对象，否则返回None"""
+        # 最多预读两块：单行的紧凑JSON记录不会因此被整个读入内存
+        while "\n" not in self._buf and len(self._buf) < self.chunk_size * 2 and self._fill():
+            pass
+        line = self._buf[self._pos:].split("\n", 1)[0]
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            return None
+        if isinstance(obj, dict) and ("journal" in obj or "original" in obj):
+            return obj
+        return None
+
+    def _failed_indices(self):
+        """整理日志中失败标记总是写在对应的移动意图之后，先单独读一遍收集失败的序号"""
+        failed = set()
+        with open(self.path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            for line in f:
+                if '"failed"' not in line:
+                    continue
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(obj, dict) and "failed" in obj:
+                    failed.add(obj["failed"])
+        return failed
+
+    def _iter_lines(self, failed):
+        while True:
+            newline = self._buf.find("\n", self._pos)
+            if newline < 0:
+                if self._fill():
+                    continue
+                line = self._buf[self._pos:]
+                self._pos = len(self._buf)
+                if not line.strip():
+                    return
+            else:
+                line = self._buf[self._pos:newline]
+                self._pos = newline + 1
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                # 进程中断时最后一行可能不完整
+                continue
+            if "journal" in obj:
+                self.meta["timestamp"] = obj.get("timestamp")
+                self.meta["created_folders"] = obj.get("created_folders", [])
+            elif "summary" in obj:
+                self.meta.update(obj["summary"])
+            elif "failed" in obj:
+                continue
+            elif "original" in obj:
+                if obj.get("i") in failed:
+                    continue
+                obj.pop("i", None)
+                obj.setdefault("timestamp", self.meta.get("timestamp"))
+                yield obj
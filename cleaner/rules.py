@@ -0,0 +1,292 @@
+import bisect
+import fnmatch
+import re
+import time
+
+# 规则中可用的条件；同一条规则的多个条件需要同时满足
+RULE_KEYS = frozenset(["glob", "regex", "prefix", "extensions", "min_size_mb", "max_size_mb",
+                       "min_age_days", "max_age_days", "priority"])
+_LEADING_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+_DAY = 86400.0
+_MB = 1024 * 1024
+
+
+def _as_list(value):
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _glob_prefix(pattern):
+    """glob开头第一个通配符之前的固定部分（小写）"""
+    end = min([pattern.find(ch) for ch in "*?[" if ch in pattern] or [len(pattern)])
+    return pattern[:end].lower()
+
+
+def _regex_prefix(pattern):
+    """以^开头的正则表达式开头的固定文字（小写），无法确定时返回空字符串
+
+    只做保守的判断：含有 | 的表达式（可能绕过开头）和不以^开头的表达式都不提取。
+    """
+    if not pattern.startswith("^") or "|" in pattern:
+        return ""
+    end = 1
+    while end < len(pattern) and pattern[end] not in ".^$*+?{}[]\\|()":
+        end += 1
+    literal = pattern[1:end]
+    if end < len(pattern) and pattern[end] in "*?{":
+        # 量词作用于最后一个字符，该字符可能不出现
+        literal = literal[:-1]
+    return literal.lower()
+
+
+def _literal_suffix(pattern):
+    """glob中最后一个点之后的部分不含通配符时返回该扩展名（小写），否则返回None"""
+    dot = pattern.rfind(".")
+    if dot < 0 or any(ch in pattern[dot:] for ch in "*?["):
+        return None
+    return pattern[dot:].lower()
+
+
+class _Rule:
+    __slots__ = ("category", "priority", "order", "pattern", "regex", "buckets", "keys", "size", "age", "rule")
+
+    def __init__(self, category, rule, order):
+        unknown = set(rule) - RULE_KEYS
+        if unknown:
+            raise ValueError(f"分类 {category} 的规则中有未知的条件: {', '.join(sorted(unknown))}")
+        self.category = category
+        self.rule = rule
+        self.priority = rule.get("priority", 0)
+        self.order = order
+
+        # 名称条件编译为若干前瞻断言，合并后的正则中每条规则是一个分支
+        parts = []
+        # 只能匹配特定扩展名的规则只放进这些扩展名的分组，None表示任何文件名都可能匹配
+        buckets = None
+        # 匹配的文件名（小写）一定以其中之一开头的固定前缀，用于建立前缀索引；None表示无法确定
+        keys = None
+
+        def narrower(current, candidates):
+            # 多个名称条件需要同时满足，任选一组前缀即可，取最短前缀更长的一组
+            if not candidates or "" in candidates:
+                return current
+            if current is None or min(map(len, candidates)) > min(map(len, current)):
+                return set(candidates)
+            return current
+
+        if "glob" in rule:
+            globs = _as_list(rule["glob"])
+            parts.append("(?=(?i:" + "|".join(fnmatch.translate(g) for g in globs) + "))")
+            suffixes = [_literal_suffix(g) for g in globs]
+            if None not in suffixes:
+                buckets = set(suffixes)
+            keys = narrower(keys, [_glob_prefix(g) for g in globs])
+        if "extensions" in rule:
+            exts = [ext.strip().lower() for ext in _as_list(rule["extensions"])]
+            exts = [ext if ext.startswith(".") else "." + ext for ext in exts if ext]
+            if not exts:
+                raise ValueError(f"分类 {category} 的规则中扩展名为空")
+            parts.append("(?=(?i:(?s:.*)(?:" + "|".join(re.escape(ext) for ext in exts) + r")\Z))")
+            # 多段扩展名（.tar.gz）按最后一段分组
+            ext_buckets = {ext[ext.rfind("."):] for ext in exts}
+            buckets = ext_buckets if buckets is None else buckets & ext_buckets
+        if "prefix" in rule:
+            prefixes = _as_list(rule["prefix"])
+            parts.append("(?=(?i:" + "|".join(re.escape(p) for p in prefixes) + "))")
+            keys = narrower(keys, [p.lower() for p in prefixes])
+        if "regex" in rule:
+            pattern = rule["regex"]
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"分类 {category} 的规则中正则表达式无效: {pattern} - {e}")
+            keys = narrower(keys, [_regex_prefix(pattern)])
+            # 开头的全局标志如 (?i) 不能出现在合并后的正则中间，改为只作用于该表达式
+            pattern = _LEADING_FLAGS.sub(lambda m: "(?" + m.group(1) + ":", pattern, count=1)
+            if pattern != rule["regex"]:
+                pattern += ")"
+            # 在文件名中查找：跳过的前缀可以跨越换行，表达式本身的 . 仍与re.search一致不匹配换行
+            parts.append("(?=(?s:.*?)(?:" + pattern + "))")
+        self.pattern = "".join(parts) or None
+        try:
+            self.regex = re.compile(self.pattern) if self.pattern else None
+        except re.error as e:
+            raise ValueError(f"分类 {category} 的规则无效: {rule} - {e}")
+        self.buckets = buckets
+        self.keys = keys
+
+        def interval(low_key, high_key, unit, step):
+            low, high = rule.get(low_key), rule.get(high_key)
+            if low is None and high is None:
+                return None
+            # 区间为 [下限, 上限+step)，上限包含在内
+            return (float("-inf") if low is None else low * unit,
+                    float("inf") if high is None else high * unit + step)
+
+        self.size = interval("min_size_mb", "max_size_mb", _MB, 1)
+        self.age = interval("min_age_days", "max_age_days", _DAY, 1e-6)
+        if self.pattern is None and self.size is None and self.age is None:
+            raise ValueError(f"分类 {category} 的规则没有任何条件")
+
+
+def _interval_masks(rules, attr):
+    """按区间端点把数轴分段，返回 (端点列表, 每段满足该条件的规则位掩码)"""
+    bounds = sorted({value for rule in rules for value in (getattr(rule, attr) or ())
+                     if value not in (float("-inf"), float("inf"))})
+    # 第s段为 [bounds[s-1], bounds[s])；每条规则覆盖连续的若干段，在起止处翻转该规则的位
+    toggles = [0] * (len(bounds) + 2)
+    for index, rule in enumerate(rules):
+        interval = getattr(rule, attr)
+        if interval is None:
+            first, last = 0, len(bounds)
+        else:
+            low, high = interval
+            first = 0 if low == float("-inf") else bisect.bisect_left(bounds, low) + 1
+            last = len(bounds) if high == float("inf") else bisect.bisect_left(bounds, high)
+        if first <= last:
+            toggles[first] ^= 1 << index
+            toggles[last + 1] ^= 1 << index
+    masks = []
+    mask = 0
+    for toggle in toggles[:-1]:
+        mask ^= toggle
+        masks.append(mask)
+    return bounds, masks
+
+
+class RuleSet:
+    """分类配置中 "rules" 的编译结果：按优先级取第一条满足的规则
+
+    规则示例（写在分类配置中，优先级高的先匹配，相同时按配置顺序，规则总是优先于扩展名列表）：
+        "rules": [{"glob": "Screenshot*.png", "priority": 10},
+                  {"prefix": "发票", "max_age_days": 30},
+                  {"regex": "^IMG_\\d{8}", "min_size_mb": 1}]
+
+    名称有固定前缀的规则（通配符第一个通配符之前的部分、prefix、以^开头的正则）按前缀建立索引，
+    只有文件名以该前缀开头时才检查；其余名称规则按文件扩展名分组，每组合并为一个正则表达式，
+    每个文件只匹配一次。大小和修改时间条件预先按区间端点分段，每段对应一个规则位掩码，用二分查找定位。
+    因此分类的总耗时与文件数成正比，每个文件的开销主要取决于无法建立索引的规则数。
+    """
+
+    def __init__(self, categories):
+        rules = []
+        for category, info in categories.items():
+            for rule in (info.get("rules", []) if isinstance(info, dict) else []):
+                rules.append(_Rule(category, rule, len(rules)))
+        rules.sort(key=lambda rule: (-rule.priority, rule.order))
+        self.rules = rules
+        self.categories = [rule.category for rule in rules]
+
+        self.size_bounds, self.size_masks = _interval_masks(rules, "size")
+        self.age_bounds, self.age_masks = _interval_masks(rules, "age")
+        # 有修改时间条件时，同一个文件的分类会随时间变化，不能长期缓存
+        self.time_dependent = any(rule.age is not None for rule in rules)
+        self.unconstrained = 0
+        self.nameless = 0
+        for index, rule in enumerate(rules):
+            if rule.size is None and rule.age is None:
+                self.unconstrained |= 1 << index
+            if rule.regex is None:
+                self.nameless |= 1 << index
+
+        # 有固定前缀的规则按前缀建立索引：文件名（小写）的各长度前缀查表得到候选规则，再逐条确认
+        self.prefixes = {}
+        for index, rule in enumerate(rules):
+            if rule.regex is not None and rule.keys:
+                for key in rule.keys:
+                    self.prefixes[key] = self.prefixes.get(key, 0) | 1 << index
+        self.prefix_lengths = sorted({len(key) for key in self.prefixes})
+
+        # 其余有名称条件的规则合并为正则表达式，按扩展名分组：
+        # 扩展名 -> (合并的正则, 该组中的规则位掩码)；其他扩展名只需匹配不限扩展名的规则（generic）
+        unindexed = [index for index, rule in enumerate(rules) if rule.regex is not None and not rule.keys]
+        suffixes = {suffix for index in unindexed if rules[index].buckets for suffix in rules[index].buckets}
+        self.buckets = {suffix: self._compile([index for index in unindexed
+                                               if rules[index].buckets is None or suffix in rules[index].buckets])
+                        for suffix in suffixes}
+        self.generic = self._compile([index for index in unindexed if rules[index].buckets is None])
+
+    def __len__(self):
+        return len(self.rules)
+
+    @property
+    def signature(self):
+        return repr([(rule.category, rule.rule) for rule in self.rules])
+
+    def _compile(self, indexes):
+        mask = 0
+        for index in indexes:
+            mask |= 1 << index
+        if not indexes:
+            return None, mask
+        combined = "|".join(f"(?P<r{index}>{self.rules[index].pattern})" for index in indexes)
+        try:
+            return re.compile(combined), mask
+        except re.error:
+            # 用户的正则中有同名分组等无法合并的情况：逐条匹配
+            return None, mask
+
+    def match(self, entries, now=None):
+        """批量匹配，返回与entries对应的分类列表，没有规则满足时为None
+
+        entries为Entry或纯文件名；文件夹不参与规则匹配，纯文件名只参与没有大小/时间条件的规则。
+        """
+        if not self.rules:
+            return [None] * len(entries)
+        if now is None:
+            now = time.time()
+        rules = self.rules
+        categories = self.categories
+        buckets = self.buckets
+        generic = self.generic
+        size_bounds, size_masks = self.size_bounds, self.size_masks
+        age_bounds, age_masks = self.age_bounds, self.age_masks
+        nameless = self.nameless
+        unconstrained = self.unconstrained
+        prefixes = self.prefixes
+        prefix_lengths = self.prefix_lengths
+        result = []
+        append = result.append
+        for entry in entries:
+            if isinstance(entry, str):
+                name = entry
+                allowed = unconstrained
+            elif entry.is_dir:
+                append(None)
+                continue
+            else:
+                name = entry.name
+                allowed = (size_masks[bisect.bisect_right(size_bounds, entry.size)]
+                           & age_masks[bisect.bisect_right(age_bounds, now - entry.mtime)])
+            dot = name.rfind(".")
+            regex, named = buckets.get(name[dot:].lower(), generic) if dot >= 0 else generic
+
+            # 没有名称条件的规则：满足的规则中优先级最高的一条（位掩码的最低位）
+            candidates = allowed & nameless
+            best = (candidates & -candidates).bit_length() - 1 if candidates else len(rules)
+            candidates = allowed & named
+            if candidates:
+                if regex is not None:
+                    m = regex.match(name)
+                    first = int(m.lastgroup[1:]) if m else len(rules)
+                    if first < best and candidates >> first & 1:
+                        best = first
+                        candidates = 0
+                    else:
+                        # 名称最先匹配的规则不满足大小/时间条件，再逐条检查其后的规则
+                        candidates &= ~((2 << first) - 1) if m else 0
+            if prefix_lengths:
+                lower = name.lower()
+                for length in prefix_lengths:
+                    if length > len(lower):
+                        break
+                    candidates |= prefixes.get(lower[:length], 0)
+                candidates &= allowed
+            candidates &= (1 << best) - 1
+            while candidates:
+                index = (candidates & -candidates).bit_length() - 1
+                if rules[index].regex.match(name):
+                    best = index
+                    break
+                candidates &= candidates - 1
+            append(categories[best] if best < len(rules) else None)
+        return result
@@ -0,0 +1,204 @@
+import marshal
+import os
+import sqlite3
+import time
+
+from .scanner import Entry, scan_dir
+
+SCAN_CACHE_VERSION = 1
+# 超过这个时间的目录记录重新扫描一次（秒）：目录的修改时间只反映增删改名，
+# 原地改写的文件要靠定期重新stat才能发现
+DEFAULT_MAX_AGE = 3600.0
+# 目录在扫描前这么短时间内被修改过时，同一时间戳内可能还有后续修改（FAT的精度为2秒），下次不信任该记录
+_RACY_NS = 2 * 10 ** 9
+
+
+class _DirRecord:
+    __slots__ = ("mtime_ns", "scanned_ns", "blob", "rows", "categories")
+
+    def __init__(self, mtime_ns, scanned_ns, blob=None, rows=None):
+        self.mtime_ns = mtime_ns
+        self.scanned_ns = scanned_ns
+        self.blob = blob
+        # [(名称, 是否目录, 大小, 修改时间, inode, 分类), ...]，按名称排序，用到时才从blob解码
+        self.rows = rows
+        self.categories = None
+
+    def decoded(self):
+        if self.rows is None:
+            self.rows = marshal.loads(self.blob)
+            self.blob = None
+        return self.rows
+
+
+class ScanCache:
+    """持久化的目录快照（SQLite），再次扫描时只重新读取有变化的目录
+
+    每个目录保存一行：目录的修改时间、扫描时间和该目录下全部条目
+    (名称, 是否目录, 大小, 修改时间, inode, 分类) 打包后的数据。目录的修改时间没有变化时
+    直接使用保存的条目，不再scandir和stat其中的文件；子目录仍逐个stat，所以一次扫描的
+    系统调用次数与目录数成正比，与文件数无关。
+
+    注意：原地改写文件（不改名、不新建）不会改变所在目录的修改时间，这样的变化要等该目录的
+    记录超过max_age秒后重新扫描时才能发现。因此快照只用于整理和分类（以及整理预检的大小预估），
+    备份需要准确的大小和修改时间，总是实际扫描。
+    """
+
+    def __init__(self, path, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._records = None
+        self._signature = None
+        self._dirty = {}
+        self._visited = set()
+        self.stats = {"cached": 0, "scanned": 0}
+
+    def _connect(self):
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER, "
+                   "scanned_ns INTEGER, entries BLOB)")
+        return db
+
+    def _load(self, classifier):
+        """第一次使用时一次性读入全部目录记录（条目数据用到时才解码）"""
+        signature = classifier.signature
+        if self._records is not None and self._signature == signature:
+            return
+        self._records = {}
+        self._signature = signature
+        try:
+            if os.path.exists(self.path):
+                db = self._connect()
+                try:
+                    meta = dict(db.execute("SELECT key, value FROM meta"))
+                    if (meta.get("version") == str(SCAN_CACHE_VERSION) and meta.get("signature") == signature
+                            and meta.get("marshal") == str(marshal.version)):
+                        for path, mtime_ns, scanned_ns, blob in db.execute("SELECT * FROM dirs"):
+                            self._records[path] = _DirRecord(mtime_ns, scanned_ns, blob)
+                finally:
+                    db.close()
+        except Exception:
+            # 缓存损坏时当作没有缓存，保存时整个重写
+            self._records = {}
+            self._dirty = {}
+        if not self._records:
+            # 保存时清空旧记录并重写版本和分类规则指纹
+            self._dirty[None] = None
+
+    def _listing(self, directory, st, classifier):
+        """返回目录的条目记录，修改时间和扫描时间都可信时直接使用缓存"""
+        record = self._records.get(directory)
+        now_ns = int(time.time() * 1e9)
+        old_rows = None
+        if record is not None:
+            try:
+                old_rows = record.decoded()
+            except Exception:
+                record = None
+        if (record is not None and record.mtime_ns == st.st_mtime_ns
+                and record.scanned_ns - record.mtime_ns > _RACY_NS
+                and now_ns - record.scanned_ns < self.max_age * 1e9):
+            self.stats["cached"] += 1
+            return record
+        entries = scan_dir(directory)
+        # 目录有变化时，其中未变化的文件沿用原来的分类（按内容识别时不再重新读取）；
+        # 分类规则有修改时间条件时分类会随时间变化，不沿用
+        known = {row[:5]: row[5] for row in old_rows} if old_rows and not classifier.time_dependent else {}
+        categories = [known.get((e.name, e.is_dir, e.size, e.mtime, e.inode)) for e in entries]
+        missing = [index for index, category in enumerate(categories) if category is None]
+        if missing:
+            for index, category in zip(missing, classifier.classify([entries[i] for i in missing])):
+                categories[index] = category
+        rows = [(e.name, e.is_dir, e.size, e.mtime, e.inode, category) for e, category in zip(entries, categories)]
+        record = self._records[directory] = _DirRecord(st.st_mtime_ns, now_ns, rows=rows)
+        self._dirty[directory] = record
+        self.stats["scanned"] += 1
+        return record
+
+    def scan_dir(self, directory, classifier):
+        """与scanner.scan_dir相同，返回按名称排序的Entry列表"""
+        self._load(classifier)
+        record = self._listing(directory, os.stat(directory), classifier)
+        self._visited.add(directory)
+        prefix = os.path.join(directory, "")
+        return [Entry(name, prefix + name, is_dir, size, mtime, inode)
+                for name, is_dir, size, mtime, inode, _ in record.rows]
+
+    def walk_files(self, root, classifier):
+        """与scanner.walk_files相同，递归产出root下的所有文件；未变化的目录不再读取"""
+        self._load(classifier)
+        join = os.path.join
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            try:
+                record = self._listing(current, os.stat(current), classifier)
+            except OSError:
+                continue
+            self._visited.add(current)
+            # 直接拼接路径，比逐个调用os.path.join快得多
+            prefix = join(current, "")
+            subdirs = []
+            for name, is_dir, size, mtime, inode, _ in record.rows:
+                path = prefix + name
+                if is_dir:
+                    subdirs.append(path)
+                else:
+                    yield Entry(name, path, is_dir, size, mtime, inode)
+            stack.extend(reversed(subdirs))
+        # 完整遍历后，root下没有再出现的目录（已删除或改名）从缓存中移除
+        prefix = join(root, "")
+        for path in [path for path in self._records if path.startswith(prefix) and path not in self._visited]:
+            del self._records[path]
+            self._dirty[path] = None
+
+    def categories(self, entries, classifier):
+        """返回entries的分类（与classifier.classify相同），缓存中有的直接使用，不再重新分类"""
+        self._load(classifier)
+        if classifier.time_dependent:
+            return classifier.classify(entries)
+        result = []
+        missing = []
+        for index, entry in enumerate(entries):
+            directory, name = os.path.split(entry.path)
+            record = self._records.get(directory)
+            category = None
+            if record is not None and record.rows is not None:
+                if record.categories is None:
+                    record.categories = {row[0]: row for row in record.rows}
+                row = record.categories.get(name)
+                if row is not None and row[2] == entry.size and row[3] == entry.mtime and row[1] == entry.is_dir:
+                    category = row[5]
+            if category is None:
+                missing.append(index)
+            result.append(category)
+        if missing:
+            for index, category in zip(missing, classifier.classify([entries[i] for i in missing])):
+                result[index] = category
+        return result
+
+    def save(self):
+        """把有变化的目录记录写回数据库（一次事务）"""
+        if not self._dirty:
+            return
+        db = self._connect()
+        try:
+            with db:
+                if None in self._dirty:
+                    db.execute("DELETE FROM dirs")
+                    db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                        ("version", str(SCAN_CACHE_VERSION)), ("signature", self._signature),
+                        ("marshal", str(marshal.version))])
+                    dirty = self._records
+                else:
+                    dirty = self._dirty
+                removed = [(path,) for path, record in self._dirty.items() if path is not None and record is None]
+                db.executemany("DELETE FROM dirs WHERE path = ?", removed)
+                db.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)", [
+                    (path, record.mtime_ns, record.scanned_ns, marshal.dumps(record.decoded()))
+                    for path, record in dirty.items() if record is not None])
+        finally:
+            db.close()
+        self._dirty = {}
+        self._visited = set()
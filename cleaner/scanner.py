@@ -0,0 +1,90 @@
+import os
+import stat as stat_module
+from collections import namedtuple
+
+# 扫描得到的目录项记录：一次stat得到全部信息，后续跳过/分类/移动判断都基于该记录
+# 注意：Windows下os.scandir返回的stat结果不含inode（为0），这里不再额外调用stat获取
+Entry = namedtuple("Entry", ["name", "path", "is_dir", "size", "mtime", "inode"])
+
+
+def _entry_from_dir_entry(dir_entry):
+    """由os.DirEntry构造Entry（Linux下一次stat，Windows下无额外系统调用）"""
+    try:
+        st = dir_entry.stat()
+    except OSError:
+        # 失效的符号链接等无法stat的项，按普通文件处理且大小未知
+        return Entry(dir_entry.name, dir_entry.path, False, 0, 0.0, 0)
+    return Entry(dir_entry.name, dir_entry.path, stat_module.S_ISDIR(st.st_mode),
+                 st.st_size, st.st_mtime, st.st_ino)
+
+
+def scan_path(path):
+    """对单个路径stat一次并返回Entry，路径不存在时返回None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return Entry(os.path.basename(path), path, stat_module.S_ISDIR(st.st_mode),
+                 st.st_size, st.st_mtime, st.st_ino)
+
+
+def scan_dir(path):
+    """单次遍历目录，返回按名称排序的Entry列表"""
+    with os.scandir(path) as it:
+        entries = [_entry_from_dir_entry(dir_entry) for dir_entry in it]
+    entries.sort(key=lambda e: e.name)
+    return entries
+
+
+def walk_files(path):
+    """递归遍历目录下的所有文件，逐个产出Entry（不包含目录本身）"""
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = scan_dir(current)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir:
+                subdirs.append(entry.path)
+            else:
+                yield entry
+        # 逆序入栈以保持与os.walk相近的遍历顺序
+        stack.extend(reversed(subdirs))
+
+
+class ListingCache:
+    """按目录缓存名称列表：每个目录只scandir一次，之后的存在性判断都在内存中完成"""
+
+    def __init__(self, case_insensitive=False):
+        self._key = str.casefold if case_insensitive else str
+        self._listings = {}
+
+    def names(self, directory):
+        """返回目录中当前剩余的名称集合，目录不存在时返回None"""
+        if directory not in self._listings:
+            try:
+                with os.scandir(directory) as it:
+                    self._listings[directory] = {self._key(entry.name) for entry in it}
+            except OSError:
+                self._listings[directory] = None
+        return self._listings[directory]
+
+    def take(self, path):
+        """若path存在则将其从缓存中移除并返回True（用于即将被移走的条目）"""
+        directory, name = os.path.split(path)
+        names = self.names(directory)
+        key = self._key(name)
+        if names is None or key not in names:
+            return False
+        names.discard(key)
+        return True
+
+    def put_back(self, path):
+        """take之后移动失败时调用，条目仍留在原目录中"""
+        directory, name = os.path.split(path)
+        names = self.names(directory)
+        if names is not None:
+            names.add(self._key(name))
@@ -0,0 +1,163 @@
+from collections import OrderedDict
+
+from .mover import run_ordered
+
+# 只读取文件开头这么多字节判断类型（tar的标志位于257字节处）
+SNIFF_BYTES = 512
+DEFAULT_SNIFF_WORKERS = 8
+# 最多缓存这么多个文件的识别结果，超出时丢弃最久未使用的
+SNIFF_CACHE_SIZE = 20000
+_BATCH_SIZE = 64
+# content_sniffing 配置：off 不读取内容；unknown 只识别按扩展名归入“其他”的文件；
+# all 识别所有文件，内容与扩展名明确不符时按内容分类
+SNIFF_MODES = ("off", "unknown", "all")
+
+# (偏移, 魔数, 对应的扩展名, 是否可靠)
+# 不可靠的是ZIP、OLE这类容器格式：很多格式（.docx、.jar、.epub、.msi等）都基于它们，
+# 只在扩展名无法分类时使用，不覆盖扩展名的分类
+_SIGNATURES = [
+    (0, b"%PDF-", ".pdf", True),
+    (0, b"\x89PNG\r\n\x1a\n", ".png", True),
+    (0, b"\xff\xd8\xff", ".jpg", True),
+    (0, b"GIF87a", ".gif", True),
+    (0, b"GIF89a", ".gif", True),
+    (0, b"\x00\x00\x01\x00", ".ico", False),
+    (0, b"\x1aE\xdf\xa3", ".mkv", True),
+    (0, b"FLV\x01", ".flv", True),
+    (0, b"0&\xb2u\x8ef\xcf\x11", ".wmv", True),
+    (0, b"ID3", ".mp3", True),
+    (0, b"fLaC", ".flac", True),
+    (0, b"OggS", ".ogg", True),
+    (0, b"Rar!\x1a\x07", ".rar", True),
+    (0, b"7z\xbc\xaf\x27\x1c", ".7z", True),
+    (0, b"\x1f\x8b", ".gz", True),
+    (0, b"!<arch>\ndebian", ".deb", True),
+    (0, b"\x7fELF", ".exe", True),
+    (0, b"\xcf\xfa\xed\xfe", ".exe", True),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".doc", False),
+    (257, b"ustar", ".tar", True),
+]
+
+
+def sniff(header):
+    """根据文件开头的内容判断类型，返回 (扩展名, 是否可靠)，无法识别时返回None"""
+    for offset, magic, ext, strong in _SIGNATURES:
+        if header.startswith(magic, offset):
+            return ext, strong
+    if header[4:8] == b"ftyp":
+        # ISO媒体文件：QuickTime为.mov，其余（isom、mp42、M4A等）按.mp4处理
+        return (".mov" if header[8:12] == b"qt  " else ".mp4"), True
+    if header[:4] == b"RIFF":
+        kind = header[8:12]
+        if kind == b"WAVE":
+            return ".wav", True
+        if kind == b"AVI ":
+            return ".avi", True
+        if kind == b"WEBP":
+            return ".webp", True
+        return None
+    if header[:2] == b"MZ":
+        # Windows可执行文件：DOS头0x3C处记录PE头的位置；找不到PE头时只是一个以MZ开头的文件
+        pe = int.from_bytes(header[0x3c:0x40], "little") if len(header) >= 0x40 else 0
+        return ".exe", header[pe:pe + 4] == b"PE\x00\x00"
+    if header[:4] == b"PK\x03\x04":
+        # Office文档的前几个成员名中带有 word/、xl/、ppt/ 或 [Content_Types].xml
+        if b"xl/" in header:
+            return ".xlsx", False
+        if b"ppt/" in header:
+            return ".pptx", False
+        if b"word/" in header or b"[Content_Types].xml" in header:
+            return ".docx", False
+        return ".zip", False
+    if header[:2] == b"BM" and len(header) >= 14 and int.from_bytes(header[2:6], "little") > 14:
+        return ".bmp", False
+    if len(header) >= 2 and header[0] == 0xff and header[1] & 0xe6 == 0xe2:
+        # 没有ID3标签的MP3：帧同步字且为Layer III（排除以FF FE开头的UTF-16文本）
+        return ".mp3", False
+    return None
+
+
+def sniff_file(path, size=SNIFF_BYTES):
+    """读取文件开头并判断类型，文件无法读取时返回None"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(size)
+    except OSError:
+        return None
+    return sniff(header)
+
+
+class ContentClassifier:
+    """在扩展名分类的基础上读取文件开头的魔数识别类型，并映射到配置中的分类
+
+    识别结果按 (路径, 大小, 修改时间) 缓存，最多cache_size个（最久未使用的先丢弃），
+    没有变化的文件不会被读取两次；需要读取的文件用有界线程池并行读取，每个只读SNIFF_BYTES字节。
+    分类规则匹配的文件不按内容改变分类。其余属性（排除判断、分类名称等）与base相同，直接使用base。
+    """
+
+    def __init__(self, base, mode="unknown", workers=DEFAULT_SNIFF_WORKERS, results=None,
+                 cache_size=SNIFF_CACHE_SIZE):
+        self.base = base
+        self.mode = mode
+        self.workers = workers
+        # (路径, 大小, 修改时间) -> (扩展名, 是否可靠) 或 None，按最近使用的顺序排列
+        self.results = OrderedDict() if results is None else results
+        self.cache_size = cache_size
+        self.sniffed = 0
+
+    @property
+    def signature(self):
+        return repr((self.base.signature, self.mode))
+
+    @property
+    def time_dependent(self):
+        return self.base.time_dependent
+
+    def _detect(self, entries):
+        """返回每个Entry的识别结果，缓存中没有的并行读取"""
+        results = self.results
+        keys = [(entry.path, entry.size, entry.mtime) for entry in entries]
+        missing = []
+        for key, entry in zip(keys, entries):
+            if key in results:
+                results.move_to_end(key)
+            else:
+                missing.append((key, entry))
+        if missing:
+            # 每个任务读取一批文件，避免每读512字节就调度一次线程池
+            batches = [missing[i:i + _BATCH_SIZE] for i in range(0, len(missing), _BATCH_SIZE)]
+            for batch, detected, _ in run_ordered(lambda batch: [sniff_file(entry.path) for _, entry in batch],
+                                                  batches, self.workers):
+                for (key, _), result in zip(batch, detected or [None] * len(batch)):
+                    results[key] = result
+            self.sniffed += len(missing)
+        detected = [results[key] for key in keys]
+        while len(results) > self.cache_size:
+            results.popitem(last=False)
+        return detected
+
+    def classify(self, entries):
+        """与CategoryClassifier.classify相同，按内容识别的分类优先于“其他”和扩展名，但不优先于规则"""
+        base = self.base
+        categories, ruled = base.classify_with_rules(entries)
+        other = base.other_category
+        candidates = [index for index, (entry, category) in enumerate(zip(entries, categories))
+                      if not isinstance(entry, str) and not entry.is_dir and entry.size > 0
+                      and index not in ruled and (self.mode == "all" or category == other)]
+        if not candidates:
+            return categories
+        detected = self._detect([entries[index] for index in candidates])
+        for index, result in zip(candidates, detected):
+            if result is None:
+                continue
+            ext, strong = result
+            category = base.ext_index.get(ext)
+            # 不可靠的结果（容器格式）只用于扩展名无法分类的文件
+            if category is not None and (strong or categories[index] == other):
+                categories[index] = category
+        return categories
+
+    def category_of(self, entry):
+        if entry.is_dir:
+            return self.base.category_of(entry)
+        return self.classify([entry])[0]
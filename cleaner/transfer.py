@@ -0,0 +1,293 @@
+import errno
+import hashlib
+import os
+import shutil
+import stat as stat_module
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+COPY_CHUNK = 8 * 1024 * 1024
+HASH_CHUNK = 1024 * 1024
+
+# 零拷贝接口不可用时的错误码，遇到后退回普通读写
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+                    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP), errno.EBADF}
+
+
+class TransferStats:
+    """记录一次整理中的移动统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.renames = 0
+        self.files_copied = 0
+        self.bytes_copied = 0
+        self.copy_seconds = 0.0
+        # 跨卷移动文件夹时已完整复制、但源目录未能完全删除的路径
+        self.leftovers = []
+
+    def add_rename(self):
+        with self._lock:
+            self.renames += 1
+
+    def add_copy(self, size, seconds):
+        with self._lock:
+            self.files_copied += 1
+            self.bytes_copied += size
+            self.copy_seconds += seconds
+
+    def add_leftover(self, path):
+        with self._lock:
+            self.leftovers.append(path)
+
+    @property
+    def bytes_per_second(self):
+        """跨卷复制速度（按各文件复制耗时之和计算）"""
+        if self.copy_seconds <= 0:
+            return 0.0
+        return self.bytes_copied / self.copy_seconds
+
+
+def _device_of(directory, device_cache):
+    if device_cache is None:
+        return os.stat(directory).st_dev
+    dev = device_cache.get(directory)
+    if dev is None:
+        dev = device_cache[directory] = os.stat(directory).st_dev
+    return dev
+
+
+def same_device(src, dest_dir, device_cache=None):
+    """判断源路径和目标目录是否在同一个卷上（同卷可直接重命名）
+
+    比较的是源路径所在目录和目标目录的设备号，device_cache（dict）用于在一次
+    运行中缓存各目录的设备号，批量移动时每个文件不再需要额外的stat。
+    源路径本身是挂载点的情况由move_path中重命名失败(EXDEV)时回退处理。
+    """
+    try:
+        src_dir = os.path.dirname(os.path.abspath(src))
+        return _device_of(src_dir, device_cache) == _device_of(dest_dir, device_cache)
+    except OSError:
+        return False
+
+
+def _copy_range(fin, fout):
+    """使用copy_file_range复制，不支持时返回False"""
+    copied = 0
+    while True:
+        try:
+            n = os.copy_file_range(fin, fout, COPY_CHUNK)
+        except OSError as e:
+            if copied == 0 and e.errno in _FALLBACK_ERRNOS:
+                return False
+            raise
+        if n == 0:
+            # 部分文件系统（FUSE、procfs等）对非空文件第一次调用就返回0，退回其他方式
+            return copied > 0 or os.fstat(fin).st_size == 0
+        copied += n
+
+
+def _copy_sendfile(fin, fout):
+    """使用sendfile复制，不支持时返回False"""
+    offset = 0
+    while True:
+        try:
+            n = os.sendfile(fout, fin, offset, COPY_CHUNK)
+        except OSError as e:
+            if offset == 0 and e.errno in _FALLBACK_ERRNOS:
+                return False
+            raise
+        if n == 0:
+            return offset > 0 or os.fstat(fin).st_size == 0
+        offset += n
+
+
+def copy_file_data(src, dst, sync=False):
+    """复制文件内容，优先使用内核零拷贝接口，返回复制的字节数；sync为True时返回前落盘"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fin, fout = fsrc.fileno(), fdst.fileno()
+        done = False
+        if hasattr(os, "copy_file_range"):
+            done = _copy_range(fin, fout)
+        if not done and hasattr(os, "sendfile") and os.name != "nt":
+            done = _copy_sendfile(fin, fout)
+        if not done:
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst, COPY_CHUNK)
+        fdst.flush()
+        if sync:
+            os.fsync(fout)
+        return os.fstat(fout).st_size
+
+
+def file_digest(path):
+    """计算文件内容摘要，用于复制后校验"""
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _copy_checked(src, dst, stats, verify_hash, sync=False):
+    """复制单个文件并校验（不删除源文件），失败时清理不完整的目标文件"""
+    start = time.perf_counter()
+    src_size = os.stat(src).st_size
+    try:
+        copied = copy_file_data(src, dst, sync)
+        shutil.copystat(src, dst)
+        if copied != src_size:
+            raise OSError(f"复制校验失败（大小不一致）: {src}")
+        if verify_hash and file_digest(src) != file_digest(dst):
+            raise OSError(f"复制校验失败（内容不一致）: {src}")
+    except Exception:
+        # 复制失败时清理不完整的目标文件，源文件保持不变
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+        raise
+    if stats is not None:
+        stats.add_copy(copied, time.perf_counter() - start)
+
+
+def _copy_verified(src, dst, stats, verify_hash):
+    """复制单个文件并校验，校验通过后删除源文件"""
+    _copy_checked(src, dst, stats, verify_hash)
+    os.remove(src)
+
+
+def _copy_special(src, dst, mode):
+    """复制特殊文件（不能用open读取，读FIFO会一直阻塞）：FIFO按权限重新创建，返回是否已复制
+
+    套接字、设备文件等无法复制，留在源位置。
+    """
+    if stat_module.S_ISFIFO(mode) and hasattr(os, "mkfifo"):
+        os.mkfifo(dst, stat_module.S_IMODE(mode))
+        return True
+    return False
+
+
+def _sync_dir(path):
+    """把目录项落盘（Windows不能打开目录，跳过）"""
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _copy_tree(src, dst, stats, workers, verify_hash, pool=None):
+    """跨卷移动目录树：先复制并校验全部文件、落盘，全部成功后才删除源目录树
+
+    任何一个文件复制失败时删除已复制的目标目录树并抛出异常，源目录保持完整，
+    不会出现一半在源位置、一半在目标位置的情况。文件在pool（共享的线程池）中并行复制，
+    没有pool且workers大于1时临时创建一个。
+    全部复制成功后源目录未能完全删除时（如个别文件被占用、无法复制的套接字和设备文件），
+    源路径记入stats.leftovers，移动仍视为成功。
+    """
+    files = []
+    links = []
+    dirs = []
+    try:
+        stack = [(src, dst)]
+        while stack:
+            src_dir, dst_dir = stack.pop()
+            os.makedirs(dst_dir, exist_ok=True)
+            dirs.append((src_dir, dst_dir))
+            with os.scandir(src_dir) as it:
+                for entry in it:
+                    target = os.path.join(dst_dir, entry.name)
+                    if entry.is_symlink():
+                        os.symlink(os.readlink(entry.path), target)
+                        links.append(entry.path)
+                    elif entry.is_dir():
+                        stack.append((entry.path, target))
+                    elif entry.is_file():
+                        files.append((entry.path, target))
+                    elif _copy_special(entry.path, target, entry.stat(follow_symlinks=False).st_mode):
+                        links.append(entry.path)
+
+        def copy_one(item):
+            _copy_checked(item[0], item[1], stats, verify_hash, sync=True)
+
+        if len(files) > 1 and (pool is not None or workers > 1):
+            own_pool = None
+            if pool is None:
+                pool = own_pool = ThreadPoolExecutor(max_workers=workers)
+            try:
+                # 等全部任务结束（包括失败后仍在进行的）再检查结果，之后才能安全地清理目标
+                futures = [pool.submit(copy_one, item) for item in files]
+                wait(futures)
+            finally:
+                if own_pool is not None:
+                    own_pool.shutdown()
+            for future in futures:
+                error = future.exception()
+                if error is not None:
+                    raise error
+        else:
+            for item in files:
+                copy_one(item)
+        for src_dir, dst_dir in reversed(dirs):
+            shutil.copystat(src_dir, dst_dir)
+            _sync_dir(dst_dir)
+        _sync_dir(os.path.dirname(os.path.abspath(dst)))
+    except BaseException:
+        shutil.rmtree(dst, ignore_errors=True)
+        raise
+
+    # 目标已完整落盘，删除源文件和自底向上已清空的源目录
+    for path in [path for path, _ in files] + links:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    for src_dir, _ in reversed(dirs):
+        try:
+            os.rmdir(src_dir)
+        except OSError:
+            pass
+    if stats is not None and os.path.lexists(src):
+        stats.add_leftover(src)
+
+
+def move_path(src, dst, stats=None, workers=1, verify_hash=False, device_cache=None, pool=None):
+    """移动文件或文件夹：同卷直接重命名，跨卷零拷贝复制并校验后删除源
+
+    pool为调用方共享的线程池时，文件夹中的文件在其中复制（批量移动时线程总数有上限）。
+    """
+    dest_dir = os.path.dirname(os.path.abspath(dst))
+    if same_device(src, dest_dir, device_cache):
+        try:
+            os.rename(src, dst)
+            if stats is not None:
+                stats.add_rename()
+            return dst
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+    st = os.lstat(src)
+    if stat_module.S_ISLNK(st.st_mode):
+        os.symlink(os.readlink(src), dst)
+        os.remove(src)
+    elif stat_module.S_ISDIR(st.st_mode):
+        _copy_tree(src, dst, stats, workers, verify_hash, pool)
+    elif stat_module.S_ISREG(st.st_mode):
+        _copy_verified(src, dst, stats, verify_hash)
+    elif _copy_special(src, dst, st.st_mode):
+        os.remove(src)
+    else:
+        raise OSError(errno.EXDEV, f"无法跨卷移动特殊文件: {src}")
+    return dst
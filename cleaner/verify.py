@@ -0,0 +1,166 @@
+import hashlib
+import os
+import struct
+import threading
+import zipfile
+import zlib
+
+from .compression import LZMADecompressor
+from .manifest import load_manifest, manifest_path_for
+from .mover import run_ordered
+
+READ_BLOCK = 1024 * 1024
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+
+def _inflate_deflate():
+    decompressor = zlib.decompressobj(-15)
+
+    def inflate(data):
+        # 限制每次输出的大小，高压缩比的数据（如大段的0）不会一次解压出上GB的数据
+        out = decompressor.decompress(data, READ_BLOCK)
+        yield out
+        while decompressor.unconsumed_tail:
+            yield decompressor.decompress(decompressor.unconsumed_tail, READ_BLOCK)
+    return inflate
+
+
+def _inflate_stream(decompressor):
+    """BZIP2/LZMA：限制每次输出的大小，直到需要更多输入"""
+    def inflate(data):
+        yield decompressor.decompress(data, READ_BLOCK)
+        while not decompressor.eof and not decompressor.needs_input:
+            yield decompressor.decompress(b"", READ_BLOCK)
+    return inflate
+
+
+def _inflater(compress_type):
+    """返回 (每次读取的压缩数据大小, 解压函数)，解压函数把一段压缩数据解压为若干段输出"""
+    if compress_type == zipfile.ZIP_STORED:
+        return READ_BLOCK, lambda data: (data,)
+    if compress_type == zipfile.ZIP_DEFLATED:
+        return READ_BLOCK, _inflate_deflate()
+    if compress_type == zipfile.ZIP_BZIP2:
+        import bz2
+        return READ_BLOCK, _inflate_stream(bz2.BZ2Decompressor())
+    if compress_type == zipfile.ZIP_LZMA:
+        return READ_BLOCK, _inflate_stream(LZMADecompressor())
+    raise NotImplementedError(f"不支持的压缩方式: {compress_type}")
+
+
+class _ArchiveReader:
+    """多个线程共享的压缩包读取器：每个线程一个文件句柄，按偏移读取成员数据"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._files = []
+
+    def _file(self):
+        f = getattr(self._local, "file", None)
+        if f is None:
+            f = self._local.file = open(self.path, 'rb')
+            with self._lock:
+                self._files.append(f)
+        return f
+
+    def check_member(self, info, want_digest):
+        """解压一个成员，返回 (CRC32, 解压后大小, blake2b摘要或None)"""
+        f = self._file()
+        f.seek(info.header_offset)
+        header = f.read(_LOCAL_HEADER.size)
+        if len(header) != _LOCAL_HEADER.size or header[:4] != b"PK\x03\x04":
+            raise ValueError("本地文件头损坏")
+        fields = _LOCAL_HEADER.unpack(header)
+        f.seek(fields[-2] + fields[-1], os.SEEK_CUR)
+
+        block, inflate = _inflater(info.compress_type)
+        digest = hashlib.blake2b() if want_digest else None
+        crc = 0
+        size = 0
+        remaining = info.compress_size
+        while remaining:
+            data = f.read(min(block, remaining))
+            if not data:
+                raise ValueError("数据被截断")
+            remaining -= len(data)
+            for out in inflate(data):
+                crc = zlib.crc32(out, crc)
+                size += len(out)
+                if digest is not None:
+                    digest.update(out)
+        return crc, size, digest.hexdigest() if digest is not None else None
+
+    def close(self):
+        for f in self._files:
+            f.close()
+
+
+def expected_members(archive_path):
+    """从压缩包对应的备份清单中取出该压缩包应包含的成员，没有清单时返回None"""
+    manifest_path = manifest_path_for(archive_path)
+    if not os.path.exists(manifest_path):
+        return None
+    name = os.path.basename(archive_path)
+    return {key: value for key, value in load_manifest(manifest_path)["files"].items() if value[2] == name}
+
+
+def verify_archive(archive_path, expected=None, workers=1, progress=None, cancel=None):
+    """并行解压校验压缩包的每个成员，返回结果字典
+
+    中央目录只读取一次；每个成员在工作线程中按偏移读取并解压，检查CRC32和大小，
+    expected（清单中的 {名称: [大小, 修改时间, 压缩包, 摘要, CRC32]}）给出时还核对
+    备份时记录的大小、CRC32、内容摘要，以及清单中的文件是否都在压缩包中。
+    progress为ProgressTracker，按成员数和压缩后字节数更新。
+    结果：{"members": 成员数, "bytes": 解压后字节数, "errors": [(名称, 原因), ...], "cancelled": bool}
+    """
+    with zipfile.ZipFile(archive_path) as zipf:
+        infos = [info for info in zipf.infolist() if not info.is_dir()]
+    total = sum(info.compress_size for info in infos)
+    result = {"members": 0, "bytes": 0, "errors": [], "cancelled": False}
+    errors = result["errors"]
+    reader = _ArchiveReader(archive_path)
+
+    def job(info):
+        want = expected.get(info.filename) if expected else None
+        return reader.check_member(info, bool(want and want[3]))
+
+    def items():
+        for info in infos:
+            if cancel is not None and cancel.is_set():
+                result["cancelled"] = True
+                return
+            yield info
+
+    try:
+        if progress is not None:
+            progress.start(len(infos), total)
+        for info, value, error in run_ordered(job, items(), workers):
+            result["members"] += 1
+            if error is not None:
+                errors.append((info.filename, f"读取失败: {error}"))
+            else:
+                crc, size, digest = value
+                result["bytes"] += size
+                if crc != info.CRC or size != info.file_size:
+                    errors.append((info.filename, "CRC或大小与压缩包目录不一致"))
+                want = expected.get(info.filename) if expected else None
+                if want is not None:
+                    if size != want[0]:
+                        errors.append((info.filename, f"大小与备份时不一致: {size} != {want[0]}"))
+                    if len(want) > 4 and want[4] is not None and crc != want[4]:
+                        errors.append((info.filename, "CRC与备份时不一致"))
+                    if want[3] and digest != want[3]:
+                        errors.append((info.filename, "内容摘要与备份时不一致"))
+            if progress is not None:
+                progress.advance(1, info.compress_size, info.filename)
+    finally:
+        reader.close()
+
+    if expected and not result["cancelled"]:
+        present = {info.filename for info in infos}
+        for name in sorted(expected):
+            if name not in present:
+                errors.append((name, "压缩包中缺少该文件"))
+    return result
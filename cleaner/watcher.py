@@ -0,0 +1,411 @@
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from .scanner import scan_dir, scan_path
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_POLL_INTERVAL = 2.0
+# 收到“开始写入”后一直没有关闭写入的事件（写入程序崩溃、事件丢失），
+# 大小和修改时间这么久没有变化就不再等待关闭事件，改按修改时间和打开状态判断
+DEFAULT_WRITING_TIMEOUT = 60.0
+# 没有待处理的条目时最长等待这么久再检查是否已停止（空闲时几乎不占CPU）
+_IDLE_WAIT = 1.0
+# 移动失败（如文件被其他程序占用）的条目按指数退避重试，最长间隔
+_MAX_RETRY_DELAY = 300.0
+
+# 下载中、编辑中的临时文件：完成后会被重命名为正式文件名，届时再整理
+TEMP_SUFFIXES = (".crdownload", ".part", ".partial", ".download", ".tmp", ".temp", ".!ut", ".!qb", ".opdownload")
+TEMP_PREFIXES = ("~$", ".~lock.", "~WRL")
+
+# 事件类型
+CHANGED = "changed"      # 出现或被修改
+WRITING = "writing"      # 被打开写入（inotify可以区分，轮询无法区分）
+CLOSED = "closed"        # 写入后已关闭
+REMOVED = "removed"      # 已删除或移走
+RESCAN = "rescan"        # 事件丢失，需要重新扫描整个目录
+
+
+def is_temporary(name):
+    lower = name.lower()
+    return lower.endswith(TEMP_SUFFIXES) or name.startswith(TEMP_PREFIXES)
+
+
+def files_open_for_writing(paths):
+    """返回paths中正被某个进程以写方式打开的路径（Linux下读取/proc，尽力而为；其他系统返回空集合）
+
+    轮询无法知道文件是否仍在写入，移动前用它再确认一次；只能看到有权限读取的进程。
+    """
+    if not paths or not os.path.isdir("/proc/self/fdinfo"):
+        return set()
+    wanted = {os.path.realpath(path): path for path in paths}
+    found = set()
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        fd_dir = f"/proc/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+                if target not in wanted:
+                    continue
+                with open(f"/proc/{pid}/fdinfo/{fd}", 'r') as f:
+                    flags = next(line for line in f if line.startswith("flags:")).split()[1]
+            except (OSError, StopIteration):
+                continue
+            # O_WRONLY=1、O_RDWR=2
+            if int(flags, 8) & 3:
+                found.add(wanted[target])
+    return found
+
+
+class InotifySource:
+    """Linux inotify事件源（通过ctypes调用libc，不需要第三方库），只监视目录本身"""
+
+    name = "inotify"
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _EVENT = struct.Struct("iIII")
+    _READ_SIZE = 256 * 1024
+
+    def __init__(self, path):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1失败")
+        mask = (self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+                | self.IN_CREATE | self.IN_DELETE | self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_ONLYDIR)
+        if libc.inotify_add_watch(self._fd, os.fsencode(path), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"无法监视目录: {path}")
+
+    def wait(self, timeout):
+        """等待最多timeout秒，返回 [(名称, 事件类型), ...]"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        events = []
+        # 一次读取尽量多的事件，事件很多时每次系统调用处理上千个
+        while True:
+            try:
+                data = os.read(self._fd, self._READ_SIZE)
+            except BlockingIOError:
+                break
+            self._parse(data, events)
+            if len(data) < self._READ_SIZE // 2:
+                break
+        return events
+
+    def _parse(self, data, events):
+        unpack = self._EVENT.unpack_from
+        size = self._EVENT.size
+        pos = 0
+        end = len(data)
+        while pos < end:
+            _, mask, _, length = unpack(data, pos)
+            name = os.fsdecode(data[pos + size:pos + size + length].rstrip(b"\0"))
+            pos += size + length
+            if mask & self.IN_Q_OVERFLOW:
+                events.append(("", RESCAN))
+            elif mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                raise OSError(errno.ENOENT, "被监视的目录已被删除或移走")
+            elif not name:
+                continue
+            elif mask & (self.IN_MOVED_FROM | self.IN_DELETE):
+                events.append((name, REMOVED))
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                # 重命名进来的（如下载完成的 .crdownload 改为正式文件名）是已写完的文件
+                events.append((name, CLOSED))
+            elif mask & (self.IN_CREATE | self.IN_MODIFY) and not mask & self.IN_ISDIR:
+                # 新建的文件此时仍被创建者打开，写完关闭时会有IN_CLOSE_WRITE
+                events.append((name, WRITING))
+            else:
+                events.append((name, CHANGED))
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingSource:
+    """轮询事件源：定期扫描目录，与上一次的 (大小, 修改时间) 比较得到变化"""
+
+    name = "轮询"
+
+    def __init__(self, path, interval=DEFAULT_POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next = time.monotonic() + interval
+
+    def _scan(self):
+        return {entry.name: (entry.size, entry.mtime) for entry in scan_dir(self.path)}
+
+    def wait(self, timeout):
+        delay = self._next - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        if delay > 0:
+            time.sleep(delay)
+        self._next = time.monotonic() + self.interval
+        current = self._scan()
+        previous = self._snapshot
+        self._snapshot = current
+        events = [(name, CHANGED) for name, state in current.items() if previous.get(name) != state]
+        events.extend((name, REMOVED) for name in previous if name not in current)
+        return events
+
+    def close(self):
+        pass
+
+
+def event_source(path, name="auto", poll_interval=DEFAULT_POLL_INTERVAL):
+    """按名称创建事件源：auto（Linux下inotify，不可用时轮询）/ inotify / poll"""
+    if name == "auto":
+        if sys.platform.startswith("linux"):
+            try:
+                return InotifySource(path)
+            except Exception:
+                # 如监视数量达到上限（max_user_watches），退回轮询
+                pass
+        name = "poll"
+    if name == "inotify":
+        return InotifySource(path)
+    if name == "poll":
+        return PollingSource(path, poll_interval)
+    raise ValueError(f"未知的监视方式: {name}")
+
+
+class DesktopWatcher:
+    """监视模式：桌面出现新文件后自动按分类规则整理
+
+    同一名称的事件合并，最后一次事件后安静debounce秒才处理；处理前再检查一次：
+    收到开始写入事件后尚未关闭（inotify，最多等待writing_timeout秒没有变化）、
+    修改时间距今不足debounce秒且两次检查间有变化、仍被某个进程以写方式打开、
+    或是下载中的临时文件，都不会被移动。就绪的条目每batch_size个调用一次
+    CleanerEngine.organize，每批生成一个整理记录，可像手动整理一样恢复。
+    引擎正在执行其他操作（手动整理、恢复、备份）时推迟处理；恢复移回桌面的条目
+    在再次被修改之前不会自动整理。
+    """
+
+    def __init__(self, engine, record_dir, debounce=None, batch_size=None, backend=None, poll_interval=None,
+                 stop=None):
+        config = engine.config
+        if os.path.abspath(record_dir) == os.path.abspath(engine.desktop_path):
+            raise ValueError("整理记录不能保存在被监视的目录中")
+        self.engine = engine
+        self.record_dir = record_dir
+        os.makedirs(record_dir, exist_ok=True)
+        self.debounce = debounce if debounce is not None else config.get("watch_debounce", DEFAULT_DEBOUNCE)
+        self.batch_size = batch_size or config.get("watch_batch_size", DEFAULT_BATCH_SIZE)
+        self.backend = backend or config.get("watch_backend", "auto")
+        self.poll_interval = poll_interval or config.get("watch_poll_interval", DEFAULT_POLL_INTERVAL)
+        self.writing_timeout = config.get("watch_writing_timeout", DEFAULT_WRITING_TIMEOUT)
+        self.stop = stop or threading.Event()
+        # 名称 -> [最早可处理的时间, 是否正被写入, 上次检查时的 (大小, 修改时间)]
+        self.pending = {}
+        # 名称 -> 连续移动失败的次数
+        self.retries = {}
+        # 恢复线程移回桌面的名称（由引擎在其他线程中追加）
+        self._restored = deque()
+        # 恢复移回桌面的名称 -> 恢复后的 (大小, 修改时间)，没有变化时不自动整理
+        self.ignored = {}
+        # 移动前检查文件是否仍被打开写入：轮询不能区分写入，inotify的关闭事件也可能丢失
+        self.check_open = True
+        self.events = 0
+        self.organized = 0
+        self.batches = 0
+
+    def _touch(self, name, writing=None):
+        now = time.monotonic()
+        state = self.pending.get(name)
+        if state is None:
+            self.pending[name] = [now + self.debounce, bool(writing), None]
+        else:
+            state[0] = now + self.debounce
+            if writing is not None:
+                state[1] = writing
+
+    def _rescan(self):
+        # 丢失的事件中可能有关闭写入，是否写完改由修改时间判断
+        ignored = self.engine.classifier.category_names
+        for entry in scan_dir(self.engine.desktop_path):
+            if entry.name not in ignored and not is_temporary(entry.name):
+                self._touch(entry.name, False)
+
+    def _on_restored(self, path):
+        """引擎恢复了一个条目（在恢复线程中调用）"""
+        directory, name = os.path.split(path)
+        if os.path.normcase(directory) == os.path.normcase(self.engine.desktop_path):
+            self._restored.append(name)
+
+    def _take_restored(self):
+        """记录恢复移回桌面的条目的当前状态，并取消对它们的待处理"""
+        while self._restored:
+            name = self._restored.popleft()
+            entry = scan_path(os.path.join(self.engine.desktop_path, name))
+            if entry is not None:
+                self.ignored[name] = (entry.size, entry.mtime)
+                self.pending.pop(name, None)
+
+    def handle(self, events):
+        """合并一批事件"""
+        self.events += len(events)
+        ignored = self.engine.classifier.category_names
+        for name, kind in events:
+            if kind == RESCAN:
+                self._rescan()
+            elif kind == REMOVED:
+                self.pending.pop(name, None)
+                self.ignored.pop(name, None)
+            elif name in ignored or is_temporary(name):
+                continue
+            elif kind == WRITING:
+                self._touch(name, True)
+            elif kind == CLOSED:
+                self._touch(name, False)
+            else:
+                self._touch(name)
+
+    def ready(self):
+        """取出已安静且确认没有在写入的条目名称（按名称排序）"""
+        now = time.monotonic()
+        wall = time.time()
+        names = []
+        for name, state in list(self.pending.items()):
+            if state[0] > now:
+                continue
+            entry = scan_path(os.path.join(self.engine.desktop_path, name))
+            if entry is None:
+                del self.pending[name]
+                continue
+            signature = (entry.size, entry.mtime)
+            if state[1]:
+                # 一直没有关闭写入的事件：大小和修改时间足够久没有变化后不再等待
+                if wall - entry.mtime < self.writing_timeout or signature != state[2]:
+                    state[0] = now + self.debounce
+                    state[2] = signature
+                    continue
+                state[1] = False
+            if name in self.ignored:
+                if self.ignored[name] == signature:
+                    # 刚恢复到桌面且之后没有修改过
+                    del self.pending[name]
+                    continue
+                del self.ignored[name]
+            # 修改时间已足够久，或距上次检查没有变化（修改时间不可靠时）才认为已写完
+            if wall - entry.mtime >= self.debounce or signature == state[2]:
+                del self.pending[name]
+                names.append(name)
+            else:
+                state[0] = now + self.debounce
+                state[2] = signature
+        if self.check_open and names:
+            busy = files_open_for_writing([os.path.join(self.engine.desktop_path, name) for name in names])
+            if busy:
+                for name in names:
+                    if os.path.join(self.engine.desktop_path, name) in busy:
+                        self.pending[name] = [now + self.debounce, False, None]
+                names = [name for name in names if name not in self.pending]
+        names.sort()
+        return names
+
+    def next_timeout(self):
+        """距最早一个待处理条目可以处理的秒数"""
+        waiting = [state[0] for state in self.pending.values()]
+        if not waiting:
+            return _IDLE_WAIT
+        return min(max(min(waiting) - time.monotonic(), 0.0), _IDLE_WAIT)
+
+    def organize(self, names):
+        """整理一批条目，返回整理的文件数"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.batches += 1
+        record_path = os.path.join(self.record_dir, f"自动整理记录_{timestamp}_{self.batches:04d}.json")
+        summary = self.engine.organize(record_path, timestamp=timestamp, names=names)
+        self.organized += summary["total_files"]
+
+        # 仍留在桌面上且应该整理的条目（移动失败）稍后重试，间隔逐次加倍
+        entries = [entry for entry in (scan_path(os.path.join(self.engine.desktop_path, name)) for name in names)
+                   if entry is not None]
+        left = {entry.name for entry, _ in self.engine.plan_organize(entries)}
+        now = time.monotonic()
+        for name in names:
+            if name in left:
+                retries = self.retries[name] = self.retries.get(name, 0) + 1
+                self.pending[name] = [now + min(self.debounce * 2 ** retries, _MAX_RETRY_DELAY), False, None]
+            else:
+                self.retries.pop(name, None)
+        return summary["total_files"]
+
+    def _organize_ready(self, names, on_batch):
+        lock = self.engine.operation_lock
+        for start in range(0, len(names), self.batch_size):
+            if self.stop.is_set():
+                return
+            if not lock.acquire(blocking=False):
+                # 引擎正在执行手动操作：剩余的条目推迟到操作结束后再检查
+                for name in names[start:]:
+                    self._touch(name, False)
+                return
+            try:
+                # 持有锁之后再取一次：刚结束的恢复移回的条目不能整理
+                self._take_restored()
+                batch = [name for name in names[start:start + self.batch_size] if name not in self.ignored]
+                if not batch:
+                    continue
+                try:
+                    count = self.organize(batch)
+                except Exception as e:
+                    self.engine.log(f"自动整理失败: {e}")
+                    continue
+            finally:
+                lock.release()
+            if on_batch is not None:
+                on_batch(batch, count)
+
+    def run(self, on_batch=None):
+        """运行直到stop被置位；启动时桌面上已有的条目同样经过去抖动后整理"""
+        source = event_source(self.engine.desktop_path, self.backend, self.poll_interval)
+        self.engine.log(f"开始监视桌面: {self.engine.desktop_path}（{source.name}）")
+        self.engine.on_restored = self._on_restored
+        try:
+            self._rescan()
+            while not self.stop.is_set():
+                self.handle(source.wait(self.next_timeout()))
+                self._take_restored()
+                self._organize_ready(self.ready(), on_batch)
+        finally:
+            if self.engine.on_restored == self._on_restored:
+                self.engine.on_restored = None
+            source.close()
+            self.engine.log(f"停止监视桌面：共整理了 {self.organized} 个文件")
@@ -0,0 +1,222 @@
+import os
+import struct
+import sys
+import time
+import zipfile
+
+# 与zipfile模块一致：单个成员超过该大小时使用ZIP64扩展
+ZIP64_LIMIT = zipfile.ZIP64_LIMIT
+ZIP_FILECOUNT_LIMIT = zipfile.ZIP_FILECOUNT_LIMIT
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_DIR = struct.Struct("<4s4B4HL2L5H2L")
+_END_ARCHIVE = struct.Struct("<4s4H2LH")
+_END_ARCHIVE64 = struct.Struct("<4sQ2H2L4Q")
+_END_ARCHIVE64_LOCATOR = struct.Struct("<4sLQL")
+
+_FLAG_UTF8 = 0x800
+# LZMA成员：压缩流以结束标记结尾
+_FLAG_LZMA_EOS = 0x02
+_DEFAULT_VERSION = 20
+_ZIP64_VERSION = 45
+_VERSION_NEEDED = {
+    zipfile.ZIP_STORED: _DEFAULT_VERSION,
+    zipfile.ZIP_DEFLATED: _DEFAULT_VERSION,
+    zipfile.ZIP_BZIP2: 46,
+    zipfile.ZIP_LZMA: 63,
+}
+_CREATE_SYSTEM = 0 if sys.platform == "win32" else 3
+
+
+def _dos_datetime(mtime):
+    """mtime转换为ZIP使用的DOS日期和时间（ZIP不支持1980年以前的时间）"""
+    t = time.localtime(mtime)
+    year = min(max(t.tm_year, 1980), 2107)
+    dosdate = (year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+    dostime = t.tm_hour << 11 | t.tm_min << 5 | (t.tm_sec // 2)
+    return dosdate, dostime
+
+
+class ZipMember:
+    """已写入（或正在写入）的成员信息，用于生成中央目录"""
+
+    __slots__ = ("name", "compress_type", "mtime", "mode", "header_offset", "zip64",
+                 "crc", "compress_size", "file_size")
+
+    def __init__(self, name, compress_type, mtime, mode, header_offset, zip64):
+        self.name = name
+        self.compress_type = compress_type
+        self.mtime = mtime
+        self.mode = mode
+        self.header_offset = header_offset
+        self.zip64 = zip64
+        self.crc = 0
+        self.compress_size = 0
+        self.file_size = 0
+
+    def to_record(self):
+        """转换为可以写入JSON的列表（用于备份检查点）"""
+        return [self.name, self.compress_type, self.mtime, self.mode, self.header_offset, self.zip64,
+                self.crc, self.compress_size, self.file_size]
+
+    @classmethod
+    def from_record(cls, record):
+        name, compress_type, mtime, mode, header_offset, zip64, crc, compress_size, file_size = record
+        member = cls(name, compress_type, mtime, mode, header_offset, zip64)
+        member.crc = crc
+        member.compress_size = compress_size
+        member.file_size = file_size
+        return member
+
+    def _encoded_name(self):
+        """返回 (编码后的名称, 通用标志位)"""
+        flags = _FLAG_LZMA_EOS if self.compress_type == zipfile.ZIP_LZMA else 0
+        try:
+            return self.name.encode("ascii"), flags
+        except UnicodeEncodeError:
+            return self.name.encode("utf-8"), flags | _FLAG_UTF8
+
+    def _versions(self, zip64):
+        version = _VERSION_NEEDED.get(self.compress_type, _DEFAULT_VERSION)
+        return max(version, _ZIP64_VERSION) if zip64 else version
+
+    def local_header(self):
+        name, flags = self._encoded_name()
+        dosdate, dostime = _dos_datetime(self.mtime)
+        if self.zip64:
+            extra = struct.pack("<HHQQ", 1, 16, self.file_size, self.compress_size)
+            file_size = compress_size = 0xFFFFFFFF
+        else:
+            extra = b""
+            file_size, compress_size = self.file_size, self.compress_size
+        return _LOCAL_HEADER.pack(b"PK\x03\x04", self._versions(self.zip64), 0, flags,
+                                  self.compress_type, dostime, dosdate, self.crc,
+                                  compress_size, file_size, len(name), len(extra)) + name + extra
+
+    def central_header(self):
+        name, flags = self._encoded_name()
+        dosdate, dostime = _dos_datetime(self.mtime)
+        # ZIP64扩展字段只包含溢出的字段，顺序固定
+        values = []
+        file_size, compress_size, header_offset = self.file_size, self.compress_size, self.header_offset
+        if file_size > ZIP64_LIMIT:
+            values.append(file_size)
+            file_size = 0xFFFFFFFF
+        if compress_size > ZIP64_LIMIT:
+            values.append(compress_size)
+            compress_size = 0xFFFFFFFF
+        if header_offset > ZIP64_LIMIT:
+            values.append(header_offset)
+            header_offset = 0xFFFFFFFF
+        extra = struct.pack(f"<HH{len(values)}Q", 1, 8 * len(values), *values) if values else b""
+        version = self._versions(bool(values) or self.zip64)
+        return _CENTRAL_DIR.pack(b"PK\x01\x02", version, _CREATE_SYSTEM, version, 0, flags,
+                                 self.compress_type, dostime, dosdate, self.crc,
+                                 compress_size, file_size, len(name), len(extra), 0, 0, 0,
+                                 (self.mode & 0xFFFF) << 16, header_offset) + name + extra
+
+
+class ZipWriter:
+    """按顺序写入已压缩数据的ZIP写入器
+
+    与zipfile不同，成员数据由调用方（可在其他线程中）预先压缩好，
+    这里只负责本地文件头、数据和中央目录，生成标准ZIP（必要时使用ZIP64）。
+    写完一个成员后回到文件头处补写CRC和大小，因此目标必须可以seek。
+    resume为 (已完成的成员列表, 结束位置) 时打开已有的文件，截断到结束位置后继续追加。
+    """
+
+    def __init__(self, path, resume=None):
+        self.path = path
+        self._current = None
+        if resume is None:
+            self.members = []
+            self._fp = open(path, "w+b")
+        else:
+            members, offset = resume
+            self.members = list(members)
+            self._fp = open(path, "r+b")
+            self._fp.truncate(offset)
+            self._fp.seek(offset)
+
+    def tell(self):
+        return self._fp.tell()
+
+    def rewind(self, members, offset):
+        """只保留members（续传时沿用的成员），截断到offset后继续写入，之后的旧数据不再留在文件中"""
+        self.members = list(members)
+        self._fp.truncate(offset)
+        self._fp.seek(offset)
+
+    def sync(self):
+        """把已写入的数据落盘"""
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+
+    def begin_member(self, name, mtime, mode=0o100644, compress_type=zipfile.ZIP_DEFLATED, size_hint=0):
+        """开始写入一个成员，size_hint为未压缩大小（用于决定是否需要ZIP64）"""
+        # 与zipfile相同：预留5%的压缩膨胀余量
+        zip64 = size_hint * 1.05 > ZIP64_LIMIT
+        member = ZipMember(name.replace(os.sep, "/"), compress_type, mtime, mode, self._fp.tell(), zip64)
+        self._fp.write(member.local_header())
+        self._current = member
+        return member
+
+    def write(self, data):
+        """写入当前成员的一段已压缩数据"""
+        self._fp.write(data)
+
+    def end_member(self, crc, compress_size, file_size):
+        """结束当前成员：回写文件头中的CRC和大小"""
+        member = self._current
+        self._current = None
+        member.crc = crc
+        member.compress_size = compress_size
+        member.file_size = file_size
+        if not member.zip64 and (compress_size > ZIP64_LIMIT or file_size > ZIP64_LIMIT):
+            self.abort_member(member)
+            raise RuntimeError(f"文件大小超出预期，无法写入: {member.name}")
+        end = self._fp.tell()
+        self._fp.seek(member.header_offset)
+        self._fp.write(member.local_header())
+        self._fp.seek(end)
+        self.members.append(member)
+        return member
+
+    def abort_member(self, member=None):
+        """丢弃写了一半的成员（读取失败时），截断到该成员开始处"""
+        member = member or self._current
+        self._current = None
+        if member is not None:
+            self._fp.seek(member.header_offset)
+            self._fp.truncate()
+
+    def close(self):
+        """写入中央目录并关闭文件"""
+        if self._fp.closed:
+            return
+        try:
+            if self._current is not None:
+                self.abort_member()
+            fp = self._fp
+            cd_offset = fp.tell()
+            for member in self.members:
+                fp.write(member.central_header())
+            cd_end = fp.tell()
+            count = len(self.members)
+            cd_size = cd_end - cd_offset
+            if count >= ZIP_FILECOUNT_LIMIT or cd_offset > ZIP64_LIMIT or cd_size > ZIP64_LIMIT:
+                fp.write(_END_ARCHIVE64.pack(b"PK\x06\x06", 44, _ZIP64_VERSION, _ZIP64_VERSION,
+                                             0, 0, count, count, cd_size, cd_offset))
+                fp.write(_END_ARCHIVE64_LOCATOR.pack(b"PK\x06\x07", 0, cd_end, 1))
+                count = min(count, 0xFFFF)
+                cd_size = min(cd_size, 0xFFFFFFFF)
+                cd_offset = min(cd_offset, 0xFFFFFFFF)
+            fp.write(_END_ARCHIVE.pack(b"PK\x05\x06", 0, 0, count, count, cd_size, cd_offset, 0))
+        finally:
+            self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
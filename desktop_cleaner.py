@@ -1,13 +1,50 @@
 import os
-import shutil
-import zipfile
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from datetime import datetime
 import json
-from pathlib import Path
-import winreg
-# 移除了ctypes导入，因为不再需要桌面刷新功能
+
+from cleaner import CleanerEngine, default_config, get_desktop_path
+from cleaner import load_config as load_config_file, save_config as save_config_file
+from cleaner.logsink import LogSink
+from cleaner.progress import describe, format_duration
+from cleaner.watcher import DesktopWatcher
+
+# 后台操作期间界面刷新间隔（毫秒），约20帧/秒
+UI_FRAME_MS = 50
+
+# 日志框刷新间隔（毫秒）和最多保留的行数
+LOG_FLUSH_MS = 100
+LOG_MAX_LINES = 2000
+
+# 常见冗长消息的简化版本（一条消息包含多个时按表中顺序取第一个）
+LOG_SIMPLIFICATIONS = {
+    "开始整理桌面...": "开始整理",
+    "桌面整理完成": "整理完成",
+    "开始备份桌面文件...": "开始备份",
+    "备份完成": "备份完成",
+    "配置已保存": "配置保存",
+    "配置代码已生成": "配置导出",
+    "配置导入成功": "配置导入",
+    "开始从记录文件恢复桌面": "开始恢复",
+    "恢复完成": "恢复完成"
+}
+
+
+def simplify_log_message(message):
+    """简化日志消息内容"""
+    for original, simplified in LOG_SIMPLIFICATIONS.items():
+        if original in message:
+            return simplified
+
+    # 如果消息太长，截断显示
+    if len(message) > 50:
+        return message[:47] + "..."
+
+    return message
+
 
 class DesktopCleaner:
     def __init__(self):
@@ -24,54 +61,7 @@ class DesktopCleaner:
         self.config_file = os.path.join(os.path.dirname(__file__), "config.json")
         
         # 默认配置（增强版，包含图标信息）
-        self.config = {
-            "excluded_extensions": [".lnk", ".url"],
-            "max_file_size_mb": 100,
-            "include_folders_in_organize": False,
-            "include_folders_in_backup": False,
-            "categories": {
-                "📄 文档": {
-                    "extensions": [".txt", ".doc", ".docx", ".pdf", ".xls", ".xlsx", ".ppt", ".pptx"],
-                    "icon": "📄",
-                    "color": "#3498db"
-                },
-                "🖼️ 图片": {
-                    "extensions": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".svg", ".ico"],
-                    "icon": "🖼️",
-                    "color": "#e74c3c"
-                },
-                "🎬 视频": {
-                    "extensions": [".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv", ".webm"],
-                    "icon": "🎬",
-                    "color": "#9b59b6"
-                },
-                "🎵 音频": {
-                    "extensions": [".mp3", ".wav", ".flac", ".aac", ".ogg", ".wma"],
-                    "icon": "🎵",
-                    "color": "#f39c12"
-                },
-                "📦 压缩包": {
-                    "extensions": [".zip", ".rar", ".7z", ".tar", ".gz"],
-                    "icon": "📦",
-                    "color": "#95a5a6"
-                },
-                "💻 程序": {
-                    "extensions": [".exe", ".msi", ".deb", ".dmg"],
-                    "icon": "💻",
-                    "color": "#2ecc71"
-                },
-                "📂 桌面文件夹": {
-                    "extensions": ["__FOLDER__"],
-                    "icon": "📂",
-                    "color": "#f39c12"
-                },
-                "📁 其他": {
-                    "extensions": [],
-                    "icon": "📁",
-                    "color": "#34495e"
-                }
-            }
-        }
+        self.config = default_config()
         
         # 加载配置
         self.load_config()
@@ -79,20 +69,23 @@ class DesktopCleaner:
         # 备份记录文件
         self.backup_file = os.path.join(os.path.dirname(__file__), "backup_record.json")
         
+        # 整理引擎（与界面共享同一份配置），历史速度保存在程序目录，用于预估耗时
+        self.engine = CleanerEngine(self.config, self.desktop_path, log=self.log_message,
+                                    history_path=os.path.join(os.path.dirname(__file__), "throughput.json"),
+                                    scan_cache_path=os.path.join(os.path.dirname(__file__), "scan_cache.db"))
+        
+        # 监视模式（自动整理）运行时的监视器
+        self.watcher = None
+        
+        # 日志先写入有界缓冲区，由界面线程定时批量写入日志框
+        self.log_sink = LogSink(simplify=self._simplify_log_message)
+        
         self.setup_ui()
+        self.root.after(LOG_FLUSH_MS, self._log_flush_loop)
         
     def get_desktop_path(self):
         """获取桌面路径"""
-        try:
-            # 从注册表获取桌面路径
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                               r"Software\Microsoft\Windows\CurrentVersion\Explorer\Shell Folders")
-            desktop_path = winreg.QueryValueEx(key, "Desktop")[0]
-            winreg.CloseKey(key)
-            return desktop_path
-        except:
-            # 备用方法
-            return os.path.join(os.path.expanduser("~"), "Desktop")
+        return get_desktop_path()
     
     # 移除了refresh_desktop方法，因为桌面刷新功能未能正常工作
     
@@ -227,6 +220,18 @@ class DesktopCleaner:
             button.bind("<Enter>", on_enter)
             button.bind("<Leave>", on_leave)
         
+        # 监视模式：桌面出现新文件后自动整理
+        self.watch_var = tk.BooleanVar(value=False)
+        watch_check = tk.Checkbutton(button_container,
+                                     text="👀 自动整理（监视桌面，新文件写完后自动归类）",
+                                     variable=self.watch_var,
+                                     command=self.toggle_watch,
+                                     font=("微软雅黑", 10, "bold"),
+                                     fg="#2c3e50", bg="#f8f9fa",
+                                     activebackground="#f8f9fa",
+                                     activeforeground="#2c3e50")
+        watch_check.pack(pady=(10, 0))
+        
         create_hover_effect(clean_btn, "#3498db", "#2980b9")
         create_hover_effect(restore_btn, "#2ecc71", "#27ae60")
         create_hover_effect(backup_btn, "#e74c3c", "#c0392b")
@@ -296,6 +301,17 @@ class DesktopCleaner:
                                               activebackground="#ffffff",
                                               activeforeground="#2c3e50")
         folder_organize_check.pack(anchor="w")
+
+        sniffing = self.config.get("content_sniffing", "off")
+        self.content_sniffing_var = tk.BooleanVar(value=bool(sniffing) and sniffing != "off")
+        content_sniffing_check = tk.Checkbutton(folder_organize_frame,
+                                               text="🔍 按文件内容识别没有扩展名或类型未知的文件",
+                                               variable=self.content_sniffing_var,
+                                               font=("微软雅黑", 10, "bold"),
+                                               fg="#2c3e50", bg="#ffffff",
+                                               activebackground="#ffffff",
+                                               activeforeground="#2c3e50")
+        content_sniffing_check.pack(anchor="w")
         
         # 文件夹备份选项
         folder_backup_frame = tk.Frame(settings_content, bg="#ffffff")
@@ -311,6 +327,16 @@ class DesktopCleaner:
                                             activeforeground="#2c3e50")
         folder_backup_check.pack(anchor="w")
         
+        self.incremental_backup_var = tk.BooleanVar(value=self.config.get("incremental_backup", False))
+        incremental_backup_check = tk.Checkbutton(folder_backup_frame, 
+                                                 text="🔁 增量备份（只备份上次备份后有变化的文件）", 
+                                                 variable=self.incremental_backup_var,
+                                                 font=("微软雅黑", 10, "bold"), 
+                                                 fg="#2c3e50", bg="#ffffff",
+                                                 activebackground="#ffffff",
+                                                 activeforeground="#2c3e50")
+        incremental_backup_check.pack(anchor="w")
+        
         # 按钮区域
         button_area = tk.Frame(settings_content, bg="#ffffff")
         button_area.pack(fill="x", pady=(10, 0))
@@ -860,14 +886,17 @@ class DesktopCleaner:
             # 构建完整的分类名称（图标 + 名称）
             full_name = f"{icon} {name}"
             
-            # 如果是编辑模式，删除旧的分类
+            # 如果是编辑模式，删除旧的分类（界面中不能编辑的规则、压缩方式等配置保留）
+            kept = {}
             if edit_category and edit_category in self.config["categories"]:
-                del self.config["categories"][edit_category]
+                old_info = self.config["categories"].pop(edit_category)
+                kept = {key: value for key, value in old_info.items() if key not in ("extensions", "icon", "color")}
             
             # 保存分类（移除颜色字段）
             self.config["categories"][full_name] = {
                 "extensions": extensions,
-                "icon": icon
+                "icon": icon,
+                **kept
             }
             
             self.save_config()
@@ -1029,87 +1058,57 @@ class DesktopCleaner:
     
     def log_message(self, message):
         """记录日志消息"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        # 简化日志内容，只显示关键操作
-        simplified_message = self._simplify_log_message(message)
+        # 只写入缓冲区（线程安全），不直接操作Tk控件，也不触发重绘
+        self.log_sink.append(message)
+    
+    def _log_flush_loop(self):
+        self.flush_log()
+        self.root.after(LOG_FLUSH_MS, self._log_flush_loop)
+    
+    def flush_log(self):
+        """把缓冲的日志批量写入日志框（在界面线程中调用）"""
+        replace_last, lines = self.log_sink.drain()
+        if not lines:
+            return
         try:
-            if hasattr(self, 'status_text') and self.status_text:
-                self.status_text.insert(tk.END, f"[{timestamp}] {simplified_message}\n")
-                self.status_text.see(tk.END)
-                if hasattr(self, 'root') and self.root:
-                    self.root.update()
-            else:
-                print(f"[{timestamp}] {simplified_message}")
-        except Exception as e:
-            print(f"[{timestamp}] {simplified_message}")
+            if not (hasattr(self, 'status_text') and self.status_text):
+                print("".join(lines), end="")
+                return
+            text = self.status_text
+            if replace_last:
+                # 聚合行的计数增加了：替换上次显示的最后一行
+                text.delete("log_tail", "end-1c")
+            if len(lines) > 1:
+                text.insert(tk.END, "".join(lines[:-1]))
+            text.mark_set("log_tail", "end-1c")
+            text.mark_gravity("log_tail", tk.LEFT)
+            text.insert(tk.END, lines[-1])
+            
+            # 限制日志框行数，避免长时间运行后越来越慢
+            line_count = int(text.index("end-1c").split(".")[0]) - 1
+            if line_count > LOG_MAX_LINES:
+                text.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
+            text.see(tk.END)
+        except Exception:
+            print("".join(lines), end="")
     
     def _simplify_log_message(self, message):
         """简化日志消息内容"""
-        # 简化常见的冗长消息
-        simplifications = {
-            "开始整理桌面...": "开始整理",
-            "桌面整理完成": "整理完成",
-            "开始备份桌面文件...": "开始备份",
-            "备份完成": "备份完成",
-            "配置已保存": "配置保存",
-            "配置代码已生成": "配置导出",
-            "配置导入成功": "配置导入",
-            "开始从记录文件恢复桌面": "开始恢复",
-            "恢复完成": "恢复完成"
-        }
-        
-        # 检查是否有简化版本
-        for original, simplified in simplifications.items():
-            if original in message:
-                return simplified
-        
-        # 如果消息太长，截断显示
-        if len(message) > 50:
-            return message[:47] + "..."
-        
-        return message
+        return simplify_log_message(message)
     
     def load_config(self):
         """加载配置文件"""
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    saved_config = json.load(f)
-                    # 合并配置，保持向后兼容
-                    if "categories" in saved_config:
-                        # 检查是否是旧格式
-                        first_category = next(iter(saved_config["categories"].values()))
-                        if isinstance(first_category, list):
-                            # 转换旧格式到新格式
-                            new_categories = {}
-                            for name, extensions in saved_config["categories"].items():
-                                icon = "📁"
-                                if "文档" in name: icon = "📄"
-                                elif "图片" in name: icon = "🖼️"
-                                elif "视频" in name: icon = "🎬"
-                                elif "音频" in name: icon = "🎵"
-                                elif "压缩" in name: icon = "📦"
-                                elif "程序" in name: icon = "💻"
-                                
-                                new_categories[f"{icon} {name}"] = {
-                                    "extensions": extensions,
-                                    "icon": icon
-                                }
-                            saved_config["categories"] = new_categories
-                    
-                    self.config.update(saved_config)
-                    
-                    # 确保新配置项有默认值
-                    if "include_folders_in_organize" not in self.config:
-                        self.config["include_folders_in_organize"] = False
-                    if "include_folders_in_backup" not in self.config:
-                        self.config["include_folders_in_backup"] = False
+            load_config_file(self.config_file, self.config)
         except Exception as e:
             print(f"加载配置失败: {e}")
     
     def save_config(self):
         """保存配置"""
         try:
+            # 分类或排除设置可能已变化，下次使用时重建分类索引
+            self.engine.config_changed()
+            
             # 更新基本配置
             extensions = [ext.strip() for ext in self.ext_var.get().split(',') if ext.strip()]
             self.config["excluded_extensions"] = extensions
@@ -1124,12 +1123,19 @@ class DesktopCleaner:
             # 更新文件夹选项
             if hasattr(self, 'include_folders_organize_var'):
                 self.config["include_folders_in_organize"] = self.include_folders_organize_var.get()
+            if hasattr(self, 'content_sniffing_var'):
+                # 配置文件中手动设置的 "all" 保留不变
+                if not self.content_sniffing_var.get():
+                    self.config["content_sniffing"] = "off"
+                elif self.config.get("content_sniffing", "off") in ("off", False, None):
+                    self.config["content_sniffing"] = "unknown"
             if hasattr(self, 'include_folders_backup_var'):
                 self.config["include_folders_in_backup"] = self.include_folders_backup_var.get()
+            if hasattr(self, 'incremental_backup_var'):
+                self.config["incremental_backup"] = self.incremental_backup_var.get()
             
             # 保存到文件
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            save_config_file(self.config, self.config_file)
             
             self.log_message("设置已保存")
             
@@ -1138,72 +1144,54 @@ class DesktopCleaner:
     
     def should_skip_file(self, file_path, for_organize=True):
         """判断是否应该跳过文件"""
-        file_name = os.path.basename(file_path)
-        file_ext = os.path.splitext(file_name)[1].lower()
-        
-        # 根据操作类型决定是否跳过文件夹
-        if os.path.isdir(file_path):
-            if for_organize:
-                return not self.config.get("include_folders_in_organize", False)
-            else:  # for backup
-                return not self.config.get("include_folders_in_backup", False)
-        
-        # 跳过排除的扩展名
-        if file_ext in self.config["excluded_extensions"]:
-            return True
-        
-        # 跳过大文件
-        try:
-            file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-            if file_size_mb > self.config["max_file_size_mb"]:
-                return True
-        except:
-            pass
-        
-        return False
+        return self.engine.should_skip_file(file_path, for_organize)
     
     def get_file_category(self, file_path):
         """获取文件分类"""
-        # 如果是文件夹且启用了文件夹整理，返回桌面文件夹分类
-        if os.path.isdir(file_path) and self.config.get("include_folders_in_organize", False):
-            return "📂 桌面文件夹"
-        
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
-        for category_name, category_info in self.config["categories"].items():
-            if file_ext in category_info["extensions"]:
-                return category_name
-        
-        # 返回"其他"分类
-        for category_name in self.config["categories"]:
-            if "其他" in category_name:
-                return category_name
-        
-        return "📁 其他"  # 默认分类
+        return self.engine.get_file_category(file_path)
     
     def create_desktop_ini(self, folder_path, category_info):
         """为文件夹创建desktop.ini文件以设置图标"""
+        self.engine.create_desktop_ini(folder_path, category_info)
+    
+    def toggle_watch(self):
+        """开启或关闭监视模式，开启时选择整理记录的保存位置（每批生成一个记录，可随时恢复）"""
+        if not self.watch_var.get():
+            if self.watcher is not None:
+                self.watcher.stop.set()
+                self.watcher = None
+            return
+        record_dir = filedialog.askdirectory(title="选择自动整理记录保存位置")
+        if not record_dir:
+            self.watch_var.set(False)
+            return
         try:
-            desktop_ini_path = os.path.join(folder_path, "desktop.ini")
-            
-            # 创建desktop.ini内容
-            ini_content = f"""[.ShellClassInfo]
-IconResource=shell32.dll,3
-InfoTip={category_info['icon']} 分类文件夹
-[ViewState]
-Mode=
-Vid=
-FolderType=Generic
-"""
-            
-            with open(desktop_ini_path, 'w', encoding='utf-8') as f:
-                f.write(ini_content)
-            
-            # 只设置desktop.ini文件为隐藏和系统文件，不设置文件夹属性
-            os.system(f'attrib +h +s "{desktop_ini_path}"')
-            
+            self.watcher = DesktopWatcher(self.engine, record_dir)
         except Exception as e:
-            print(f"创建desktop.ini失败: {e}")
+            self.watch_var.set(False)
+            messagebox.showerror("错误", f"无法开启自动整理: {e}")
+            return
+        
+        def run(watcher):
+            try:
+                watcher.run()
+            except Exception as e:
+                self.log_message(f"自动整理已停止: {e}")
+        
+        threading.Thread(target=run, args=(self.watcher,), daemon=True).start()
+    
+    def confirm_estimate(self, estimate, action):
+        """显示预检结果：空间不足时提示并返回False，预计耗时较长时询问是否现在开始"""
+        if not estimate.fits:
+            lines = [f"{path}\n需要 {required / 1024 / 1024:.1f} MB，仅剩 {free / 1024 / 1024:.1f} MB"
+                     for path, required, free in estimate.shortfalls]
+            messagebox.showerror("空间不足", f"剩余空间不足，无法{action}：\n" + "\n".join(lines))
+            return False
+        if estimate.seconds >= self.config.get("preflight_confirm_seconds", 600):
+            return messagebox.askyesno(
+                "确认", f"{action} {estimate.items} 项（{estimate.bytes / 1024 / 1024:.1f} MB）"
+                        f"预计需要 {format_duration(estimate.seconds)}\n是否现在开始？")
+        return True
     
     def clean_desktop(self):
         """整理桌面 - 直接在桌面创建分类文件夹"""
@@ -1225,82 +1213,40 @@ FolderType=Generic
                 self.log_message("用户取消选择保存位置，整理操作已取消")
                 return
             
-            self.log_message("开始整理桌面...")
-            
-            # 记录移动的文件，用于恢复
-            moved_files = []
-            
-            # 遍历桌面文件
-            for item in os.listdir(self.desktop_path):
-                item_path = os.path.join(self.desktop_path, item)
-                
-                # 跳过已存在的分类文件夹
-                if item in self.config["categories"].keys():
-                    continue
-                
-                # 跳过不需要整理的文件
-                if self.should_skip_file(item_path, for_organize=True):
-                    continue
-                
-                # 获取文件分类
-                category = self.get_file_category(item_path)
-                
-                # 直接在桌面创建分类文件夹
-                category_folder = os.path.join(self.desktop_path, category)
-                if not os.path.exists(category_folder):
-                    os.makedirs(category_folder)
-                    # 为分类文件夹设置图标
-                    if category in self.config["categories"]:
-                        self.create_desktop_ini(category_folder, self.config["categories"][category])
-                
-                # 移动文件或文件夹
-                dest_path = os.path.join(category_folder, item)
-                
-                # 处理重名文件/文件夹
-                counter = 1
-                original_dest = dest_path
-                while os.path.exists(dest_path):
-                    if os.path.isdir(item_path):
-                        # 文件夹重名处理
-                        dest_path = f"{original_dest}_{counter}"
-                    else:
-                        # 文件重名处理
-                        name, ext = os.path.splitext(original_dest)
-                        dest_path = f"{name}_{counter}{ext}"
-                    counter += 1
-                
-                shutil.move(item_path, dest_path)
-                moved_files.append({
-                    "original": item_path,
-                    "new": dest_path,
-                    "category": category,
-                    "timestamp": timestamp
-                })
-                
-                item_type = "文件夹" if os.path.isdir(dest_path) else "文件"
-                self.log_message(f"移动{item_type}: {item} -> {category}")
-            
-            # 保存整理记录到用户选择的位置
-            record_data = {
-                "timestamp": timestamp,
-                "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "total_files": len(moved_files),
-                "categories_created": list(set([f["category"] for f in moved_files])),
-                "files": moved_files
-            }
-            
-            with open(save_path, 'w', encoding='utf-8') as f:
-                json.dump(record_data, f, ensure_ascii=False, indent=2)
-            
-            self.log_message(f"整理记录已保存: {save_path}")
+            cancel = threading.Event()
+            progress_window, progress_label, progress_bar, detail_label = self.create_progress_window(
+                "整理进度", "正在扫描桌面...", on_cancel=cancel.set)
             
-            # 同时保存到默认备份文件（保持兼容性）
-            with open(self.backup_file, 'w', encoding='utf-8') as f:
-                json.dump(moved_files, f, ensure_ascii=False, indent=2)
+            def on_progress(snapshot):
+                self.show_progress(snapshot, "正在整理", progress_label, progress_bar, detail_label)
             
-            self.log_message(f"整理完成！共整理了 {len(moved_files)} 个文件")
+            def on_done(summary):
+                progress_window.destroy()
+                if summary["cancelled"]:
+                    messagebox.showinfo("已取消", f"整理已取消\n已整理的 {summary['total_files']} 个文件已写入整理记录，可随时恢复")
+                else:
+                    messagebox.showinfo("完成", f"桌面整理完成！\n共整理了 {summary['total_files']} 个文件\n分类文件夹已直接创建在桌面")
             
-            messagebox.showinfo("完成", f"桌面整理完成！\n共整理了 {len(moved_files)} 个文件\n分类文件夹已直接创建在桌面")
+            def on_error(e):
+                progress_window.destroy()
+                self.log_message(f"整理失败: {e}")
+                messagebox.showerror("错误", f"整理失败: {e}")
+            
+            def on_estimate(estimate):
+                # 确认后直接按预检时的扫描结果整理，不再扫描一遍
+                if cancel.is_set() or not self.confirm_estimate(estimate, "整理"):
+                    progress_window.destroy()
+                    self.log_message("整理操作已取消")
+                    return
+                self.run_in_background(
+                    lambda post_progress: self.engine.organize(save_path, legacy_record_path=self.backup_file,
+                                                               timestamp=timestamp, progress=post_progress,
+                                                               cancel=cancel, estimate=estimate),
+                    on_progress, on_done, on_error)
+            
+            # 预检（扫描桌面、跨卷移动的空间、预计耗时）在后台线程进行，界面不会卡住
+            self.run_in_background(lambda post_progress: self.engine.preflight_organize(),
+                                   on_progress, on_estimate, on_error)
             
         except Exception as e:
             self.log_message(f"整理失败: {e}")
@@ -1312,7 +1258,7 @@ FolderType=Generic
             # 让用户选择要恢复的JSON文件
             file_path = filedialog.askopenfilename(
                 title="选择要恢复的整理记录文件",
-                filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")],
+                filetypes=[("JSON文件", "*.json"), ("整理日志", "*.jsonl"), ("所有文件", "*.*")],
                 initialdir=os.path.expanduser("~")  # 默认从用户主目录开始
             )
             
@@ -1331,78 +1277,133 @@ FolderType=Generic
             self.log_message(f"恢复失败: {e}")
             messagebox.showerror("错误", f"恢复失败: {e}")
     
-    def _restore_from_file(self, record_file_path):
-        """从指定的记录文件恢复桌面"""
-        try:
-            self.log_message(f"开始从记录文件恢复桌面: {os.path.basename(record_file_path)}")
+    def create_progress_window(self, title, initial_text, on_cancel=None):
+        """创建进度窗口，返回(窗口, 进度标签, 进度条, 详细信息标签)
+        
+        提供on_cancel时显示取消按钮，关闭窗口也视为取消。
+        """
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title(title)
+        progress_window.geometry("400x150")
+        progress_window.resizable(False, False)
+        progress_window.grab_set()
+        progress_window.transient(self.root)
+        
+        # 居中显示
+        progress_window.geometry("+%d+%d" % (self.root.winfo_rootx() + 200, self.root.winfo_rooty() + 200))
+        
+        # 进度标签
+        progress_label = tk.Label(progress_window, text=initial_text, font=("微软雅黑", 10))
+        progress_label.pack(pady=10)
+        
+        # 进度条
+        progress_bar = ttk.Progressbar(progress_window, mode='determinate', maximum=100)
+        progress_bar.pack(pady=10, padx=20, fill='x')
+        
+        # 详细信息标签
+        detail_label = tk.Label(progress_window, text="", font=("微软雅黑", 9), fg="#666")
+        detail_label.pack(pady=5)
+        
+        if on_cancel is not None:
+            progress_window.geometry("400x190")
             
-            # 读取记录文件
-            with open(record_file_path, 'r', encoding='utf-8') as f:
-                record_data = json.load(f)
+            def cancel():
+                cancel_btn.config(state="disabled", text="正在取消...")
+                on_cancel()
             
-            # 兼容新旧格式
-            if isinstance(record_data, dict) and "files" in record_data:
-                moved_files = record_data["files"]
-                restore_info = f"恢复时间: {record_data.get('datetime', '未知')}\n文件数量: {record_data.get('total_files', len(moved_files))}"
+            cancel_btn = tk.Button(progress_window, text="取消", command=cancel,
+                                   font=("微软雅黑", 9), bg="#95a5a6", fg="white",
+                                   relief="flat", padx=20, cursor="hand2")
+            cancel_btn.pack(pady=5)
+            progress_window.protocol("WM_DELETE_WINDOW", cancel)
+        
+        progress_window.update()
+        return progress_window, progress_label, progress_bar, detail_label
+    
+    def show_progress(self, snapshot, action, progress_label, progress_bar, detail_label):
+        """在进度窗口中显示进度快照：进度条、当前项目，以及数量、速度和剩余时间"""
+        fraction = snapshot.fraction
+        if fraction is not None:
+            progress_bar.config(value=fraction * 100)
+        if snapshot.name:
+            progress_label.config(text=f"{action}: {snapshot.name}")
+        detail_label.config(text=describe(snapshot))
+    
+    def run_in_background(self, work, on_progress, on_done, on_error):
+        """在后台线程执行耗时操作
+        
+        work(post_progress) 在后台线程运行，post_progress的参数原样交给on_progress；
+        界面线程每UI_FRAME_MS毫秒取一次队列，只显示最新的进度，
+        结束后调用on_done(结果)或on_error(异常)。
+        """
+        events = queue.Queue()
+        
+        def post_progress(*args):
+            events.put(("progress", args))
+        
+        def worker():
+            try:
+                events.put(("done", work(post_progress)))
+            except Exception as e:
+                events.put(("error", e))
+        
+        def poll():
+            latest = None
+            finished = None
+            while True:
+                try:
+                    kind, payload = events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    latest = payload
+                else:
+                    finished = (kind, payload)
+            self.flush_log()
+            if latest is not None:
+                on_progress(*latest)
+            if finished is None:
+                self.root.after(UI_FRAME_MS, poll)
+            elif finished[0] == "done":
+                on_done(finished[1])
             else:
-                moved_files = record_data
-                restore_info = f"文件数量: {len(moved_files)}"
+                on_error(finished[1])
+        
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(UI_FRAME_MS, poll)
+    
+    def _restore_from_file(self, record_file_path):
+        """从指定的记录文件恢复桌面"""
+        try:
+            # 创建进度窗口
+            cancel = threading.Event()
+            progress_window, progress_label, progress_bar, detail_label = self.create_progress_window(
+                "恢复进度", "正在读取整理记录...", on_cancel=cancel.set)
             
-            restored_count = 0
-            categories_to_clean = set()
+            def on_progress(snapshot):
+                self.show_progress(snapshot, "正在恢复", progress_label, progress_bar, detail_label)
             
-            for file_info in moved_files:
-                if os.path.exists(file_info["new"]):
-                    # 恢复文件到原位置
-                    original_name = os.path.basename(file_info["original"])
-                    restore_path = os.path.join(self.desktop_path, original_name)
-                    
-                    # 处理重名文件
-                    counter = 1
-                    original_restore = restore_path
-                    while os.path.exists(restore_path):
-                        name, ext = os.path.splitext(original_restore)
-                        restore_path = f"{name}_{counter}{ext}"
-                        counter += 1
-                    
-                    shutil.move(file_info["new"], restore_path)
-                    restored_count += 1
-                    categories_to_clean.add(file_info["category"])
-                    self.log_message(f"恢复: {original_name}")
-            
-            # 删除空的分类文件夹（直接在桌面的）
-            for category in categories_to_clean:
-                category_path = os.path.join(self.desktop_path, category)
-                if os.path.exists(category_path) and os.path.isdir(category_path):
-                    try:
-                        # 先删除desktop.ini文件（如果存在）
-                        desktop_ini = os.path.join(category_path, "desktop.ini")
-                        if os.path.exists(desktop_ini):
-                            try:
-                                # 移除隐藏和系统属性
-                                os.system(f'attrib -h -s "{desktop_ini}"')
-                                os.remove(desktop_ini)
-                                self.log_message(f"删除desktop.ini: {category}")
-                            except Exception as ini_e:
-                                self.log_message(f"删除desktop.ini失败: {category} - {ini_e}")
-                        
-                        # 检查文件夹是否为空（再次检查，因为可能有其他隐藏文件）
-                        try:
-                            folder_contents = os.listdir(category_path)
-                            if not folder_contents:  # 文件夹为空
-                                os.rmdir(category_path)
-                                self.log_message(f"删除空分类文件夹: {category}")
-                            else:
-                                self.log_message(f"分类文件夹不为空，保留: {category} (包含: {folder_contents})")
-                        except Exception as list_e:
-                            self.log_message(f"检查文件夹内容失败: {category} - {list_e}")
-                            
-                    except Exception as e:
-                        self.log_message(f"删除分类文件夹失败: {category} - {e}")
+            def on_done(result):
+                progress_window.destroy()
+                if result["cancelled"]:
+                    messagebox.showinfo("已取消", f"恢复已取消\n已恢复 {result['restored_count']} 个文件，其余文件仍在分类文件夹中")
+                    return
+                
+                if result["datetime"] is not None:
+                    restore_info = f"恢复时间: {result['datetime']}\n文件数量: {result['total_files']}"
+                else:
+                    restore_info = f"文件数量: {result['total_files']}"
+                
+                messagebox.showinfo("完成", f"桌面恢复完成！\n{restore_info}\n共恢复了 {result['restored_count']} 个文件")
             
-            self.log_message(f"恢复完成！共恢复了 {restored_count} 个文件")
+            def on_error(e):
+                progress_window.destroy()
+                self.log_message(f"从文件恢复失败: {e}")
+                messagebox.showerror("错误", f"从文件恢复失败: {e}")
             
-            messagebox.showinfo("完成", f"桌面恢复完成！\n{restore_info}\n共恢复了 {restored_count} 个文件")
+            self.run_in_background(
+                lambda post_progress: self.engine.restore(record_file_path, progress=post_progress, cancel=cancel),
+                on_progress, on_done, on_error)
             
         except Exception as e:
             self.log_message(f"从文件恢复失败: {e}")
@@ -1416,93 +1417,46 @@ FolderType=Generic
             if not save_path:
                 return
             
-            self.log_message("开始备份桌面...")
-            
-            # 生成备份文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"桌面备份_{timestamp}.zip"
-            backup_filepath = os.path.join(save_path, backup_filename)
-            
             # 创建进度窗口
-            progress_window = tk.Toplevel(self.root)
-            progress_window.title("备份进度")
-            progress_window.geometry("400x150")
-            progress_window.resizable(False, False)
-            progress_window.grab_set()
-            progress_window.transient(self.root)
-            
-            # 居中显示
-            progress_window.geometry("+%d+%d" % (self.root.winfo_rootx() + 200, self.root.winfo_rooty() + 200))
-            
-            # 进度标签
-            progress_label = tk.Label(progress_window, text="正在扫描文件...", font=("微软雅黑", 10))
-            progress_label.pack(pady=10)
+            cancel = threading.Event()
+            progress_window, progress_label, progress_bar, detail_label = self.create_progress_window(
+                "备份进度", "正在扫描文件...", on_cancel=cancel.set)
             
-            # 进度条
-            from tkinter import ttk
-            progress_bar = ttk.Progressbar(progress_window, mode='determinate')
-            progress_bar.pack(pady=10, padx=20, fill='x')
+            def on_progress(snapshot):
+                # 按字节显示进度，备份单个大文件时进度条也会持续前进
+                self.show_progress(snapshot, "正在备份", progress_label, progress_bar, detail_label)
             
-            # 详细信息标签
-            detail_label = tk.Label(progress_window, text="", font=("微软雅黑", 9), fg="#666")
-            detail_label.pack(pady=5)
-            
-            progress_window.update()
-            
-            # 先扫描所有需要备份的文件
-            all_files = []
-            for item in os.listdir(self.desktop_path):
-                item_path = os.path.join(self.desktop_path, item)
-                
-                # 跳过桌面整理文件夹
-                if item == "桌面整理":
-                    continue
-                
-                # 检查是否应该跳过
-                if self.should_skip_file(item_path, for_organize=False):
-                    continue
-                
-                if os.path.isfile(item_path):
-                    all_files.append((item_path, item))
-                elif os.path.isdir(item_path) and self.config.get("include_folders_in_backup", False):
-                    # 备份文件夹
-                    for root, dirs, files in os.walk(item_path):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            # 检查文件大小
-                            if not self.should_skip_file(file_path, for_organize=False):
-                                arcname = os.path.relpath(file_path, self.desktop_path)
-                                all_files.append((file_path, arcname))
-            
-            total_files = len(all_files)
-            progress_label.config(text=f"准备备份 {total_files} 个文件...")
-            progress_bar.config(maximum=total_files)
-            progress_window.update()
-            
-            # 创建ZIP文件
-            with zipfile.ZipFile(backup_filepath, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                backup_count = 0
-                
-                for i, (file_path, arcname) in enumerate(all_files):
-                    try:
-                        zipf.write(file_path, arcname)
-                        backup_count += 1
-                        
-                        # 更新进度
-                        progress_bar.config(value=i + 1)
-                        progress_label.config(text=f"正在备份: {os.path.basename(file_path)}")
-                        detail_label.config(text=f"已完成 {i + 1}/{total_files} 个文件")
-                        progress_window.update()
-                        
-                        self.log_message(f"备份: {os.path.basename(file_path)}")
-                    except Exception as e:
-                        self.log_message(f"备份文件失败: {os.path.basename(file_path)} - {e}")
-            
-            progress_window.destroy()
+            def on_done(result):
+                progress_window.destroy()
+                backup_filepath, backup_count = result
+                if backup_filepath is None:
+                    # 关闭续传时引擎已删除不完整的备份文件
+                    if self.config.get("resume_backup", True):
+                        messagebox.showinfo("已取消", "备份已取消\n已完成的部分已保存，下次备份到同一位置时将从中断处继续")
+                    else:
+                        messagebox.showinfo("已取消", "备份已取消\n已删除不完整的备份文件")
+                else:
+                    messagebox.showinfo("完成", f"桌面备份完成！\n文件保存至: {backup_filepath}\n共备份了 {backup_count} 个文件")
             
-            self.log_message(f"备份完成！文件保存至: {backup_filepath}")
-            self.log_message(f"共备份了 {backup_count} 个文件")
-            messagebox.showinfo("完成", f"桌面备份完成！\n文件保存至: {backup_filepath}\n共备份了 {backup_count} 个文件")
+            def on_error(e):
+                progress_window.destroy()
+                self.log_message(f"备份失败: {e}")
+                messagebox.showerror("错误", f"备份失败: {e}")
+            
+            def on_estimate(estimate):
+                # 确认后把预检结果交给备份，不再重复统计
+                if cancel.is_set() or not self.confirm_estimate(estimate, "备份"):
+                    progress_window.destroy()
+                    self.log_message("备份操作已取消")
+                    return
+                self.run_in_background(
+                    lambda post_progress: self.engine.backup(save_path, progress=post_progress, cancel=cancel,
+                                                             estimate=estimate),
+                    on_progress, on_done, on_error)
+            
+            # 预检（扫描待备份文件、剩余空间、预计耗时）在后台线程进行，界面不会卡住
+            self.run_in_background(lambda post_progress: self.engine.preflight_backup(save_path),
+                                   on_progress, on_estimate, on_error)
             
         except Exception as e:
             if 'progress_window' in locals():
@@ -1707,10 +1661,10 @@ FolderType=Generic
                     if messagebox.askyesno("确认导入", confirm_text):
                         # 更新配置
                         self.config.update(imported_config)
+                        self.engine.config_changed()
                         
                         # 保存配置
-                        with open(self.config_file, 'w', encoding='utf-8') as f:
-                            json.dump(self.config, f, ensure_ascii=False, indent=2)
+                        save_config_file(self.config, self.config_file)
                         
                         # 更新UI
                         self.ext_var.set(','.join(self.config["excluded_extensions"]))
@@ -0,0 +1,35 @@
+"""测试共用的桌面样例和辅助函数"""
+import os
+
+from cleaner import CleanerEngine, default_config
+
+
+def make_desktop(tmp_path):
+    """生成一个样例桌面，返回 (桌面路径, {相对路径: 内容})"""
+    desktop = tmp_path / "desktop"
+    (desktop / "项目").mkdir(parents=True)
+    files = {
+        "报告.docx": b"docx " * 200,
+        "photo.jpg": os.urandom(2000),
+        "song.mp3": bytes(5000),
+        "notes.txt": b"",
+        # 大于一个压缩块（1 MB），分块压缩后拼接CRC
+        "video.mp4": os.urandom(1024 * 1024) + bytes(2 * 1024 * 1024 + 123),
+        "项目/计划.txt": "计划".encode("utf-8") * 100,
+    }
+    for name, data in files.items():
+        (desktop / name).write_bytes(data)
+    return desktop, files
+
+
+def tree_contents(root):
+    """目录树中全部文件的 {相对路径: 内容}"""
+    return {os.path.relpath(os.path.join(d, n), root).replace(os.sep, "/"):
+            open(os.path.join(d, n), "rb").read()
+            for d, _, names in os.walk(root) for n in names}
+
+
+def make_engine(desktop, **options):
+    config = default_config()
+    config.update(options)
+    return CleanerEngine(config, str(desktop))
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+import zipfile
+
+import pytest
+
+from cleaner.backup import _compress_chunk, write_zip
+from cleaner.scanner import scan_path
+
+
+def _make(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return scan_path(str(path))
+
+
+def test_file_grown_after_scan_is_written_completely(tmp_path):
+    entry = _make(tmp_path / "a.txt", b"x" * 60)
+    with open(entry.path, "ab") as f:
+        f.write(b"y" * 1000)
+    archive = tmp_path / "out.zip"
+    assert write_zip(str(archive), [(entry, "a.txt")], workers=2) == 1
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.testzip() is None
+        assert zf.read("a.txt") == b"x" * 60 + b"y" * 1000
+
+
+def test_file_grown_after_planning_fails_instead_of_truncating(tmp_path):
+    entry = _make(tmp_path / "a.txt", b"x" * 60)
+    job = (0, entry, "a.txt", 0, 60, True, (zipfile.ZIP_DEFLATED, 6), None)
+    with open(entry.path, "ab") as f:
+        f.write(b"y" * 1000)
+    with pytest.raises(RuntimeError):
+        _compress_chunk(job)
+
+
+def test_grown_member_is_reported_and_left_out(tmp_path, monkeypatch):
+    entry = _make(tmp_path / "a.txt", b"x" * 60)
+    other = _make(tmp_path / "b.txt", b"z" * 10)
+    real_stat = os.stat
+
+    def stat_then_grow(path, *args, **kwargs):
+        st = real_stat(path, *args, **kwargs)
+        if path == entry.path:
+            with open(path, "ab") as f:
+                f.write(b"y" * 1000)
+        return st
+
+    monkeypatch.setattr("cleaner.backup.os.stat", stat_then_grow)
+    errors = []
+    archive = tmp_path / "out.zip"
+    written = write_zip(str(archive), [(entry, "a.txt"), (other, "b.txt")], workers=1,
+                        on_member=lambda index, e, name, error, member: errors.append(error))
+    assert written == 1
+    assert isinstance(errors[0], RuntimeError) and errors[1] is None
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.namelist() == ["b.txt"]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_chunked_crc_matches_zipfile(tmp_path, workers):
+    files = []
+    for index, size in enumerate([0, 1, 4095, 4096, 4097, 10000, 33333]):
+        data = os.urandom(size // 2) + bytes(size - size // 2)
+        files.append((_make(tmp_path / f"f{index}.bin", data), f"f{index}.bin"))
+    archive = tmp_path / "out.zip"
+    assert write_zip(str(archive), files, workers=workers, chunk_size=4096) == len(files)
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.testzip() is None
+        for entry, name in files:
+            with open(entry.path, "rb") as f:
+                assert zf.read(name) == f.read()
+
+
+def test_incremental_backup_sees_in_place_edits_with_scan_cache(tmp_path):
+    from cleaner import CleanerEngine, default_config
+
+    desktop = tmp_path / "desktop"
+    folder = desktop / "project"
+    folder.mkdir(parents=True)
+    doc = folder / "notes.txt"
+    doc.write_bytes(b"v1")
+    old = time.time() - 3600
+    for path in (doc, folder, desktop):
+        os.utime(path, (old, old))
+    config = default_config()
+    config.update(include_folders_in_backup=True, incremental_backup=True, scan_cache=True)
+    engine = CleanerEngine(config, str(desktop), scan_cache_path=str(tmp_path / "scan_cache.db"))
+    out = tmp_path / "out"
+    out.mkdir()
+    engine.backup(str(out), timestamp="20250101_000000")
+
+    # 原地改写：所在目录的修改时间不变，目录快照认为该目录没有变化
+    doc.write_bytes(b"version 2")
+    os.utime(folder, (old, old))
+
+    path, count = engine.backup(str(out), timestamp="20250101_000100")
+    assert count == 1
+    with zipfile.ZipFile(path) as zf:
+        assert [zf.read(name) for name in zf.namelist()] == [b"version 2"]
+
+
+def test_resumed_archive_matches_a_fresh_one(tmp_path):
+    from cleaner.checkpoint import BackupCheckpoint, checkpoint_path_for, partial_path_for
+
+    src = tmp_path / "src"
+    src.mkdir()
+    names = [f"{letter}.bin" for letter in "abcdef"]
+    for index, name in enumerate(names):
+        (src / name).write_bytes(os.urandom(3000 + index) + bytes(5000))
+        os.utime(src / name, (1700000000, 1700000000))
+
+    def files():
+        return [(scan_path(str(src / name)), name) for name in names]
+
+    archive = str(tmp_path / "out.zip")
+    partial = partial_path_for(archive)
+
+    def run(stop_after=None):
+        cancel = threading.Event()
+        done = []
+
+        def on_member(index, entry, name, error, member):
+            done.append(name)
+            if len(done) == stop_after:
+                cancel.set()
+
+        path = checkpoint_path_for(archive)
+        checkpoint = (BackupCheckpoint.load(path, os.path.getsize(partial), interval=0) if os.path.exists(path)
+                      else BackupCheckpoint.create(archive, "20250101_000000", None, interval=0))
+        try:
+            write_zip(partial, files(), workers=1, cancel=cancel, on_member=on_member, checkpoint=checkpoint)
+        finally:
+            checkpoint.close()
+
+    run(stop_after=4)
+    # 中断后改写中间的一个文件：之后的旧成员不能沿用，成员顺序仍与扫描顺序一致
+    (src / "c.bin").write_bytes(b"changed" * 100)
+    os.utime(src / "c.bin", (1700000100, 1700000100))
+    run(stop_after=3)
+    run()
+
+    fresh = str(tmp_path / "fresh.zip")
+    write_zip(fresh, files(), workers=1)
+    with zipfile.ZipFile(partial) as zf:
+        assert zf.testzip() is None and zf.namelist() == names
+    # 截断后继续写入，旧数据不会留在压缩包中
+    with open(partial, "rb") as a, open(fresh, "rb") as b:
+        assert a.read() == b.read()
@@ -0,0 +1,51 @@
+import json
+import os
+import threading
+
+import pytest
+
+from helpers import make_desktop, make_engine
+
+
+def _cancel_after(cancel, count):
+    """第count次进度回调时请求取消"""
+    calls = []
+
+    def progress(snapshot):
+        calls.append(snapshot)
+        if len(calls) == count:
+            cancel.set()
+    return progress
+
+
+@pytest.mark.parametrize("resume", [True, False])
+def test_cancelled_backup_keeps_partial_only_when_resumable(tmp_path, resume):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop, resume_backup=resume, backup_workers=1, progress_interval=0)
+    out = tmp_path / "out"
+    out.mkdir()
+    cancel = threading.Event()
+    path, count = engine.backup(str(out), timestamp="20250101_000000", cancel=cancel,
+                                progress=_cancel_after(cancel, 2))
+    assert path is None and count < len(files)
+    left = os.listdir(out)
+    # 界面上的提示依据同一配置：可续传时保留，否则已删除
+    if resume:
+        assert any(name.endswith(".partial") for name in left)
+    else:
+        assert left == []
+
+
+def test_cancelled_organize_records_moved_files(tmp_path):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop, move_workers=1, progress_interval=0)
+    cancel = threading.Event()
+    record = tmp_path / "record.json"
+    summary = engine.organize(str(record), timestamp="20250101_000000", cancel=cancel,
+                              progress=_cancel_after(cancel, 2))
+    assert summary["cancelled"]
+    with open(record, encoding="utf-8") as f:
+        moved = json.load(f)["files"]
+    assert 0 < len(moved) == summary["total_files"] < len(files) - 1
+    for item in moved:
+        assert os.path.exists(item["new"]) and not os.path.exists(item["original"])
@@ -0,0 +1,52 @@
+import os
+import threading
+import zipfile
+
+from cleaner.checkpoint import BackupCheckpoint, find_checkpoint, partial_path_for
+
+from helpers import make_desktop, make_engine, tree_contents
+
+
+def _cancel_after_members(cancel, count):
+    """写完count个成员后请求取消"""
+    def progress(snapshot):
+        if snapshot.items >= count:
+            cancel.set()
+    return progress
+
+
+def test_resume_after_cancel_with_changed_and_deleted_files(tmp_path):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop, include_folders_in_backup=True, resume_backup=True, backup_workers=1,
+                         backup_checkpoint_interval=0, progress_interval=0)
+    out = tmp_path / "out"
+    out.mkdir()
+    cancel = threading.Event()
+    path, _ = engine.backup(str(out), timestamp="20250101_000000", cancel=cancel,
+                            progress=_cancel_after_members(cancel, 3))
+    assert path is None
+
+    archive_path, checkpoint_path = find_checkpoint(str(out))
+    checkpoint = BackupCheckpoint.load(checkpoint_path, os.path.getsize(partial_path_for(archive_path)))
+    checkpoint.close()
+    done = sorted(checkpoint.completed)
+    assert 2 <= len(done) < len(files)
+
+    # 已写入压缩包的一个文件被修改，另一个被删除
+    changed, deleted = done[0], done[1]
+    files[changed] = b"changed after cancel"
+    (desktop / changed).write_bytes(files[changed])
+    os.remove(desktop / deleted)
+    del files[deleted]
+
+    path, count = engine.backup(str(out))
+    assert path == archive_path and count == len(files)
+    assert not os.path.exists(partial_path_for(archive_path)) and not os.path.exists(checkpoint_path)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == sorted(files)
+
+    dest = tmp_path / "restored"
+    restored, missing = engine.restore_backup(path, str(dest))
+    assert (restored, missing) == (len(files), [])
+    assert tree_contents(dest) == files
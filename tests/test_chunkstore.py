@@ -0,0 +1,84 @@
+import io
+import os
+import random
+
+from cleaner.chunkstore import ChunkStore, iter_chunks
+
+from helpers import make_desktop, make_engine, tree_contents
+
+
+def _random_bytes(size, seed):
+    return random.Random(seed).randbytes(size)
+
+
+def test_chunk_boundaries_follow_content():
+    data = _random_bytes(3 * 1024 * 1024, 1)
+    chunks = list(iter_chunks(io.BytesIO(data), min_size=4096, avg_bits=12, max_size=65536))
+    assert b"".join(chunks) == data
+    assert all(4096 <= len(chunk) <= 65536 for chunk in chunks[:-1])
+    # 开头插入数据后，只有附近的块变化，其余块仍能去重
+    shifted = list(iter_chunks(io.BytesIO(b"inserted" + data), min_size=4096, avg_bits=12, max_size=65536))
+    assert len(set(chunks) & set(shifted)) >= len(chunks) - 3
+
+
+def _referenced(store):
+    return {digest for snapshot_id in store.list_snapshots()
+            for _, _, digests in store.load_snapshot(snapshot_id)["files"].values() for digest in digests}
+
+
+def _stored(store):
+    return {name for sub in os.listdir(os.path.join(store.root, "chunks"))
+            for name in os.listdir(os.path.join(store.root, "chunks", sub))}
+
+
+def test_store_round_trip_and_dedup(tmp_path):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop, include_folders_in_backup=True)
+    store_dir = str(tmp_path / "store")
+    first, stats = engine.backup_to_store(store_dir, timestamp="20250101_000000")
+    assert stats["files"] == len(files) and stats["errors"] == 0
+
+    # 未变化的文件沿用块列表；内容重复的新文件几乎不写入新数据
+    (desktop / "copy.mp4").write_bytes(files["video.mp4"])
+    second, stats = engine.backup_to_store(store_dir, timestamp="20250102_000000")
+    assert stats["reused"] == len(files)
+    assert stats["stored_bytes"] < 64 * 1024
+
+    for snapshot_id, expected in ((first, files), (second, dict(files, **{"copy.mp4": files["video.mp4"]}))):
+        dest = tmp_path / f"restore_{snapshot_id}"
+        restored, missing = engine.restore_backup(store_dir, str(dest), at=snapshot_id)
+        assert (restored, missing) == (len(expected), [])
+        assert tree_contents(dest) == expected
+
+
+def test_prune_keeps_chunks_of_live_snapshots(tmp_path):
+    desktop = tmp_path / "desktop"
+    desktop.mkdir()
+    engine = make_engine(desktop)
+    store_dir = str(tmp_path / "store")
+    shared = _random_bytes(600 * 1024, 2)
+    (desktop / "shared.bin").write_bytes(shared)
+    (desktop / "old.bin").write_bytes(_random_bytes(600 * 1024, 3))
+    engine.backup_to_store(store_dir, timestamp="20250101_000000")
+    os.remove(desktop / "old.bin")
+    (desktop / "new.bin").write_bytes(_random_bytes(600 * 1024, 4))
+    engine.backup_to_store(store_dir, timestamp="20250102_000000")
+
+    store = ChunkStore(store_dir)
+    old_only = set(store.load_snapshot("20250101_000000")["files"]["old.bin"][2])
+    live = set(store.load_snapshot("20250102_000000")["files"]["shared.bin"][2])
+    # 中断留下的临时文件也会被清理
+    tmp_chunk = store.chunk_path("ab" * 32) + ".1.tmp"
+    os.makedirs(os.path.dirname(tmp_chunk), exist_ok=True)
+    open(tmp_chunk, "wb").close()
+
+    expired, removed, freed = engine.prune_store(store_dir, keep=1)
+    assert expired == 1 and removed == len(old_only - live) + 1 and freed > 0
+    store = ChunkStore(store_dir)
+    assert store.list_snapshots() == ["20250102_000000"]
+    assert _stored(store) == _referenced(store)
+    assert live <= _stored(store) and not (old_only - live) & _stored(store)
+
+    dest = tmp_path / "restored"
+    engine.restore_backup(store_dir, str(dest))
+    assert tree_contents(dest) == {"shared.bin": shared, "new.bin": (desktop / "new.bin").read_bytes()}
@@ -0,0 +1,59 @@
+import os
+
+from cleaner.classifier import CategoryClassifier
+from cleaner.config import default_config
+from cleaner.scanner import Entry
+
+
+def _file(name, size=10):
+    return Entry(name, os.path.join("/desktop", name), False, size, 0.0, 0)
+
+
+def _naive_category(config, name):
+    """旧版逐个分类查找扩展名的实现（单段扩展名）"""
+    ext = os.path.splitext(name)[1].lower()
+    for category, info in config["categories"].items():
+        if ext in info["extensions"]:
+            return category
+    return next((category for category in config["categories"] if "其他" in category), "📁 其他")
+
+
+def test_index_agrees_with_linear_lookup():
+    config = default_config()
+    classifier = CategoryClassifier(config)
+    names = ["a.TXT", "b.jpg", "c.Pdf", "d", ".bashrc", "e.unknown", "f.tar.gz", "g.mp4", "archive.zip"]
+    names += [f"x{ext}" for info in config["categories"].values() for ext in info["extensions"]]
+    entries = [_file(name) for name in names]
+    expected = [_naive_category(config, name) for name in names]
+    assert classifier.classify(entries) == expected
+    assert [classifier.category_of(entry) for entry in entries] == expected
+
+
+def test_multi_part_and_duplicate_extensions():
+    config = default_config()
+    config["categories"] = {
+        "压缩": {"extensions": [".gz", ".zip"]},
+        "源码包": {"extensions": ["TAR.GZ"]},
+        "重复": {"extensions": [".zip"]},
+        "📁 其他": {"extensions": []},
+    }
+    config["excluded_extensions"] = [".part.tmp", ".LNK"]
+    classifier = CategoryClassifier(config)
+    # 最长扩展名优先，大小写不敏感；重复的扩展名取靠前的分类
+    assert classifier.classify(["a.tar.gz", "b.GZ", "c.zip", "d.txt"]) == ["源码包", "压缩", "压缩", "📁 其他"]
+    assert classifier.is_excluded("x.part.tmp") and classifier.is_excluded("y.lnk")
+    assert not classifier.is_excluded("z.tmp")
+
+
+def test_should_skip_uses_record_fields():
+    config = default_config()
+    config["max_file_size_mb"] = 1
+    config["excluded_extensions"] = [".lnk"]
+    classifier = CategoryClassifier(config)
+    assert classifier.should_skip(_file("big.bin", 2 * 1024 * 1024))
+    assert classifier.should_skip(_file("App.LNK"))
+    assert not classifier.should_skip(_file("small.bin", 1024))
+    folder = Entry("dir", "/desktop/dir", True, 0, 0.0, 0)
+    assert classifier.should_skip(folder, for_organize=True)
+    config["include_folders_in_organize"] = True
+    assert not CategoryClassifier(config).should_skip(folder, for_organize=True)
@@ -0,0 +1,39 @@
+import argparse
+import json
+import os
+
+from cleaner.cli import _record_path_for, main
+
+
+def test_same_named_directories_get_separate_records(tmp_path):
+    desktops = []
+    for parent in ("a", "b"):
+        desktop = tmp_path / parent / "Desktop"
+        desktop.mkdir(parents=True)
+        (desktop / f"{parent}.txt").write_text(parent)
+        desktops.append(desktop)
+    records = tmp_path / "records"
+    config = tmp_path / "config.json"
+    # 两个目录在同一秒内整理，记录文件名不能相同
+    argv = ["--config", str(config), "-q", "organize", *map(str, desktops), "--record-dir", str(records)]
+    assert main(argv) == 0
+    names = sorted(os.listdir(records))
+    assert len(names) == 2
+    originals = set()
+    for name in names:
+        with open(records / name, encoding="utf-8") as f:
+            originals.update(os.path.basename(item["original"]) for item in json.load(f)["files"])
+    assert originals == {"a.txt", "b.txt"}
+
+    # 同一目录在同一秒内再次整理时追加序号，不覆盖已有记录
+    args = argparse.Namespace(record=None, record_dir=str(records))
+    first = _record_path_for(args, str(desktops[0]), "20250101_000000")
+    assert first != _record_path_for(args, str(desktops[1]), "20250101_000000")
+    open(first, "w").close()
+    assert _record_path_for(args, str(desktops[0]), "20250101_000000") == first[:-len(".json")] + "_2.json"
+    os.remove(first)
+
+    for name in names:
+        desktop = desktops[0] if "a.txt" in (records / name).read_text(encoding="utf-8") else desktops[1]
+        assert main(["--config", str(config), "-q", "restore", str(records / name), "--desktop", str(desktop)]) == 0
+    assert (desktops[0] / "a.txt").exists() and (desktops[1] / "b.txt").exists()
@@ -0,0 +1,107 @@
+import os
+import random
+import zipfile
+
+import pytest
+
+from cleaner.backup import write_zip
+from cleaner.classifier import CategoryClassifier
+from cleaner.compression import (STORED, CompressionPolicy, LZMACompressor, LZMADecompressor, parse_method)
+from cleaner.scanner import scan_path
+from cleaner.verify import verify_archive
+
+TEXT = "整理桌面 organize the desktop\n".encode("utf-8") * 4000
+
+
+def _policy(**specs):
+    categories = {
+        "存储": {"extensions": [".sto"]},
+        "DEFLATE": {"extensions": [".def"]},
+        "BZIP2": {"extensions": [".bz"]},
+        "LZMA": {"extensions": [".xz"]},
+        "图片": {"extensions": [".jpg"]},
+        "其他": {"extensions": []},
+    }
+    for name, spec in specs.items():
+        categories[name]["compression"] = spec
+    config = {"categories": categories, "max_file_size_mb": 1024}
+    return CompressionPolicy(config, CategoryClassifier(config), level=6)
+
+
+def test_parse_method():
+    assert parse_method("auto", 6) is None
+    assert parse_method("store", 6) == STORED
+    assert parse_method("deflate", 6) == (zipfile.ZIP_DEFLATED, 6)
+    assert parse_method("Deflate:9", 6) == (zipfile.ZIP_DEFLATED, 9)
+    assert parse_method("bzip2", 6) == (zipfile.ZIP_BZIP2, 9)
+    assert parse_method("lzma", 6) == (zipfile.ZIP_LZMA, None)
+    for spec in ("deflate:0", "deflate:10", "zstd"):
+        with pytest.raises(ValueError):
+            parse_method(spec, 6)
+
+
+def test_each_policy_sets_compress_type_and_round_trips(tmp_path):
+    policy = _policy(**{"存储": "store", "DEFLATE": "deflate:9", "BZIP2": "bzip2", "LZMA": "lzma"})
+    noise = random.Random(7).randbytes(200 * 1024)
+    contents = {
+        "a.sto": TEXT,
+        "b.def": TEXT,
+        "c.bz": TEXT,
+        "d.xz": TEXT,
+        "e.txt": TEXT,  # auto：文本可压缩
+        "f.bin": noise,  # auto：高熵内容
+        "g.jpg": TEXT,  # auto：已压缩格式的扩展名
+        "空.xz": b"",
+    }
+    expected = {
+        "a.sto": zipfile.ZIP_STORED,
+        "b.def": zipfile.ZIP_DEFLATED,
+        "c.bz": zipfile.ZIP_BZIP2,
+        "d.xz": zipfile.ZIP_LZMA,
+        "e.txt": zipfile.ZIP_DEFLATED,
+        "f.bin": zipfile.ZIP_STORED,
+        "g.jpg": zipfile.ZIP_STORED,
+        "空.xz": zipfile.ZIP_LZMA,
+    }
+    files = []
+    for name, data in contents.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        files.append((scan_path(str(path)), name))
+
+    archive = str(tmp_path / "out.zip")
+    # 小分块让DEFLATE成员走分块并行压缩
+    assert write_zip(archive, files, workers=4, chunk_size=64 * 1024, policy=policy) == len(files)
+    with zipfile.ZipFile(archive) as zf:
+        assert {info.filename: info.compress_type for info in zf.infolist()} == expected
+        assert zf.testzip() is None
+        assert {name: zf.read(name) for name in zf.namelist()} == contents
+    result = verify_archive(archive)
+    assert result["errors"] == [] and result["members"] == len(files)
+
+
+def test_lzma_codec_matches_zipfile(tmp_path):
+    # 属性头与zipfile写出的一致，两者的LZMA数据都能解压
+    compressor = LZMACompressor()
+    packed = compressor.compress(TEXT[:1000]) + compressor.compress(TEXT[1000:]) + compressor.flush()
+    archive = tmp_path / "z.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_LZMA) as zf:
+        zf.writestr("x", TEXT)
+    with zipfile.ZipFile(archive) as zf:
+        info = zf.getinfo("x")
+        with open(archive, "rb") as f:
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = int.from_bytes(f.read(2), "little"), int.from_bytes(f.read(2), "little")
+            f.seek(name_len + extra_len, os.SEEK_CUR)
+            written = f.read(info.compress_size)
+    assert packed[:9] == written[:9]
+
+    for data in (packed, written):
+        decompressor = LZMADecompressor()
+        out = b""
+        # 属性头分几次送入，且限制每次输出的大小
+        for i in range(0, len(data), 3):
+            out += decompressor.decompress(data[i:i + 3], 4096)
+            while not decompressor.eof and not decompressor.needs_input:
+                out += decompressor.decompress(b"", 4096)
+        assert decompressor.eof and out == TEXT
@@ -0,0 +1,83 @@
+import os
+import subprocess
+
+import pytest
+
+from cleaner.decoration import (DESKTOP_INI, HIDDEN_SYSTEM, FolderDecorator, NullAttributes, attribute_backend,
+                                desktop_ini_content)
+
+INFO = {"icon": "📄", "extensions": [".txt"]}
+
+
+class RecordingAttributes(NullAttributes):
+    """在内存中保存属性并记录每次写入"""
+
+    def __init__(self):
+        self.attributes = {}
+        self.writes = []
+
+    def get(self, path):
+        return self.attributes.get(path, 0)
+
+    def _set(self, path, attributes):
+        self.writes.append((os.path.basename(path), attributes))
+        self.attributes[path] = attributes
+
+
+@pytest.fixture
+def no_subprocess(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("不应再启动attrib进程")
+
+    for name in ("run", "call", "Popen", "check_call", "check_output"):
+        monkeypatch.setattr(subprocess, name, fail)
+
+
+def test_flush_writes_once_and_sets_attributes_in_process(tmp_path, no_subprocess):
+    backend = RecordingAttributes()
+    decorator = FolderDecorator(backend, log=pytest.fail)
+    folders = [tmp_path / name for name in ("文档", "图片")]
+    for folder in folders:
+        folder.mkdir()
+        decorator.queue(str(folder), INFO)
+        decorator.queue(str(folder), INFO)
+    assert decorator.flush() == (2, 0)
+    for folder in folders:
+        ini = str(folder / DESKTOP_INI)
+        assert open(ini, encoding="utf-8").read() == desktop_ini_content(INFO)
+        assert backend.get(ini) == HIDDEN_SYSTEM
+    writes = len(backend.writes)
+
+    # 内容未变的文件夹不再写入
+    for folder in folders:
+        decorator.queue(str(folder), INFO)
+    assert decorator.flush() == (0, 2)
+    assert len(backend.writes) == writes
+
+
+def test_existing_and_modified_desktop_ini(tmp_path):
+    backend = RecordingAttributes()
+    folder = tmp_path / "文档"
+    folder.mkdir()
+    ini = folder / DESKTOP_INI
+    ini.write_text(desktop_ini_content(INFO), encoding="utf-8")
+    decorator = FolderDecorator(backend)
+    decorator.queue(str(folder), INFO)
+    # 已有相同内容：只补齐属性
+    assert decorator.flush() == (0, 1)
+    assert backend.get(str(ini)) == HIDDEN_SYSTEM
+
+    ini.write_text("被其他程序改写", encoding="utf-8")
+    decorator.queue(str(folder), INFO)
+    assert decorator.flush() == (1, 0)
+    assert ini.read_text(encoding="utf-8") == desktop_ini_content(INFO)
+
+    decorator.undecorate(str(folder))
+    assert not ini.exists() and backend.get(str(ini)) == 0
+
+
+def test_attribute_backend_names():
+    assert isinstance(attribute_backend("none"), NullAttributes)
+    assert attribute_backend("auto").name in ("windows", "xattr", "none")
+    with pytest.raises(ValueError):
+        attribute_backend("attrib.exe")
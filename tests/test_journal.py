@@ -0,0 +1,85 @@
+import json
+import os
+
+from cleaner.journal import JOURNAL_SUFFIX, OrganizeJournal, iter_journal, journal_path_for
+
+from helpers import make_desktop, make_engine, tree_contents
+
+
+def _lines(path):
+    """读取日志中已写完的行（其他线程可能正在追加）"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.endswith("\n")]
+
+
+def test_intent_is_on_disk_before_each_move(tmp_path, monkeypatch):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop, journal_batch_size=2)
+    record = tmp_path / "record.json"
+    journal = journal_path_for(str(record))
+    real_move = engine.move_item
+    checked = []
+
+    def move_item(entry, dest_path, *args, **kwargs):
+        # 移动开始时意图已写入日志文件（已flush，进程此时退出也能恢复）
+        intents = {obj["original"]: obj["new"] for obj in _lines(journal) if "original" in obj}
+        assert intents[entry.path] == dest_path
+        checked.append(entry.name)
+        return real_move(entry, dest_path, *args, **kwargs)
+
+    monkeypatch.setattr(engine, "move_item", move_item)
+    summary = engine.organize(str(record), timestamp="20250101_000000")
+    assert len(checked) == summary["total_files"] > 2
+    # 完成后日志转换为整理记录并删除
+    assert not os.path.exists(journal) and journal.endswith(JOURNAL_SUFFIX)
+    with open(record, encoding="utf-8") as f:
+        assert len(json.load(f)["files"]) == summary["total_files"]
+
+
+def test_failed_moves_are_left_out_of_the_record(tmp_path, monkeypatch):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop)
+    real_move = engine.move_item
+
+    def move_item(entry, dest_path, *args, **kwargs):
+        if entry.name == "song.mp3":
+            raise OSError("文件被占用")
+        return real_move(entry, dest_path, *args, **kwargs)
+
+    monkeypatch.setattr(engine, "move_item", move_item)
+    record, legacy = tmp_path / "record.json", tmp_path / "backup_record.json"
+    summary = engine.organize(str(record), legacy_record_path=str(legacy), timestamp="20250101_000000")
+    with open(record, encoding="utf-8") as f:
+        saved = json.load(f)
+    with open(legacy, encoding="utf-8") as f:
+        assert json.load(f) == saved["files"]
+    names = [os.path.basename(item["original"]) for item in saved["files"]]
+    assert "song.mp3" not in names and len(names) == summary["total_files"] == saved["total_files"]
+    assert (desktop / "song.mp3").exists()
+
+
+def test_iter_journal_ignores_torn_last_line(tmp_path):
+    path = str(tmp_path / ("x" + JOURNAL_SUFFIX))
+    journal = OrganizeJournal(path, "20250101_000000", "/desktop", ["文档"])
+    journal.record_move(0, "/desktop/a", "/desktop/文档/a", "文档")
+    journal.record_move(1, "/desktop/b", "/desktop/文档/b", "文档")
+    journal.record_failure(0)
+    journal.sync()
+    journal._file.write('{"i": 2, "orig')
+    journal.close()
+    header, summary, entries = iter_journal(path)
+    assert header["created_folders"] == ["文档"] and summary is None
+    assert [item["original"] for item in entries] == ["/desktop/b"]
+
+
+def test_organize_then_restore(tmp_path):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop)
+    record = tmp_path / "record.json"
+    summary = engine.organize(str(record), timestamp="20250101_000000")
+    assert summary["total_files"] > 0
+    assert not (desktop / "photo.jpg").exists()
+
+    result = engine.restore(str(record))
+    assert result["restored_count"] == summary["total_files"]
+    assert tree_contents(desktop) == files
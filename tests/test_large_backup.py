@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from helpers import make_desktop, make_engine, tree_contents
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_backup_round_trip(tmp_path, workers):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop, include_folders_in_backup=True, backup_workers=workers, backup_verify=True)
+    out = tmp_path / "out"
+    out.mkdir()
+    path, count = engine.backup(str(out), timestamp="20250101_000000")
+    assert count == len(files)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+
+    dest = tmp_path / "restored"
+    restored, missing = engine.restore_backup(str(out), str(dest))
+    assert (restored, missing) == (len(files), [])
+    assert tree_contents(dest) == files
+
+
+def test_backup_round_trip_with_zip64(tmp_path, monkeypatch):
+    # 降低ZIP64阈值，用小文件覆盖ZIP64扩展字段和ZIP64结束记录
+    monkeypatch.setattr("cleaner.zipwriter.ZIP64_LIMIT", 1000)
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop, include_folders_in_backup=True)
+    out = tmp_path / "out"
+    out.mkdir()
+    path, count = engine.backup(str(out), timestamp="20250101_000000")
+    assert count == len(files)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert {name: zf.read(name) for name in zf.namelist()} == files
+        # 超过阈值的成员写入了ZIP64扩展字段
+        assert any(info.extract_version >= 45 for info in zf.infolist())
+
+    dest = tmp_path / "restored"
+    engine.restore_backup(path, str(dest))
+    assert tree_contents(dest) == files
+
+
+def _run_bigfile(tmp_path, size_gb, memory_limit_mb):
+    # 在子进程中运行基准场景：地址空间限制只作用于该进程
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "benchmark.py"), "bigfile", "--root", str(tmp_path),
+                             "--size-gb", str(size_gb), "--memory-limit", str(memory_limit_mb), "--verify"],
+                            cwd=ROOT, capture_output=True, text=True, encoding="utf-8")
+    assert result.returncode == 0, result.stderr
+    assert "正确" in result.stdout and "错误" not in result.stdout
+    assert "解压校验CRC通过" in result.stdout
+
+
+def test_sparse_file_larger_than_memory_limit(tmp_path):
+    pytest.importorskip("resource")
+    # 文件比地址空间上限还大，整体读入内存就会失败
+    _run_bigfile(tmp_path, 0.5, 384)
+
+
+@pytest.mark.skipif(not os.environ.get("CLEANER_BIGFILE_TEST"),
+                    reason="耗时较长，设置环境变量CLEANER_BIGFILE_TEST=1后运行")
+def test_sparse_bigfile_backup_under_memory_limit(tmp_path):
+    pytest.importorskip("resource")
+    # 超过4 GB，覆盖真实的ZIP64成员
+    _run_bigfile(tmp_path, os.environ.get("CLEANER_BIGFILE_GB", "10"), 1024)
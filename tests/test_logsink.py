@@ -0,0 +1,48 @@
+import pytest
+
+from cleaner.logsink import LogSink, repeat_key
+
+
+def test_consecutive_per_file_lines_are_counted():
+    sink = LogSink()
+    sink.append("开始整理桌面...", "10:00:00")
+    for index in range(1234):
+        sink.append(f"移动文件: f{index}.txt -> 📄 文档", "10:00:01")
+    sink.append("移动文件: a.jpg -> 🖼️ 图片", "10:00:02")
+    sink.append("整理完成！", "10:00:03")
+    replace_last, lines = sink.drain()
+    assert not replace_last
+    assert lines == ["[10:00:00] 开始整理桌面...\n", "[10:00:01] 移动了 1,234 个文件 → 📄 文档\n",
+                     "[10:00:02] 移动文件: a.jpg -> 🖼️ 图片\n", "[10:00:03] 整理完成！\n"]
+    assert sink.drain() == (False, [])
+
+
+def test_count_continues_across_drains():
+    sink = LogSink()
+    for index in range(3):
+        sink.append(f"备份: f{index}", "10:00:00")
+    assert sink.drain() == (False, ["[10:00:00] 备份了 3 个文件\n"])
+    sink.append("备份: f3", "10:00:01")
+    # 替换界面上已显示的最后一行，而不是再输出一行
+    assert sink.drain() == (True, ["[10:00:01] 备份了 4 个文件\n"])
+
+
+def test_overflow_drops_oldest_lines():
+    sink = LogSink(capacity=10)
+    for index in range(25):
+        sink.append(f"消息{index}", "10:00:00")
+    _, lines = sink.drain()
+    assert lines[0] == "[10:00:00] ... 省略了 15 条日志\n"
+    assert lines[1:] == [f"[10:00:00] 消息{index}\n" for index in range(15, 25)]
+    assert repeat_key("恢复: a.txt") == ("恢复了 {count:,} 个文件",)
+
+
+def test_simplify_keeps_table_order_precedence():
+    pytest.importorskip("tkinter")
+    from desktop_cleaner import simplify_log_message
+
+    # 同时包含多个可简化的片段时按表中顺序，而不是按在消息中出现的位置
+    assert simplify_log_message("备份完成，桌面整理完成") == "整理完成"
+    assert simplify_log_message("开始从记录文件恢复桌面: x.json") == "开始恢复"
+    assert simplify_log_message("x" * 60) == "x" * 47 + "..."
+    assert simplify_log_message("短消息") == "短消息"
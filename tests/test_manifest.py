@@ -0,0 +1,67 @@
+import os
+import zipfile
+
+from cleaner.manifest import plan_incremental
+from cleaner.scanner import scan_path
+from cleaner.transfer import file_digest
+
+from helpers import make_engine, tree_contents
+
+
+def test_plan_accepts_a_generator_with_hashing(tmp_path):
+    names = ["a.txt", "b.txt", "c.txt", "d.txt"]
+    for name in names:
+        (tmp_path / name).write_bytes(name.encode() * 10)
+    previous = {"files": {}}
+    for name in names:
+        entry = scan_path(str(tmp_path / name))
+        previous["files"][name] = [entry.size, entry.mtime, "old.zip", file_digest(entry.path).hex()]
+    # a只是被触碰（内容不变），c内容改变但大小不变，d已删除，e为新文件
+    os.utime(tmp_path / "a.txt", (1, 1))
+    (tmp_path / "c.txt").write_bytes(b"C" * 50)
+    os.utime(tmp_path / "c.txt", (2, 2))
+    os.remove(tmp_path / "d.txt")
+    (tmp_path / "e.txt").write_bytes(b"new")
+    current = ["a.txt", "b.txt", "c.txt", "e.txt"]
+
+    plan = plan_incremental(((scan_path(str(tmp_path / name)), name) for name in current), previous,
+                            use_hash=True, workers=2)
+    assert [name for _, name in plan.to_write] == ["c.txt", "e.txt"]
+    assert sorted(plan.kept) == ["a.txt", "b.txt"] and plan.kept["a.txt"][1] == 1
+    assert plan.deleted == ["d.txt"]
+
+
+def test_point_in_time_restore_through_incremental_chain(tmp_path):
+    desktop = tmp_path / "desktop"
+    desktop.mkdir()
+    engine = make_engine(desktop, incremental_backup=True)
+    out = tmp_path / "out"
+    out.mkdir()
+    states = {}
+
+    def backup(timestamp):
+        engine.backup(str(out), timestamp=timestamp)
+        states[timestamp] = tree_contents(desktop)
+
+    (desktop / "keep.txt").write_bytes(b"keep")
+    (desktop / "edit.txt").write_bytes(b"v1")
+    (desktop / "gone.txt").write_bytes(b"gone")
+    backup("20250101_000000")
+    (desktop / "edit.txt").write_bytes(b"version 2")
+    os.remove(desktop / "gone.txt")
+    (desktop / "new.txt").write_bytes(b"new")
+    backup("20250102_000000")
+    (desktop / "edit.txt").write_bytes(b"version three")
+    backup("20250103_000000")
+
+    archives = sorted((name.rsplit("_", 2)[-2:], name) for name in os.listdir(out) if name.endswith(".zip"))
+    assert len(archives) == 3
+    # 增量备份只包含变化的文件
+    with zipfile.ZipFile(out / archives[-1][1]) as zf:
+        assert zf.namelist() == ["edit.txt"]
+
+    for timestamp, expected in states.items():
+        dest = tmp_path / f"restore_{timestamp}"
+        restored, missing = engine.restore_backup(str(out), str(dest), at=timestamp)
+        assert missing == [] and restored == len(expected)
+        assert tree_contents(dest) == expected
@@ -0,0 +1,57 @@
+import os
+import threading
+
+from cleaner.mover import DestinationNamer, NameIndex
+
+
+def _probe(directory, name, is_dir, taken):
+    """旧版逐个os.path.exists探测的命名方式"""
+    stem, ext = (name, "") if is_dir else os.path.splitext(name)
+    candidate, counter = name, 1
+    while os.path.exists(os.path.join(directory, candidate)) or candidate in taken:
+        candidate = f"{stem}_{counter}{ext}"
+        counter += 1
+    taken.add(candidate)
+    return candidate
+
+
+def test_name_index_matches_probing(tmp_path):
+    for name in ("a.txt", "a_1.txt", "a_3.txt", "dir", "dir_1", "b"):
+        (tmp_path / name).write_text("")
+    index = NameIndex(str(tmp_path), case_insensitive=False)
+    taken = set()
+    claims = [("a.txt", False)] * 4 + [("dir", True)] * 2 + [("b", False), ("c.txt", False), ("a_2.txt", False)]
+    for name, is_dir in claims:
+        assert index.claim(name, is_dir) == _probe(str(tmp_path), name, is_dir, taken)
+
+
+def test_case_insensitive_index(tmp_path):
+    (tmp_path / "Report.PDF").write_text("")
+    index = NameIndex(str(tmp_path), case_insensitive=True)
+    assert index.claim("report.pdf", False) == "report_1.pdf"
+    assert NameIndex(str(tmp_path / "missing")).claim("x", False) == "x"
+
+
+def test_namer_lists_each_directory_once_and_is_thread_safe(tmp_path, monkeypatch):
+    (tmp_path / "same.txt").write_text("")
+    listed = []
+    real_listdir = os.listdir
+    monkeypatch.setattr(os, "listdir", lambda path: listed.append(path) or real_listdir(path))
+    namer = DestinationNamer(case_insensitive=False)
+    dest = os.path.join(str(tmp_path), "same.txt")
+    results = []
+    lock = threading.Lock()
+
+    def claim():
+        path = namer.claim(dest, False)
+        with lock:
+            results.append(path)
+
+    threads = [threading.Thread(target=claim) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == 50 and dest not in results
+    assert listed == [str(tmp_path)]
+
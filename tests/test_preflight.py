@@ -0,0 +1,44 @@
+import os
+import zipfile
+
+from cleaner import CleanerEngine, default_config
+
+
+def _engine(tmp_path, names):
+    desktop = tmp_path / "desktop"
+    desktop.mkdir()
+    for name in names:
+        (desktop / name).write_bytes(b"data " * 100)
+    return CleanerEngine(default_config(), str(desktop))
+
+
+def test_organize_uses_confirmed_estimate_without_rescanning(tmp_path, monkeypatch):
+    engine = _engine(tmp_path, ["a.txt", "b.jpg", "c.mp3"])
+    estimate = engine.preflight_organize()
+    assert estimate.items == 3
+
+    def no_scan():
+        raise AssertionError("确认过的预检结果不应再扫描桌面")
+
+    monkeypatch.setattr(engine, "scan_desktop", no_scan)
+    monkeypatch.setattr(engine, "_estimate_organize", lambda plan: no_scan())
+    summary = engine.organize(str(tmp_path / "record.json"), estimate=estimate)
+    assert summary["total_files"] == 3
+    assert sorted(os.listdir(engine.desktop_path)) == sorted({c for _, c in estimate.plan[1]})
+
+
+def test_backup_uses_confirmed_estimate(tmp_path, monkeypatch):
+    engine = _engine(tmp_path, ["a.txt", "b.txt"])
+    out = tmp_path / "out"
+    out.mkdir()
+    estimate = engine.preflight_backup(str(out))
+    assert estimate.items == 2
+
+    def no_estimate(*args, **kwargs):
+        raise AssertionError("确认过的预检结果不应再重新统计")
+
+    monkeypatch.setattr(engine, "_estimate_backup", no_estimate)
+    path, count = engine.backup(str(out), timestamp="t1", estimate=estimate)
+    assert count == 2
+    with zipfile.ZipFile(path) as zf:
+        assert sorted(zf.namelist()) == ["a.txt", "b.txt"]
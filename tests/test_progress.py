@@ -0,0 +1,92 @@
+import pytest
+
+from cleaner.progress import ProgressTracker, describe, format_bytes, format_duration
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _tracker(**options):
+    clock = FakeClock()
+    snapshots = []
+    tracker = ProgressTracker(snapshots.append, clock=clock, **options)
+    return tracker, clock, snapshots
+
+
+def test_callbacks_are_throttled_but_start_and_finish_always_fire():
+    tracker, clock, snapshots = _tracker(interval=1.0)
+    tracker.start(10, 1000)
+    assert len(snapshots) == 1
+    for _ in range(5):
+        clock.now += 0.1
+        tracker.advance(1, 10)
+    # 不到1秒，没有新的回调，但计数照常累计
+    assert len(snapshots) == 1 and tracker.items == 5
+    clock.now += 0.6
+    tracker.advance(1, 10, "f.txt")
+    assert len(snapshots) == 2 and snapshots[-1].items == 6 and snapshots[-1].name == "f.txt"
+    tracker.finish()
+    assert len(snapshots) == 3 and snapshots[-1].finished and snapshots[-1].eta == 0.0
+
+
+def test_rate_and_eta_from_steady_throughput():
+    tracker, clock, snapshots = _tracker(interval=0.5, smoothing=3.0)
+    tracker.start(0, 10000)
+    for _ in range(10):
+        clock.now += 0.5
+        tracker.advance(1, 250)
+    last = snapshots[-1]
+    # 每秒500字节，稳定时平滑后的速率不变
+    assert last.byte_rate == pytest.approx(500)
+    assert last.eta == pytest.approx((10000 - 2500) / 500)
+    assert last.fraction == pytest.approx(0.25)
+
+
+def test_eta_waits_for_warmup_and_rate_is_smoothed():
+    tracker, clock, snapshots = _tracker(interval=0.5, smoothing=3.0)
+    tracker.start(0, 100000)
+    clock.now += 0.5
+    tracker.advance(nbytes=500)
+    # 第一个采样直接作为速率，但开始不足1秒不给出剩余时间
+    assert snapshots[-1].byte_rate == pytest.approx(1000) and snapshots[-1].eta is None
+    clock.now += 0.5
+    tracker.advance(nbytes=5000)
+    # 速率突然变为10000字节/秒，平滑后只向它靠近一部分
+    assert 1000 < snapshots[-1].byte_rate < 10000
+    assert snapshots[-1].eta is not None
+
+
+def test_fraction_falls_back_to_items_and_unknown_totals():
+    tracker, clock, snapshots = _tracker(interval=0)
+    tracker.start(4, 0)
+    tracker.update(items=1)
+    assert snapshots[-1].fraction == pytest.approx(0.25)
+    tracker.start()
+    tracker.advance(3)
+    assert snapshots[-1].fraction is None
+    tracker.finish()
+    assert snapshots[-1].fraction == 1.0
+
+
+def test_describe():
+    tracker, clock, snapshots = _tracker(interval=0.5, smoothing=0)
+    tracker.start(300, 3 * 1024 * 1024)
+    clock.now += 2
+    tracker.update(120, 1024 * 1024)
+    assert describe(snapshots[-1], "个") == "33% · 1.0 MB / 3.0 MB · 120/300 个 · 512.0 KB/s · 剩余 0:04"
+    clock.now += 4
+    tracker.finish()
+    assert describe(snapshots[-1]) == "33% · 1.0 MB / 3.0 MB · 120/300 个 · 用时 0:06"
+
+
+def test_formatting():
+    assert format_bytes(512) == "512 B"
+    assert format_bytes(1536) == "1.5 KB"
+    assert format_bytes(3 * 1024 ** 4) == "3.0 TB"
+    assert format_duration(59.6) == "1:00"
+    assert format_duration(3725) == "1:02:05"
@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+from cleaner.journal import OrganizeJournal, iter_journal, journal_path_for
+from cleaner.records import RecordReader
+
+from helpers import make_desktop, make_engine, tree_contents
+
+
+def _crashed_journal(path):
+    """模拟进程中途退出：有失败标记，没有结束摘要，最后一行不完整"""
+    journal = OrganizeJournal(str(path), "20250101_120000", "/desktop", ["文档"], batch_size=1)
+    for index in range(5):
+        journal.record_move(index, f"/desktop/f{index}.txt", f"/desktop/文档/f{index}.txt", "文档")
+    journal.record_failure(1)
+    journal.record_failure(3)
+    journal.sync()
+    journal._file.write('{"i": 5, "original": "/desktop/f5')
+    journal._file.close()
+
+
+def test_reader_skips_failed_moves_of_crashed_journal(tmp_path):
+    path = tmp_path / "record.journal.jsonl"
+    _crashed_journal(path)
+    reader = RecordReader(str(path))
+    files = list(reader)
+    assert [item["original"] for item in files] == ["/desktop/f0.txt", "/desktop/f2.txt", "/desktop/f4.txt"]
+    assert all(item["timestamp"] == "20250101_120000" for item in files)
+    assert reader.meta["created_folders"] == ["文档"]
+
+
+def test_reader_matches_iter_journal(tmp_path):
+    path = tmp_path / "record.journal.jsonl"
+    _crashed_journal(path)
+    _, summary, entries = iter_journal(str(path))
+    assert summary is None
+    assert list(entries) == list(RecordReader(str(path)))
+
+
+def test_reader_streams_json_record(tmp_path):
+    path = tmp_path / "record.json"
+    files = [{"original": f"/d/{i}", "new": f"/d/c/{i}", "category": "c", "timestamp": "t"} for i in range(1000)]
+    path.write_text(json.dumps({"timestamp": "t", "total_files": 1000, "files": files}), encoding="utf-8")
+    reader = RecordReader(str(path), chunk_size=512)
+    assert list(reader) == files
+    assert reader.meta["total_files"] == 1000
+
+
+def test_restore_from_crashed_journal(tmp_path, monkeypatch):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop)
+    real_move = engine.move_item
+
+    def move_item(entry, dest_path, *args, **kwargs):
+        if entry.name == "song.mp3":
+            raise OSError("文件被占用")
+        return real_move(entry, dest_path, *args, **kwargs)
+
+    def crash(self):
+        raise KeyboardInterrupt()
+
+    # 一个文件移动失败，写入结束摘要前进程退出：只留下没有摘要的整理日志
+    monkeypatch.setattr(engine, "move_item", move_item)
+    monkeypatch.setattr("cleaner.engine.OrganizeJournal.finish", crash)
+    record = tmp_path / "record.json"
+    with pytest.raises(KeyboardInterrupt):
+        engine.organize(str(record), timestamp="20250101_000000")
+    journal = journal_path_for(str(record))
+    assert os.path.exists(journal) and not record.exists()
+    assert (desktop / "song.mp3").exists()
+    moved = {name.split("/")[0] for name in files} - set(os.listdir(desktop))
+    assert moved
+
+    logs = []
+    engine.log = logs.append
+    result = engine.restore(journal)
+    # 移动失败的文件不在恢复范围内，也不会报告恢复失败
+    assert result["restored_count"] == len(moved)
+    assert not any("恢复失败" in line for line in logs)
+    assert tree_contents(desktop) == files
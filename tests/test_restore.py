@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from helpers import make_desktop, make_engine, tree_contents
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_restore_lists_each_category_folder_once(tmp_path, monkeypatch, workers):
+    desktop, files = make_desktop(tmp_path)
+    for index in range(30):
+        name = f"extra{index}.txt"
+        files[name] = name.encode()
+        (desktop / name).write_bytes(files[name])
+    engine = make_engine(desktop, move_workers=workers)
+    record = tmp_path / "record.json"
+    summary = engine.organize(str(record), timestamp="20250101_000000")
+    categories = summary["categories_created"]
+
+    scanned = []
+    real_scandir = os.scandir
+
+    def scandir(path="."):
+        scanned.append(os.path.normpath(os.fspath(path)))
+        return real_scandir(path)
+
+    monkeypatch.setattr(os, "scandir", scandir)
+    result = engine.restore(str(record))
+    assert result["restored_count"] == summary["total_files"]
+    assert tree_contents(desktop) == files
+    folders = [os.path.normpath(os.path.join(str(desktop), category)) for category in categories]
+    for folder in folders:
+        assert scanned.count(folder) == 1
+    assert not any(os.path.isdir(folder) for folder in folders)
+
+
+def test_restore_renames_clashes_and_skips_missing(tmp_path):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop)
+    record = tmp_path / "record.json"
+    engine.organize(str(record), timestamp="20250101_000000")
+    # 桌面上又出现了同名文件；另一个已整理的文件被用户删除
+    (desktop / "photo.jpg").write_bytes(b"new photo")
+    song = next(os.path.join(d, "song.mp3") for d, _, names in os.walk(desktop) if "song.mp3" in names)
+    os.remove(song)
+
+    result = engine.restore(str(record))
+    assert result["restored_count"] == result["total_files"] - 1
+    assert (desktop / "photo.jpg").read_bytes() == b"new photo"
+    assert (desktop / "photo_1.jpg").read_bytes() == files["photo.jpg"]
+    assert not (desktop / "song.mp3").exists()
@@ -0,0 +1,103 @@
+import random
+import time
+
+import pytest
+
+from cleaner.rules import RuleSet
+from cleaner.scanner import Entry
+
+
+def _naive_match(categories, entries, now):
+    """逐条检查规则的参考实现"""
+    import fnmatch
+    import re
+
+    rules = [(category, rule) for category, info in categories.items() for rule in info["rules"]]
+    rules = [pair for _, pair in sorted(enumerate(rules), key=lambda item: (-item[1][1].get("priority", 0), item[0]))]
+    result = []
+    for entry in entries:
+        if entry.is_dir:
+            result.append(None)
+            continue
+        name = entry.name.lower()
+        age = (now - entry.mtime) / 86400
+        size = entry.size / 1024 / 1024
+        found = None
+        for category, rule in rules:
+            if "glob" in rule and not fnmatch.fnmatch(name, rule["glob"].lower()):
+                continue
+            if "prefix" in rule and not name.startswith(rule["prefix"].lower()):
+                continue
+            if "regex" in rule and not re.search(rule["regex"], entry.name):
+                continue
+            if "extensions" in rule and not any(name.endswith(ext) for ext in rule["extensions"]):
+                continue
+            if not rule.get("min_size_mb", 0) <= size <= rule.get("max_size_mb", float("inf")):
+                continue
+            if not rule.get("min_age_days", 0) <= age <= rule.get("max_age_days", float("inf")):
+                continue
+            found = category
+            break
+        result.append(found)
+    return result
+
+
+def test_ruleset_matches_naive_evaluator():
+    rng = random.Random(1234)
+    exts = [".png", ".jpg", ".pdf", ".docx", ".mp4", ".txt", ""]
+    categories = {}
+    for i in range(200):
+        kind = i % 5
+        ext = exts[i % len(exts)] or ".zip"
+        if kind == 0:
+            rule = {"glob": f"项目{i % 20:02d}_*{ext}"}
+        elif kind == 1:
+            rule = {"prefix": f"客户{i % 30:02d}"}
+        elif kind == 2:
+            rule = {"regex": rf"^IMG_{i % 10}\d+"}
+        elif kind == 3:
+            rule = {"regex": r"(?i)final", "extensions": [ext]}
+        else:
+            rule = {"extensions": [ext], "min_size_mb": i % 7, "max_age_days": 1 + i % 90}
+        if i % 3 == 0:
+            rule["max_size_mb"] = 5 + i % 40
+        if i % 4 == 0:
+            rule["min_age_days"] = i % 10
+        rule["priority"] = rng.randrange(5)
+        categories.setdefault(f"分类{i % 25:02d}", {"extensions": [], "rules": []})["rules"].append(rule)
+
+    now = time.time()
+    stems = ["项目03_方案", "客户12合同", "IMG_512345", "Final报告", "report_FINAL_v2", "随机文件", "项目15_"]
+    entries = []
+    for index in range(3000):
+        name = rng.choice(stems) + str(rng.randrange(100)) + rng.choice(exts)
+        size = rng.choice([0, 1, 1024 * 1024, 3 * 1024 * 1024, rng.randrange(60 * 1024 * 1024)])
+        mtime = now - rng.choice([0, 86400, rng.randrange(200 * 86400)])
+        entries.append(Entry(name, "/desktop/" + name, index % 97 == 0, size, mtime, index))
+
+    assert RuleSet(categories).match(entries, now) == _naive_match(categories, entries, now)
+
+
+# ---- 大文件 ----
+
+
+def _naive_single(rule, name):
+    now = time.time()
+    return _naive_match({"分类": {"rules": [rule]}}, [Entry(name, "/desktop/" + name, False, 0, now, 0)], now)[0]
+
+
+@pytest.mark.parametrize("rule, name, matched", [
+    ({"regex": "^a.c"}, "abc.txt", True),
+    # 用户的 . 与re.search一致不匹配换行，需要时可以自己写 (?s)
+    ({"regex": "^a.c"}, "a\nc.txt", False),
+    ({"regex": "(?s)^a.c"}, "a\nc.txt", True),
+    # 在整个文件名中查找，包括换行之后的部分
+    ({"regex": "report"}, "x\nreport.txt", True),
+    ({"extensions": [".txt"]}, "a\nb.txt", True),
+    ({"glob": "a*.txt"}, "a\nb.txt", True),
+])
+def test_regex_dot_does_not_match_newline(rule, name, matched):
+    # 同一分类中另有一条规则，走合并后的正则
+    rules = RuleSet({"分类": {"extensions": [], "rules": [rule, {"prefix": "zzz"}]}})
+    assert rules.match([name]) == ["分类" if matched else None]
+    assert bool(_naive_single(rule, name)) == matched
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from cleaner import CleanerEngine, default_config
+from cleaner.scanner import scan_dir, scan_path, walk_files
+
+
+def test_scan_dir_matches_stat(tmp_path):
+    (tmp_path / "b.txt").write_bytes(b"12345")
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "inner.txt").write_bytes(b"x")
+    entries = scan_dir(str(tmp_path))
+    assert [entry.name for entry in entries] == ["a", "b.txt"]
+    for entry in entries:
+        st = os.stat(entry.path)
+        assert entry == scan_path(entry.path)
+        assert (entry.is_dir, entry.mtime) == (os.path.isdir(entry.path), st.st_mtime)
+    assert entries[1].size == 5
+    assert scan_path(str(tmp_path / "missing")) is None
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="需要符号链接")
+def test_broken_symlink_is_a_sizeless_file(tmp_path):
+    os.symlink(str(tmp_path / "missing"), str(tmp_path / "link"))
+    entry, = scan_dir(str(tmp_path))
+    assert (entry.name, entry.is_dir, entry.size) == ("link", False, 0)
+
+
+def test_walk_files_yields_nested_files_only(tmp_path):
+    (tmp_path / "x" / "y").mkdir(parents=True)
+    for name in ("top.txt", "x/mid.txt", "x/y/deep.txt"):
+        (tmp_path / name).write_text(name)
+    found = sorted(os.path.relpath(entry.path, tmp_path).replace(os.sep, "/") for entry in walk_files(str(tmp_path)))
+    assert found == ["top.txt", "x/mid.txt", "x/y/deep.txt"]
+
+
+def test_plan_is_decided_from_scan_records(tmp_path, monkeypatch):
+    for name in ("a.txt", "b.jpg", "c.tmp"):
+        (tmp_path / name).write_bytes(b"data")
+    (tmp_path / "folder").mkdir()
+    config = default_config()
+    config["excluded_extensions"] = [".tmp"]
+    engine = CleanerEngine(config, str(tmp_path))
+    entries = engine.scan_desktop()
+
+    def no_syscall(*args, **kwargs):
+        raise AssertionError("整理计划应只使用扫描记录")
+
+    # 跳过、分类判断不再逐个stat
+    for name in ("stat", "lstat", "scandir", "listdir"):
+        monkeypatch.setattr(os, name, no_syscall)
+    for name in ("isdir", "isfile", "exists", "getsize", "getmtime"):
+        monkeypatch.setattr(os.path, name, no_syscall)
+    plan = engine.plan_organize(entries)
+    assert sorted(entry.name for entry, _ in plan) == ["a.txt", "b.jpg"]
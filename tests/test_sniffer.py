@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from cleaner import default_config
+from cleaner.classifier import CategoryClassifier
+from cleaner.scanner import scan_path
+from cleaner.sniffer import ContentClassifier
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(100)
+DOCUMENTS = "📄 文档"
+IMAGES = "🖼️ 图片"
+SCREENSHOTS = "截图"
+
+
+def _classifier(mode, rules=None, **options):
+    config = default_config()
+    if rules is not None:
+        config["categories"] = {SCREENSHOTS: {"extensions": [], "rules": rules}, **config["categories"]}
+    return ContentClassifier(CategoryClassifier(config), mode, workers=2, **options)
+
+
+def _entry(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return scan_path(str(path))
+
+
+@pytest.mark.parametrize("mode, expected", [("all", IMAGES), ("unknown", DOCUMENTS)])
+def test_png_saved_as_txt(tmp_path, mode, expected):
+    entries = [_entry(tmp_path, "图.txt", PNG), _entry(tmp_path, "说明.txt", b"plain text"),
+               _entry(tmp_path, "无扩展名", PNG)]
+    # 只识别“其他”时扩展名优先；识别所有文件时内容与扩展名不符按内容分类
+    assert _classifier(mode).classify(entries) == [expected, DOCUMENTS, IMAGES]
+
+
+@pytest.mark.parametrize("mode", ["all", "unknown"])
+def test_rules_win_over_sniffed_type(tmp_path, mode):
+    classifier = _classifier(mode, rules=[{"prefix": "截屏"}])
+    entries = [_entry(tmp_path, "截屏1.txt", PNG), _entry(tmp_path, "截屏2", PNG), _entry(tmp_path, "图.txt", PNG)]
+    categories = classifier.classify(entries)
+    assert categories[:2] == [SCREENSHOTS, SCREENSHOTS]
+    assert categories[2] == (IMAGES if mode == "all" else DOCUMENTS)
+    # 规则匹配的文件不需要读取内容
+    assert classifier.sniffed == (1 if mode == "all" else 0)
+
+
+def test_cache_is_bounded_and_keyed_by_size_and_mtime(tmp_path):
+    classifier = _classifier("all", cache_size=2)
+    entries = [_entry(tmp_path, f"{i}.txt", PNG) for i in range(3)]
+    assert classifier.classify(entries) == [IMAGES] * 3
+    assert classifier.sniffed == 3 and len(classifier.results) == 2
+    # 最近使用的两个仍在缓存中，最早的已被丢弃
+    assert classifier.classify(entries[1:]) == [IMAGES] * 2 and classifier.sniffed == 3
+    assert classifier.classify(entries[:1]) == [IMAGES] and classifier.sniffed == 4
+    assert len(classifier.results) == 2
+
+    # 内容变化后（大小、修改时间不同）重新识别
+    path = entries[0].path
+    with open(path, "wb") as f:
+        f.write(b"now just text")
+    os.utime(path, (1, 1))
+    assert classifier.classify([scan_path(path)]) == [DOCUMENTS] and classifier.sniffed == 5
@@ -0,0 +1,92 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cleaner import transfer
+from cleaner.transfer import TransferStats, _copy_tree
+
+
+def _tree(root):
+    (root / "sub" / "deep").mkdir(parents=True)
+    for index in range(20):
+        (root / f"f{index}.txt").write_bytes(os.urandom(100 + index))
+    (root / "sub" / "a.bin").write_bytes(b"a" * 5000)
+    (root / "sub" / "deep" / "b.bin").write_bytes(b"")
+    return {os.path.relpath(os.path.join(d, n), root): open(os.path.join(d, n), "rb").read()
+            for d, _, names in os.walk(root) for n in names}
+
+
+def _contents(root):
+    return {os.path.relpath(os.path.join(d, n), root): open(os.path.join(d, n), "rb").read()
+            for d, _, names in os.walk(root) for n in names}
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_copy_tree_moves_everything(tmp_path, workers):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.mkdir()
+    expected = _tree(src)
+    _copy_tree(str(src), str(dst), TransferStats(), workers, verify_hash=True)
+    assert not src.exists()
+    assert _contents(dst) == expected
+
+
+def test_failed_file_keeps_source_tree_whole(tmp_path, monkeypatch):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.mkdir()
+    expected = _tree(src)
+    real_copy = transfer._copy_checked
+
+    def failing_copy(path, target, *args, **kwargs):
+        if path.endswith("f7.txt"):
+            raise OSError("disk full")
+        return real_copy(path, target, *args, **kwargs)
+
+    monkeypatch.setattr(transfer, "_copy_checked", failing_copy)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        with pytest.raises(OSError):
+            _copy_tree(str(src), str(dst), TransferStats(), 4, False, pool)
+    assert _contents(src) == expected
+    assert not dst.exists()
+
+
+def test_shared_pool_is_used_instead_of_a_new_one(tmp_path, monkeypatch):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.mkdir()
+    expected = _tree(src)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        def no_new_pool(*args, **kwargs):
+            raise AssertionError("不应再创建线程池")
+        monkeypatch.setattr(transfer, "ThreadPoolExecutor", no_new_pool)
+        _copy_tree(str(src), str(dst), TransferStats(), 4, False, pool)
+    assert _contents(dst) == expected
+
+
+@pytest.mark.parametrize("broken", [("copy_file_range",), ("copy_file_range", "sendfile")])
+def test_zero_length_kernel_copy_falls_back(tmp_path, monkeypatch, broken):
+    # FUSE、procfs等文件系统上第一次调用就返回0，不能当作复制完成
+    for name in broken:
+        monkeypatch.setattr(os, name, lambda *args: 0, raising=False)
+    src, dst = tmp_path / "src.bin", tmp_path / "dst.bin"
+    data = os.urandom(300000)
+    src.write_bytes(data)
+    assert transfer.copy_file_data(str(src), str(dst)) == len(data)
+    assert dst.read_bytes() == data
+    (tmp_path / "empty").write_bytes(b"")
+    assert transfer.copy_file_data(str(tmp_path / "empty"), str(tmp_path / "empty2")) == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="需要FIFO")
+def test_copy_tree_recreates_fifo_instead_of_reading_it(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    (src / "sub").mkdir(parents=True)
+    (src / "sub" / "a.txt").write_bytes(b"a")
+    os.mkfifo(str(src / "sub" / "pipe"), 0o640)
+    stats = TransferStats()
+    _copy_tree(str(src), str(dst), stats, 2, False)
+    assert not src.exists() and stats.leftovers == []
+    assert (dst / "sub" / "a.txt").read_bytes() == b"a"
+    st = os.lstat(dst / "sub" / "pipe")
+    assert stat.S_ISFIFO(st.st_mode)
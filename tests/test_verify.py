@@ -0,0 +1,50 @@
+import struct
+import zipfile
+
+import pytest
+
+from cleaner.verify import verify_archive
+
+from helpers import make_desktop, make_engine
+
+
+def _corrupt_member(archive_path, name):
+    """翻转成员压缩数据中间的一个字节"""
+    with zipfile.ZipFile(archive_path) as zf:
+        info = zf.getinfo(name)
+    with open(archive_path, "r+b") as f:
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = struct.unpack("<HH", f.read(4))
+        offset = info.header_offset + 30 + name_len + extra_len + info.compress_size // 2
+        f.seek(offset)
+        byte = f.read(1)[0]
+        f.seek(offset)
+        f.write(bytes([byte ^ 0xFF]))
+
+
+@pytest.fixture
+def backup(tmp_path):
+    desktop, files = make_desktop(tmp_path)
+    engine = make_engine(desktop, include_folders_in_backup=True, backup_workers=2)
+    out = tmp_path / "out"
+    out.mkdir()
+    path, count = engine.backup(str(out), timestamp="20250101_000000")
+    assert count == len(files)
+    return engine, path
+
+
+def test_intact_backup_passes(backup):
+    engine, path = backup
+    result = engine.verify_backup(path)[path]
+    assert result["errors"] == [] and not result["cancelled"]
+
+
+# photo.jpg为STORED，video.mp4为分块DEFLATE，报告.docx为单块DEFLATE
+@pytest.mark.parametrize("name", ["photo.jpg", "video.mp4", "报告.docx"])
+def test_corrupted_member_is_reported(backup, name):
+    engine, path = backup
+    _corrupt_member(path, name)
+    result = engine.verify_backup(path)[path]
+    assert result["errors"] and {member for member, _ in result["errors"]} == {name}
+    # 没有备份清单时仍能靠压缩包目录中的CRC发现
+    assert {member for member, _ in verify_archive(path)["errors"]} == {name}
@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from cleaner import CleanerEngine, default_config
+from cleaner.watcher import CLOSED, WRITING, DesktopWatcher
+
+
+def _desktop(tmp_path, names):
+    desktop = tmp_path / "desktop"
+    desktop.mkdir()
+    for name in names:
+        (desktop / name).write_bytes(b"data")
+    # 修改时间足够久，去抖动后即可整理
+    old = time.time() - 3600
+    for name in names:
+        os.utime(desktop / name, (old, old))
+    return str(desktop)
+
+
+def _start(engine, record_dir):
+    watcher = DesktopWatcher(engine, str(record_dir), debounce=0.2, backend="poll", poll_interval=0.1)
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    return watcher, thread
+
+
+def _wait(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+def test_restore_is_not_undone_by_watcher(tmp_path):
+    desktop = _desktop(tmp_path, ["a.txt", "b.jpg"])
+    engine = CleanerEngine(default_config(), desktop)
+    record = str(tmp_path / "record.json")
+    engine.organize(record)
+    assert not os.path.exists(os.path.join(desktop, "a.txt"))
+
+    watcher, thread = _start(engine, tmp_path / "records")
+    try:
+        engine.restore(record)
+        assert os.path.exists(os.path.join(desktop, "a.txt"))
+        # 去抖动时间过后也不会再被整理
+        time.sleep(1.5)
+        assert os.path.exists(os.path.join(desktop, "a.txt"))
+        assert os.path.exists(os.path.join(desktop, "b.jpg"))
+        assert watcher.organized == 0
+
+        # 恢复后修改过的文件照常整理
+        with open(os.path.join(desktop, "a.txt"), "ab") as f:
+            f.write(b"more")
+        old = time.time() - 3600
+        os.utime(os.path.join(desktop, "a.txt"), (old, old))
+        assert _wait(lambda: not os.path.exists(os.path.join(desktop, "a.txt")))
+        assert os.path.exists(os.path.join(desktop, "b.jpg"))
+    finally:
+        watcher.stop.set()
+        thread.join(5)
+
+
+def test_watcher_waits_for_manual_operation(tmp_path):
+    desktop = _desktop(tmp_path, [])
+    engine = CleanerEngine(default_config(), desktop)
+    watcher, thread = _start(engine, tmp_path / "records")
+    try:
+        with engine.operation_lock:
+            (tmp_path / "desktop" / "new.txt").write_bytes(b"x")
+            time.sleep(1.0)
+            # 手动操作进行中，新文件不会被移动
+            assert os.path.exists(os.path.join(desktop, "new.txt"))
+        assert _wait(lambda: not os.path.exists(os.path.join(desktop, "new.txt")))
+    finally:
+        watcher.stop.set()
+        thread.join(5)
+
+
+def _watcher(tmp_path, names, **options):
+    config = default_config()
+    config.update(options)
+    engine = CleanerEngine(config, _desktop(tmp_path, names))
+    return DesktopWatcher(engine, str(tmp_path / "records"), debounce=0)
+
+
+def test_writing_without_close_times_out(tmp_path):
+    # 只有IN_CREATE、没有IN_CLOSE_WRITE（如写入程序崩溃）
+    watcher = _watcher(tmp_path, ["a.txt"], watch_writing_timeout=60)
+    watcher.handle([("a.txt", WRITING)])
+    # 第一次检查记下大小和修改时间，之后没有变化才按普通文件处理
+    assert watcher.ready() == []
+    assert watcher.ready() == ["a.txt"]
+    assert watcher.pending == {}
+
+
+def test_writing_file_still_changing_is_kept(tmp_path):
+    watcher = _watcher(tmp_path, ["a.txt"], watch_writing_timeout=60)
+    path = os.path.join(watcher.engine.desktop_path, "a.txt")
+    watcher.handle([("a.txt", WRITING)])
+    assert watcher.ready() == []
+    with open(path, "ab") as f:
+        f.write(b"more")
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+    # 大小变了，重新计时
+    assert watcher.ready() == []
+    # 修改时间较新时一直等待
+    os.utime(path)
+    assert watcher.ready() == [] and watcher.ready() == []
+    assert watcher.pending["a.txt"][1]
+    assert watcher.next_timeout() == 0.0
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="通过/proc检查打开的文件")
+def test_file_open_for_writing_is_not_moved(tmp_path):
+    watcher = _watcher(tmp_path, ["a.txt"])
+    path = os.path.join(watcher.engine.desktop_path, "a.txt")
+    with open(path, "ab"):
+        old = time.time() - 3600
+        os.utime(path, (old, old))
+        # 关闭事件不可靠（如inotify事件丢失后重新扫描），移动前仍检查文件是否被打开写入
+        watcher.handle([("a.txt", CLOSED)])
+        assert watcher.ready() == []
+        assert "a.txt" in watcher.pending
+    watcher.pending["a.txt"][0] = 0
+    assert watcher.ready() == ["a.txt"]